@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator
+import asyncio
+import functools
+import threading
+
+class ExecutorSaturated(Exception):
+    """Se alcanzó el límite de llamadas pendientes hacia AWS"""
+
+class BoundedExecutor:
+    """Pool de hilos acotado para ejecutar llamadas bloqueantes (boto3) fuera del event loop.
+
+    ``max_workers`` limita las llamadas simultáneas a AWS y ``max_pending`` el total
+    de llamadas en curso más las que esperan un hilo libre (0 = sin límite).
+    """
+
+    def __init__(self, max_workers: int = 32, max_pending: int = 0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aws")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Ejecutar ``fn`` en el pool y esperar su resultado sin bloquear el loop"""
+        with self._lock:
+            if self.max_pending and self._pending >= self.max_pending:
+                raise ExecutorSaturated(f"{self._pending} llamadas pendientes")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def iterate(self, iterator: Iterator[Any]) -> AsyncIterator[Any]:
+        """Consumir un iterador bloqueante (p. ej. un scan paginado) desde el event loop"""
+        done = object()
+        try:
+            while True:
+                item = await self.run(next, iterator, done)
+                if item is done:
+                    return
+                yield item
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+class AsyncProxy:
+    """Expone los métodos de un objeto síncrono como corrutinas que corren en un ``BoundedExecutor``"""
+
+    def __init__(self, target: Any, executor: BoundedExecutor):
+        self._target = target
+        self._executor = executor
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await self._executor.run(attr, *args, **kwargs)
+
+        return call
@@ -0,0 +1,130 @@
+from botocore.config import Config
+from typing import Any, Dict, Optional
+import threading
+import boto3
+from config import (
+    AWS_REGION, AWS_MAX_POOL_CONNECTIONS, AWS_CONNECT_TIMEOUT, AWS_READ_TIMEOUT,
+    AWS_RETRY_MODE, AWS_MAX_ATTEMPTS, AWS_TCP_KEEPALIVE, DYNAMODB_ENDPOINT_URL, S3_ENDPOINT_URL
+)
+
+class PoolMetrics:
+    """Llamadas en curso por servicio, para ver cuándo se satura el pool de conexiones.
+
+    botocore no bloquea cuando el pool está lleno: abre una conexión extra y la
+    descarta al terminar. ``over_pool_calls`` cuenta las llamadas que empezaron
+    con todas las conexiones del pool ocupadas (cada una paga un handshake nuevo).
+    """
+
+    def __init__(self, service: str, max_pool_connections: int):
+        self.service = service
+        self.max_pool_connections = max_pool_connections
+        self.calls = 0
+        self.attempts = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.over_pool_calls = 0
+        self._lock = threading.Lock()
+
+    def register(self, events) -> None:
+        events.register('before-call', self._before_call)
+        events.register('before-send', self._before_send)
+        events.register('after-call', self._after_call)
+        events.register('after-call-error', self._after_call_error)
+
+    def _before_call(self, **kwargs) -> None:
+        with self._lock:
+            self.calls += 1
+            if self.in_flight >= self.max_pool_connections:
+                self.over_pool_calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _before_send(self, **kwargs) -> None:
+        with self._lock:
+            self.attempts += 1
+
+    def _after_call(self, http_response=None, **kwargs) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if http_response is not None and http_response.status_code >= 400:
+                self.errors += 1
+
+    def _after_call_error(self, **kwargs) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'retries': max(self.attempts - self.calls, 0),
+                'errors': self.errors,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'max_pool_connections': self.max_pool_connections,
+                'pool_utilization': self.in_flight / self.max_pool_connections,
+                'over_pool_calls': self.over_pool_calls
+            }
+
+class AwsClientFactory:
+    """Clientes de AWS compartidos por la API y los servicios del proceso.
+
+    Una sola sesión y un cliente (con su pool de conexiones) por servicio, todos
+    con la misma configuración de botocore. Los clientes se crean al pedirlos
+    por primera vez, así que importar este módulo no contacta a AWS.
+    """
+
+    def __init__(self, region: str = AWS_REGION, max_pool_connections: int = AWS_MAX_POOL_CONNECTIONS,
+                 connect_timeout: float = AWS_CONNECT_TIMEOUT, read_timeout: float = AWS_READ_TIMEOUT,
+                 retry_mode: str = AWS_RETRY_MODE, max_attempts: int = AWS_MAX_ATTEMPTS,
+                 tcp_keepalive: bool = AWS_TCP_KEEPALIVE, endpoints: Optional[Dict[str, str]] = None):
+        self.region = region
+        self.session = boto3.session.Session(region_name=region)
+        self.config = Config(
+            max_pool_connections=max_pool_connections,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={'mode': retry_mode, 'total_max_attempts': max_attempts},
+            tcp_keepalive=tcp_keepalive
+        )
+        self.endpoints = {k: v for k, v in (endpoints or {}).items() if v}
+        self._clients: Dict[str, Any] = {}
+        self._resources: Dict[str, Any] = {}
+        self._metrics: Dict[str, PoolMetrics] = {}
+        # Crear clientes desde una sesión no es thread-safe; usarlos sí
+        self._lock = threading.Lock()
+
+    def client(self, service: str, region: Optional[str] = None):
+        with self._lock:
+            if service not in self._clients:
+                client = self.session.client(
+                    service, region_name=region or self.region, config=self.config,
+                    endpoint_url=self.endpoints.get(service)
+                )
+                self._track(service, client)
+                self._clients[service] = client
+            return self._clients[service]
+
+    def resource(self, service: str):
+        """Recurso de alto nivel (p. ej. tablas de DynamoDB) con su propio cliente configurado"""
+        with self._lock:
+            if service not in self._resources:
+                resource = self.session.resource(
+                    service, region_name=self.region, config=self.config,
+                    endpoint_url=self.endpoints.get(service)
+                )
+                self._track(f"{service}-resource", resource.meta.client)
+                self._resources[service] = resource
+            return self._resources[service]
+
+    def _track(self, name: str, client) -> None:
+        metrics = PoolMetrics(name, self.config.max_pool_connections)
+        metrics.register(client.meta.events)
+        self._metrics[name] = metrics
+
+    def metrics(self) -> Dict[str, Any]:
+        return {name: metrics.snapshot() for name, metrics in self._metrics.items()}
+
+aws_clients = AwsClientFactory(endpoints={'dynamodb': DYNAMODB_ENDPOINT_URL, 's3': S3_ENDPOINT_URL})
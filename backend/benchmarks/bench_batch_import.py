@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark de importación de trades: uno por uno (como antes) frente a `batch_create_trades`.
+
+"antes" reproduce el camino original: un scan para calcular el próximo ID y un
+put_item por trade (se mide sobre una muestra porque el scan crece con la tabla).
+Usa moto con una latencia simulada por llamada a AWS. moto copia cada tabla que
+toca una transacción, así que los caminos transaccionales (versión de la colección
+y registro de cambios) se ven más lentos de lo que son en DynamoDB.
+
+Uso (desde backend/): python3 -m benchmarks.bench_batch_import [trades] [latencia_ms]
+Requiere moto.
+"""
+
+import sys
+import time
+
+from benchmarks import local_aws
+from dynamo_types import to_dynamo
+
+def synthetic(n: int):
+    return [
+        {
+            "par": ["BTC/USDT", "ETH/USDT", "SOL/USDT"][i % 3],
+            "precio_apertura": 100.0 + i % 50,
+            "take_profit": 110.0 + i % 50,
+            "stop_loss": 95.0 + i % 50,
+            "fecha_apertura": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00",
+        }
+        for i in range(n)
+    ]
+
+def legacy_create(service, trade_data):
+    """Camino original: scan de IDs + put_item"""
+    response = service.table.scan(ProjectionExpression="#id", ExpressionAttributeNames={"#id": "id"})
+    next_id = max((int(item["id"]) for item in response.get("Items", [])), default=0) + 1
+    service.table.put_item(Item=to_dynamo(service._build_item(next_id, trade_data)))
+
+def run(label, counter, fn, count):
+    calls = counter.calls
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<28} {count:>7} trades  {elapsed:8.2f} s  "
+          f"{count / elapsed:9.1f} trades/s  {counter.calls - calls:>6} llamadas a AWS")
+
+def main(n: int, latency_ms: float):
+    counter = local_aws.start(latency_ms)
+    from dynamodb_service import DynamoDBService
+
+    service = DynamoDBService()
+    trades = synthetic(n)
+    sample = trades[: min(n, 500)]
+
+    print(f"📊 Importación de {n} trades, {latency_ms:.0f} ms por llamada a AWS")
+    run("antes (scan + put)", counter, lambda: [legacy_create(service, t) for t in sample], len(sample))
+    run("create_trade uno por uno", counter, lambda: [service.create_trade(t) for t in sample], len(sample))
+    run("batch_create_trades", counter, lambda: service.batch_create_trades(trades), n)
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    main(n, latency_ms)
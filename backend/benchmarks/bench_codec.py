@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de (de)serialización de listas de trades: recurso de boto3 + Pydantic
+frente al camino rápido (`trade_codec`), por cada 10k items.
+
+Parte de los items en formato de red ya parseados por botocore (común a ambos
+caminos) y termina en los bytes JSON de la respuesta:
+- recurso: `TypeDeserializer` (Decimal) → validación `List[Trade]` → JSON
+- rápido:  `decode_trade` (float/str) → JSON
+
+Uso (desde backend/): python3 -m benchmarks.bench_codec [items] [repeticiones]
+"""
+
+import json
+import sys
+import time
+from typing import List
+
+from boto3.dynamodb.types import TypeDeserializer
+from pydantic import TypeAdapter
+
+from main import Trade
+from trade_codec import decode_trade
+
+def wire_items(n: int):
+    items = []
+    for i in range(1, n + 1):
+        item = {
+            "id": {"N": str(i)},
+            "par": {"S": ["BTC/USDT", "ETH/USDT", "SOL/USDT"][i % 3]},
+            "precio_apertura": {"N": f"{100 + i % 500}.25"},
+            "take_profit": {"N": f"{110 + i % 500}.5"},
+            "stop_loss": {"N": f"{95 + i % 500}.75"},
+            "fecha_apertura": {"S": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00"},
+            "observaciones": {"S": "Entrada en soporte"},
+            "imagenes": {"L": [{"S": f"trades/{i}.png"}]},
+            "gsi_pk": {"S": "TRADE"},
+            "created_at": {"S": "2024-01-01T10:00:00"},
+            "updated_at": {"S": "2024-01-01T10:00:00"},
+        }
+        if i % 2:
+            item["fecha_cierre"] = {"S": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T18:00:00"}
+            item["motivo_cierre"] = {"S": "Take profit alcanzado"}
+        items.append(item)
+    return items
+
+def resource_path(items, deserializer, adapter) -> bytes:
+    trades = [{k: deserializer.deserialize(v) for k, v in item.items()} for item in items]
+    body = adapter.dump_python(adapter.validate_python(trades), mode="json")
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def fast_path(items) -> bytes:
+    records = [decode_trade(item) for item in items]
+    return json.dumps(records, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(n: int, repeat: int):
+    items = wire_items(n)
+    deserializer = TypeDeserializer()
+    adapter = TypeAdapter(List[Trade])
+
+    print(f"📊 Serialización de {n} trades (mejor de {repeat})")
+    slow = best_of(lambda: resource_path(items, deserializer, adapter), repeat)
+    fast = best_of(lambda: fast_path(items), repeat)
+    per_10k = 10_000 / n * 1000
+    print(f"   recurso + Pydantic   {slow * per_10k:8.1f} ms / 10k items")
+    print(f"   trade_codec          {fast * per_10k:8.1f} ms / 10k items   ({slow / fast:.1f}x)")
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    main(n, repeat)
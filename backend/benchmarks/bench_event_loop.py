@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia p99 con peticiones concurrentes: llamadas boto3 bloqueantes
+dentro de `async def` (antes) frente al pool acotado de `async_service` (después).
+
+Uso (desde backend/): python3 -m benchmarks.bench_event_loop [concurrencia] [latencia_ms]
+Requiere httpx.
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from async_service import AsyncProxy, BoundedExecutor
+
+class SlowService:
+    """Simula un round trip a DynamoDB con latencia fija"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def get_trade(self, trade_id: int):
+        time.sleep(self.latency)
+        return {"id": trade_id}
+
+def build_app(latency: float, workers: int) -> FastAPI:
+    service = SlowService(latency)
+    store = AsyncProxy(service, BoundedExecutor(max_workers=workers))
+    app = FastAPI()
+
+    @app.get("/blocking/{trade_id}")
+    async def blocking(trade_id: int):
+        return service.get_trade(trade_id)
+
+    @app.get("/offloaded/{trade_id}")
+    async def offloaded(trade_id: int):
+        return await store.get_trade(trade_id)
+
+    return app
+
+async def measure(client: httpx.AsyncClient, path: str, concurrency: int):
+    # Todas las peticiones llegan a la vez: la latencia se mide desde ese instante
+    start = time.perf_counter()
+
+    async def one(i: int) -> float:
+        response = await client.get(f"{path}/{i}")
+        response.raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+    latencies = sorted(await asyncio.gather(*(one(i) for i in range(concurrency))))
+    total = time.perf_counter() - start
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return statistics.median(latencies), p99, concurrency / total
+
+async def main(concurrency: int, latency_ms: float):
+    app = build_app(latency_ms / 1000, workers=concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"📊 {concurrency} peticiones concurrentes, {latency_ms:.0f} ms por llamada a AWS")
+        for name, path in (("antes (bloqueante)", "/blocking"), ("después (pool)", "/offloaded")):
+            p50, p99, rps = await measure(client, path, concurrency)
+            print(f"   {name:<20} p50={p50:8.1f} ms  p99={p99:8.1f} ms  {rps:8.1f} req/s")
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(main(concurrency, latency_ms))
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga del canal de eventos (`trade_events`): muchos suscriptores
+conectados a la vez por WebSocket o SSE a un uvicorn real (en otro proceso).
+
+El servidor publica eventos desde un hilo con `InProcessBroker.publish`, como
+hacen las escrituras. Una parte de los clientes no lee (clientes lentos): deben
+recibir `resync` sin frenar a los demás (su buffer de recepción se reduce para
+que la contrapresión llegue al servidor con pocos eventos). Se mide la latencia
+de reparto (publicación → recepción) en los clientes rápidos y el CPU del
+servidor por mensaje entregado: con pocos núcleos los clientes compiten por el
+CPU y la latencia refleja más a los clientes que al servidor.
+
+Uso (desde backend/):
+    python3 -m benchmarks.bench_events [suscriptores] [eventos] [eventos/s] [trades/evento] [ws|sse] [% lentos]
+Requiere websockets y httpx.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import websockets
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import StreamingResponse
+
+from trade_events import EventHub, InProcessBroker, sse_frames, stream_websocket
+
+SLOW_RCVBUF = 4096
+VERSION = re.compile(rb'"version":(\d+)')
+
+def synthetic_changes(version: int, trades: int):
+    return [
+        (version * trades + i, {
+            "id": version * trades + i, "par": "BTC/USDT", "precio_apertura": 100.5,
+            "take_profit": 110.25, "stop_loss": 95.75, "fecha_apertura": "2024-01-01T10:00:00",
+            "observaciones": "Entrada en soporte", "imagenes": ["trades/1.png"]
+        })
+        for i in range(trades)
+    ]
+
+def build_app(queue_size: int) -> FastAPI:
+    hub = EventHub(queue_size=queue_size)
+    broker = InProcessBroker(hub)
+    published = {}
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def ws(websocket: WebSocket):
+        await websocket.accept()
+        await stream_websocket(websocket, hub.subscribe(), {"type": "hello", "version": 0}, 15)
+
+    @app.get("/sse")
+    async def sse(request: Request):
+        subscription = hub.subscribe()
+        return StreamingResponse(sse_frames(request, subscription, {"type": "hello", "version": 0}, 15),
+                                 media_type="text/event-stream")
+
+    @app.post("/publish")
+    async def publish(events: int, interval: float, trades: int):
+        hub.bind(asyncio.get_running_loop())
+
+        def run():
+            for version in range(1, events + 1):
+                published[version] = time.time()
+                broker.publish(version, synthetic_changes(version, trades))
+                time.sleep(interval)
+
+        threading.Thread(target=run, daemon=True).start()
+        return {"started": events}
+
+    @app.get("/published")
+    async def get_published():
+        return published
+
+    @app.get("/stats")
+    async def stats():
+        return hub.stats()
+
+    return app
+
+def serve(port: int, queue_size: int) -> None:
+    import uvicorn
+    uvicorn.run(build_app(queue_size), host="127.0.0.1", port=port, log_level="warning",
+                ws_max_queue=1, timeout_keep_alive=60, backlog=4096)
+
+def cpu_seconds(pid: int) -> float:
+    """CPU (usuario + sistema) consumido por un proceso, desde /proc (Linux)"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class Client:
+    """Estado de un suscriptor: versiones recibidas (con su hora) y si recibió ``resync``"""
+
+    def __init__(self, slow: bool):
+        self.slow = slow
+        self.received = {}
+        self.resync = False
+
+async def slow_client(port: int, path: str, client: Client, ready, done: asyncio.Event):
+    """Cliente que no lee hasta el final: la contrapresión llega al servidor por TCP"""
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SLOW_RCVBUF)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+    reader, writer = await asyncio.open_connection(sock=sock, limit=SLOW_RCVBUF)
+    upgrade = "Upgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n" \
+              "Sec-WebSocket-Version: 13\r\n" if path == "/ws" else ""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n{upgrade}\r\n".encode())
+    await reader.readuntil(b"\r\n\r\n")
+    ready()
+    await done.wait()
+    tail = b""
+    try:
+        while chunk := await asyncio.wait_for(reader.read(65536), 5):
+            tail = (tail + chunk)[-256:]
+            if b"resync" in tail:
+                client.resync = True
+                break
+    except asyncio.TimeoutError:
+        pass
+    writer.close()
+
+async def ws_client(port: int, client: Client, ready, done: asyncio.Event):
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws", open_timeout=120) as ws:
+        await ws.recv()
+        ready()
+        try:
+            while True:
+                message = await ws.recv(decode=False)
+                now = time.time()
+                if b'"resync"' in message[:20]:
+                    client.resync = True
+                    return
+                match = VERSION.search(message, 0, 60)
+                if match:
+                    client.received[int(match.group(1))] = now
+        except websockets.ConnectionClosed:
+            pass
+
+async def sse_client(http: httpx.AsyncClient, port: int, client: Client, ready, done: asyncio.Event):
+    async with http.stream("GET", f"http://127.0.0.1:{port}/sse") as response:
+        lines = response.aiter_lines()
+        async for line in lines:
+            if line.startswith("data:"):
+                break
+        ready()
+        async for line in lines:
+            if line.startswith("event: resync"):
+                client.resync = True
+                return
+            if line.startswith("id:"):
+                client.received[int(line[4:])] = time.time()
+
+async def run(subscribers: int, events: int, rate: float, trades: int, mode: str, slow_pct: float, port: int, server_pid: int):
+    base = f"127.0.0.1:{port}"
+    n_slow = int(subscribers * slow_pct / 100)
+    clients = [Client(slow=i < n_slow) for i in range(subscribers)]
+    connected, done = asyncio.Event(), asyncio.Event()
+    count = [0]
+
+    def ready():
+        count[0] += 1
+        if count[0] == subscribers:
+            connected.set()
+
+    limits = httpx.Limits(max_connections=subscribers + 10)
+    async with httpx.AsyncClient(limits=limits, timeout=None) as http:
+        start = time.perf_counter()
+        path = "/ws" if mode == "ws" else "/sse"
+        tasks = [
+            asyncio.create_task(
+                slow_client(port, path, c, ready, done) if c.slow
+                else ws_client(port, c, ready, done) if mode == "ws"
+                else sse_client(http, port, c, ready, done)
+            )
+            for c in clients
+        ]
+        await asyncio.wait_for(connected.wait(), 120)
+        connect_time = time.perf_counter() - start
+
+        publish_start = time.perf_counter()
+        cpu_start = cpu_seconds(server_pid)
+        await http.post(f"http://{base}/publish", params={"events": events, "interval": 1 / rate, "trades": trades})
+        fast = [c for c in clients if not c.slow]
+        deadline = time.perf_counter() + events / rate + 30
+        while time.perf_counter() < deadline and not all(events in c.received for c in fast):
+            await asyncio.sleep(0.05)
+        publish_time = time.perf_counter() - publish_start
+        server_cpu = cpu_seconds(server_pid) - cpu_start
+        published = {int(k): v for k, v in (await http.get(f"http://{base}/published")).json().items()}
+
+        # Los lentos empiezan a leer: deben encontrar resync al final de lo que quedó en el buffer
+        done.set()
+        slow_tasks = tasks[:n_slow]
+        if slow_tasks:
+            await asyncio.wait(slow_tasks, timeout=30)
+        stats = (await http.get(f"http://{base}/stats")).json()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies = sorted(
+        (t - published[v]) * 1000 for c in fast for v, t in c.received.items() if v in published
+    )
+    complete = sum(1 for c in fast if len(c.received) == events)
+    q = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    print(f"📊 {subscribers} suscriptores {mode.upper()} ({n_slow} lentos), {events} eventos de {trades} trades "
+          f"a {rate:g}/s")
+    print(f"   conexión de todos        {connect_time:8.2f} s")
+    print(f"   publicación + reparto    {publish_time:8.2f} s")
+    print(f"   rápidos completos        {complete:8d} / {len(fast)}")
+    if latencies:
+        print(f"   latencia de reparto      p50 {statistics.median(latencies):.1f} ms   "
+              f"p99 {q(0.99):.1f} ms   máx {latencies[-1]:.1f} ms")
+    print(f"   CPU del servidor         {server_cpu:8.2f} s   "
+          f"({server_cpu / max(1, stats['delivered']) * 1e6:.0f} µs por mensaje entregado)")
+    print(f"   lentos con resync        {sum(1 for c in clients if c.slow and c.resync):8d} / {n_slow}")
+    print(f"   hub                      {json.dumps(stats)}")
+
+def main(subscribers: int, events: int, rate: float, trades: int, mode: str, slow_pct: float):
+    port = free_port()
+    # Cola corta para que los clientes lentos se llenen en pocos eventos
+    server = multiprocessing.Process(target=serve, args=(port, 64), daemon=True)
+    server.start()
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        asyncio.run(run(subscribers, events, rate, trades, mode, slow_pct, port, server.pid))
+    finally:
+        server.terminate()
+
+if __name__ == "__main__":
+    subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rate = float(sys.argv[3]) if len(sys.argv) > 3 else 20
+    trades = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    mode = sys.argv[5] if len(sys.argv) > 5 else "ws"
+    slow_pct = float(sys.argv[6]) if len(sys.argv) > 6 else 5
+    main(subscribers, events, rate, trades, mode, slow_pct)
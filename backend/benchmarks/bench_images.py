@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Variantes de imágenes (`image_variants.py`) contra moto: capturas de gráficos
+sintéticas (PNG) → anchos 160/480/1280 en AVIF y WebP.
+
+Mide el tiempo de procesamiento según los hilos del pool y los bytes que
+descarga una galería (una miniatura por imagen) con los originales frente a la
+variante que elige `resolve` para cada `Accept`.
+
+Uso (desde backend/): python3 -m benchmarks.bench_images [imágenes] [hilos] [ancho de galería]
+Requiere moto y Pillow.
+"""
+
+import io
+import os
+import random
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from benchmarks import local_aws
+
+BUCKET = "bench-images"
+ACCEPTS = {
+    "avif+webp": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
+    "webp": "image/webp,image/*,*/*;q=0.8",
+    "ninguno": "image/*",
+}
+
+def chart_png(seed: int, size=(2560, 1440)) -> bytes:
+    """Captura de un gráfico de velas: fondo oscuro, grilla, velas y texto"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (19, 23, 34))
+    draw = ImageDraw.Draw(image)
+    for x in range(0, size[0], 80):
+        draw.line([(x, 0), (x, size[1])], fill=(42, 46, 57))
+    for y in range(0, size[1], 60):
+        draw.line([(0, y), (size[0], y)], fill=(42, 46, 57))
+    price = size[1] / 2
+    for x in range(20, size[0] - 200, 14):
+        open_, close = price, price + rng.gauss(0, 18)
+        high, low = max(open_, close) + rng.random() * 20, min(open_, close) - rng.random() * 20
+        color = (38, 166, 154) if close < open_ else (239, 83, 80)
+        draw.line([(x + 4, low), (x + 4, high)], fill=color)
+        draw.rectangle([x, min(open_, close), x + 8, max(open_, close) + 1], fill=color)
+        price = min(size[1] - 100, max(100, close))
+    for i in range(40):
+        draw.text((size[0] - 180, 30 + i * 34), f"{60000 + rng.randint(-900, 900):,}", fill=(180, 180, 190))
+    # Ruido leve, como el antialiasing y los degradados de una captura real
+    noise = Image.effect_noise(size, 24).convert("RGB")
+    image = Image.blend(image, noise, 0.03)
+    out = io.BytesIO()
+    image.save(out, "PNG")
+    return out.getvalue()
+
+def main(n: int, threads: int, gallery_width: int):
+    local_aws.start(bucket=BUCKET)
+    import boto3
+
+    from image_variants import ImageVariants
+
+    s3 = boto3.client("s3", region_name="us-east-1")
+    keys = []
+    for i in range(n):
+        key = f"uploads/2025/01/01/captura-{i}.png"
+        s3.put_object(Bucket=BUCKET, Key=key, Body=chart_png(i), ContentType="image/png")
+        keys.append(key)
+
+    print(f"📊 {n} capturas PNG de 2560x1440 → anchos 160/480/1280 ({os.cpu_count()} CPU)")
+    results = {}
+    for workers in sorted({1, threads}):
+        variants = ImageVariants(s3, BUCKET, workers=workers)
+        start = time.perf_counter()
+        futures = [variants.submit(key, force=True) for key in keys]
+        manifests = [f.result() for f in futures]
+        elapsed = time.perf_counter() - start
+        stats = variants.stats()
+        print(f"   {workers:>2} hilos  {elapsed:6.2f} s   {n / elapsed:5.2f} imágenes/s   "
+              f"formatos {','.join(stats['formats'])}")
+        results = dict(zip(keys, manifests))
+        variants.shutdown()
+
+    original = sum(m["bytes"] for m in results.values())
+    print(f"   originales {original / n / 1024:8.1f} KB por imagen")
+    sample = next(iter(results.values()))
+    for v in sample["variants"]:
+        print(f"      {v['format']:<5} {v['width']:>5}w  {v['bytes'] / 1024:8.1f} KB")
+
+    variants = ImageVariants(s3, BUCKET)
+    print(f"   galería de {n} miniaturas de {gallery_width}px (la primera pasada lee los manifiestos de S3):")
+    for label, accept in ACCEPTS.items():
+        start = time.perf_counter()
+        chosen = [variants.resolve(key, gallery_width, accept) for key in keys]
+        lookup = (time.perf_counter() - start) / n * 1e6
+        total = sum(c["bytes"] for c in chosen)
+        print(f"      Accept {label:<10} {total / 1024:9.1f} KB  ({original / total:5.1f}x menos)   "
+              f"resolve {lookup:6.0f} µs")
+    variants.shutdown()
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    gallery_width = int(sys.argv[3]) if len(sys.argv) > 3 else 480
+    main(n, threads, gallery_width)
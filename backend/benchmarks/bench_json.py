@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización de las respuestas de listas de trades, por endpoint.
+
+Compara, a partir de registros ya decodificados (`trade_codec`):
+- Pydantic:        validación `List[Trade]` + `jsonable` + `JSONResponse` (response_model)
+- JSONResponse:    registros sin validar, json de la biblioteca estándar
+- FastJSON:        `FastJSONResponse` (orjson si está instalado)
+- precodificado:   bytes ya guardados en la caché (`FAST_JSON=true`, datos sin cambios)
+
+Uso (desde backend/): python3 -m benchmarks.bench_json [total_trades] [repeticiones]
+"""
+
+import sys
+from typing import List
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from benchmarks.bench_codec import best_of, wire_items
+from fast_json import ORJSON_AVAILABLE, FastJSONResponse, dumps
+from main import Trade
+from trade_codec import decode_trade
+
+def main(total: int, repeat: int):
+    records = [decode_trade(item) for item in wire_items(total)]
+    by_par = [r for r in records if r["par"] == "BTC/USDT"]
+    adapter = TypeAdapter(List[Trade])
+
+    endpoints = [
+        ("/trades?limit=50", {"items": records[:50], "next_token": "x"}),
+        ("/trades?limit=1000", {"items": records[:1000], "next_token": "x"}),
+        (f"/trades/par/BTC/USDT?all=true ({len(by_par)})", by_par),
+        (f"/trades?all=true ({total})", records),
+    ]
+
+    def pydantic_path(payload):
+        if isinstance(payload, dict):
+            payload = {**payload, "items": adapter.dump_python(adapter.validate_python(payload["items"]), mode="json")}
+        else:
+            payload = adapter.dump_python(adapter.validate_python(payload), mode="json")
+        return JSONResponse(payload).body
+
+    print(f"📊 Serialización por endpoint (mejor de {repeat}, orjson: {'sí' if ORJSON_AVAILABLE else 'no'})")
+    print(f"   {'endpoint':<38} {'Pydantic':>10} {'JSONResp.':>10} {'FastJSON':>10} {'precodif.':>10}")
+    for name, payload in endpoints:
+        encoded = dumps(payload)
+        times = [
+            best_of(lambda: pydantic_path(payload), repeat),
+            best_of(lambda: JSONResponse(payload).body, repeat),
+            best_of(lambda: FastJSONResponse(payload).body, repeat),
+            best_of(lambda: FastJSONResponse(encoded).body, repeat),
+        ]
+        print(f"   {name:<38} " + " ".join(f"{t * 1000:8.2f}ms" for t in times))
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    main(total, repeat)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark del scan paralelo: throughput de una lectura completa según el número de segmentos.
+
+En DynamoDB el costo de un scan es el round trip de cada página (hasta 1 MB), así
+que se simula una tabla en memoria que responde cada página después de
+``latencia_ms``. moto no sirve aquí: su scan recorre toda la tabla en Python en
+cada llamada y el GIL serializa ese trabajo entre segmentos.
+
+Uso (desde backend/): python3 -m benchmarks.bench_parallel_scan [trades] [latencia_ms] [segmentos ...]
+"""
+
+import sys
+import threading
+import time
+
+from benchmarks.bench_batch_import import synthetic
+from parallel_scan import parallel_scan
+
+PAGE_SIZE = 1000
+
+class SimulatedTable:
+    """Cliente con ``scan`` segmentado sobre una lista en memoria y latencia fija por página"""
+
+    def __init__(self, items, latency: float):
+        self.items = items
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def scan(self, TableName, Segment=0, TotalSegments=1, Limit=PAGE_SIZE, ExclusiveStartKey=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        segment = self.items[Segment::TotalSegments]
+        start = ExclusiveStartKey['offset'] if ExclusiveStartKey else 0
+        response = {'Items': segment[start:start + Limit]}
+        if start + Limit < len(segment):
+            response['LastEvaluatedKey'] = {'offset': start + Limit}
+        return response
+
+def main(n: int, latency_ms: float, segment_counts):
+    items = [{'id': i, **trade} for i, trade in enumerate(synthetic(n), start=1)]
+    table = SimulatedTable(items, latency_ms / 1000)
+
+    print(f"📊 Scan completo de {n} trades, páginas de {PAGE_SIZE}, {latency_ms:.0f} ms por página")
+    for segments in segment_counts:
+        calls = table.calls
+        start = time.perf_counter()
+        read = sum(len(page) for page in parallel_scan(table, "trades", segments=segments))
+        elapsed = time.perf_counter() - start
+        print(f"   {segments:>3} segmentos  {read:>8} trades  {elapsed:7.2f} s  "
+              f"{read / elapsed:10.0f} trades/s  {table.calls - calls:>5} llamadas")
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    segment_counts = [int(s) for s in sys.argv[3:]] or [1, 2, 4, 8, 16, 32]
+    main(n, latency_ms, segment_counts)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Bytes por página de `GET /trades`: todos los campos frente a `?fields=` (las
+columnas de una tabla) y sin comprimir frente a gzip/brotli.
+
+Para cada combinación mide los bytes de la respuesta HTTP (lo que viaja al
+cliente) y los bytes que devolvió DynamoDB. moto no calcula la capacidad
+consumida, así que las RCU se estiman con la regla de DynamoDB: una Query cobra
+el tamaño de los items leídos (0,5 RCU por 4 KB, lectura eventual) antes de
+aplicar `ProjectionExpression`, por lo que `fields` no las reduce.
+
+Uso (desde backend/): python3 -m benchmarks.bench_payload [trades] [limit]
+Requiere moto.
+"""
+
+import math
+import random
+import sys
+
+from benchmarks import local_aws
+from config import S3_BUCKET_NAME
+
+TABLE_FIELDS = "par,fecha_apertura,precio_apertura,fecha_cierre,motivo_cierre"
+WORDS = ("entrada soporte resistencia retesteo volumen rsi divergencia alcista bajista diario "
+         "ruptura mecha cierre objetivo riesgo gestión tendencia rango liquidez orden").split()
+
+def notes(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 60)))
+
+def item_size(item) -> int:
+    """Tamaño facturable aproximado de un item (formato de red): nombres + valores"""
+    def value_size(value) -> int:
+        if "S" in value:
+            return len(value["S"].encode())
+        if "N" in value:
+            return len(value["N"]) // 2 + 1
+        if "L" in value:
+            return 3 + sum(1 + value_size(v) for v in value["L"])
+        if "M" in value:
+            return 3 + sum(len(k) + 1 + value_size(v) for k, v in value["M"].items())
+        return 1
+    return sum(len(name) + value_size(value) for name, value in item.items())
+
+def synthetic(n: int):
+    rng = random.Random(42)
+    return [
+        {
+            "par": ["BTC/USDT", "ETH/USDT", "SOL/USDT"][i % 3],
+            "precio_apertura": 100.0 + i % 50,
+            "take_profit": 110.0 + i % 50,
+            "stop_loss": 95.0 + i % 50,
+            "fecha_apertura": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00",
+            "observaciones": notes(rng),
+            "imagenes": [f"trades/{i}/captura-{k}.png" for k in range(4)],
+        }
+        for i in range(n)
+    ]
+
+def main(n: int, limit: int):
+    local_aws.start(bucket=S3_BUCKET_NAME)
+    from fastapi.testclient import TestClient
+
+    import main as api
+    from compression import BROTLI_AVAILABLE
+
+    api.trade_service.batch_create_trades(synthetic(n))
+    dynamo_bytes = []
+    item_bytes = []
+
+    def after_query(http_response, parsed, **_):
+        dynamo_bytes.append(len(http_response.content))
+        item_bytes.append(sum(item_size(item) for item in parsed.get("Items", [])))
+
+    api.trade_service.raw_client.meta.events.register("after-call.dynamodb.Query", after_query)
+    client = TestClient(api.app)
+
+    encodings = ["identity", "gzip"] + (["br"] if BROTLI_AVAILABLE else [])
+    print(f"📊 GET /trades?limit={limit} sobre {n} trades (brotli: {'sí' if BROTLI_AVAILABLE else 'no instalado'})")
+    print(f"   {'campos':<10} {'DynamoDB':>10} {'RCU':>6} " + " ".join(f"{e:>10}" for e in encodings))
+    read_units = None
+    for label, fields in (("todos", None), ("tabla", TABLE_FIELDS)):
+        params = {"limit": limit, **({"fields": fields} if fields else {})}
+        sizes = []
+        for encoding in encodings:
+            dynamo_bytes.clear()
+            response = client.get("/trades", params=params, headers={"Accept-Encoding": encoding})
+            response.raise_for_status()
+            sizes.append(response.num_bytes_downloaded)
+        if read_units is None:
+            # Los mismos items completos se leen (y cobran) también con proyección
+            read_units = math.ceil(item_bytes[-1] / 4096) * 0.5
+        print(f"   {label:<10} {dynamo_bytes[-1]:>9}B {read_units:>6} "
+              + " ".join(f"{size:>9}B" for size in sizes))
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    main(n, limit)
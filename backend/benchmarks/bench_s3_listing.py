@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Listado del bucket con muchos objetos (moto): directo a S3 frente al índice
+local (`s3_listing.py`).
+
+Crea `objetos` claves con el formato de `generate_presigned_url`
+(`uploads/AAAA/MM/DD/<uuid>-<nombre>`) repartidas en días, sincroniza el
+índice (completo e incremental) y compara el tiempo por página, la navegación
+por carpetas y el pico de memoria de la sincronización.
+
+moto responde en el mismo proceso: cada llamada a S3 espera además `latencia`
+ms para simular el viaje de red (el índice no hace llamadas al leer). moto
+además recorre todo el bucket en cada `ListObjectsV2`, así que con S3 real las
+columnas de S3 son más rápidas (cerca de la latencia por página) pero siguen
+creciendo con las páginas a recorrer.
+
+Uso (desde backend/): python3 -m benchmarks.bench_s3_listing [objetos] [latencia ms]
+Requiere moto.
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+
+from benchmarks import local_aws
+
+BUCKET = "bench-listing"
+
+def timed(fn, repeat: int = 5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+def walk(list_page, **kwargs):
+    """Recorrer todas las páginas; devuelve (páginas, archivos)"""
+    pages = files = 0
+    token = None
+    while True:
+        page = list_page(token=token, **kwargs)
+        pages += 1
+        files += len(page["files"])
+        token = page["next_token"]
+        if not token:
+            return pages, files
+
+def main(n: int, latency_ms: float):
+    counter = local_aws.start(bucket=BUCKET)
+    import boto3
+
+    from aws_clients import aws_clients
+    from s3_listing import S3Listing, S3ObjectIndex
+
+    raw = boto3.client("s3", region_name="us-east-1")
+    days = max(1, n // 500)
+    first_day = date.today() - timedelta(days=days)
+    for i in range(n):
+        day = first_day + timedelta(days=i % days)
+        raw.put_object(Bucket=BUCKET, Key=f"uploads/{day:%Y/%m/%d}/{uuid.uuid4()}-captura.png", Body=b"")
+
+    counter.latency = latency_ms / 1000
+    listing = S3Listing(aws_clients.client("s3"), BUCKET)
+    index = S3ObjectIndex(listing, os.path.join(tempfile.mkdtemp(), "index.sqlite3"))
+    print(f"📊 {n} objetos en {days} días (latencia simulada por llamada: {latency_ms:g} ms)")
+
+    tracemalloc.start()
+    calls = counter.calls
+    full = index.refresh(full=True)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"   sincronización completa   {full['seconds']:8.2f} s   {counter.calls - calls} llamadas   "
+          f"pico de memoria {peak / 2**20:.1f} MiB")
+
+    for i in range(50):
+        raw.put_object(Bucket=BUCKET, Key=f"uploads/{date.today():%Y/%m/%d}/{uuid.uuid4()}-nueva.png", Body=b"")
+    calls = counter.calls
+    incremental = index.refresh()
+    print(f"   sincronización incremental {incremental['seconds']:7.2f} s   {counter.calls - calls} llamadas   "
+          f"{incremental['listed']} claves listadas")
+
+    print(f"   {'operación':<34} {'S3':>10} {'índice':>10}")
+    cases = [
+        ("primera página (1000)", {"limit": 1000}),
+        ("carpetas de uploads/AAAA/MM/", {"prefix": f"uploads/{first_day:%Y/%m}/", "delimiter": "/"}),
+        ("carpetas de uploads/", {"prefix": "uploads/", "delimiter": "/"}),
+    ]
+    for label, kwargs in cases:
+        s3_ms, _ = timed(lambda: listing.list_page(**kwargs))
+        index_ms, _ = timed(lambda: index.list_page(**kwargs))
+        print(f"   {label:<34} {s3_ms:8.1f}ms {index_ms:8.1f}ms")
+
+    start = time.perf_counter()
+    s3_pages, s3_files = walk(listing.list_page, limit=1000)
+    s3_walk = time.perf_counter() - start
+    start = time.perf_counter()
+    index_pages, index_files = walk(index.list_page, limit=1000)
+    index_walk = time.perf_counter() - start
+    print(f"   {'recorrer todo (' + str(s3_pages) + ' páginas)':<34} {s3_walk * 1000:8.0f}ms {index_walk * 1000:8.0f}ms")
+    assert s3_files == index_files == n + 50, (s3_files, index_files)
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    main(n, latency_ms)
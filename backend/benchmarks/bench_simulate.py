@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Simulación Monte Carlo (`monte_carlo.py`, `POST /simulate`) con un proceso
+frente al pool de procesos.
+
+Toma los R-múltiplos de `muestra` trades sintéticos (los de `bench_stats`) y
+simula `caminos` secuencias de `trades` trades con la misma semilla en el hilo
+que llama y con 2..N procesos (N = núcleos de la máquina). Comprueba que el
+resultado no depende del número de procesos. El primer uso del pool incluye
+arrancar los procesos (spawn), así que se mide aparte.
+
+Uso (desde backend/): python3 -m benchmarks.bench_simulate [caminos] [trades] [muestra]
+"""
+
+import os
+import sys
+import time
+
+from benchmarks.bench_stats import synthetic_trades
+from equity_engine import ClosedTrades
+from monte_carlo import MonteCarloSimulator
+
+def timed(simulator, r, paths, trades):
+    start = time.perf_counter()
+    result = simulator.run(r, paths=paths, trades=trades, seed=2025)
+    return result, time.perf_counter() - start
+
+def main(paths: int, trades: int, sample: int):
+    r = ClosedTrades.from_trades(synthetic_trades(sample)).r
+    cpus = os.cpu_count() or 1
+    print(f"📊 Monte Carlo: {paths} caminos × {trades} trades, {len(r)} R-múltiplos, {cpus} núcleos")
+    print(f"{'procesos':>9} {'arranque (s)':>13} {'tiempo (s)':>11} {'caminos/s':>11} {'ruina':>8} {'capital p50':>12}")
+    expected = None
+    for workers in sorted({1, 2, cpus}):
+        simulator = MonteCarloSimulator(workers=workers)
+        warmup = 0.0
+        if workers > 1:
+            # Arrancar los procesos con una simulación mínima
+            _, warmup = timed(simulator, r, 1, trades)
+        result, seconds = timed(simulator, r, paths, trades)
+        simulator.shutdown()
+        summary = (result['ruin']['probability'], result['final_equity'], result['max_drawdown_pct'], result['bands'])
+        if expected is None:
+            expected = summary
+        assert summary == expected, "el resultado depende del número de procesos"
+        print(f"{workers:>9} {warmup:>13.2f} {seconds:>11.2f} {paths / seconds:>11.0f} "
+              f"{result['ruin']['probability']:>8.4f} {result['final_equity']['p50']:>12.0f}")
+
+if __name__ == "__main__":
+    paths = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    trades = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    sample = int(sys.argv[3]) if len(sys.argv) > 3 else 10000
+    main(paths, trades, sample)
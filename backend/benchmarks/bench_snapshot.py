@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Estadísticas desde el almacenamiento (SQLite) frente al snapshot columnar
+(`trade_snapshot.py`).
+
+Carga `trades` trades, construye el snapshot y mide: `/stats` leyendo todos
+los trades como dicts, el mismo cálculo sobre el snapshot en frío (instancia
+nueva que mapea los archivos) y en caliente, una exportación completa en
+páginas, la actualización incremental después de `cambios` escrituras y la
+compactación.
+
+Uso (desde backend/): python3 -m benchmarks.bench_snapshot [trades] [cambios]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_storage import synthetic
+from sqlite_storage import SQLiteTradeStorage
+from stats_engine import trade_stats
+from trade_snapshot import SNAPSHOT_AVAILABLE, TradeSnapshot
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+def main(n: int, changes: int):
+    if not SNAPSHOT_AVAILABLE:
+        print("❌ pyarrow no está instalado")
+        return
+    print(f"📊 Snapshot columnar con {n} trades ({changes} escrituras entre actualizaciones)")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteTradeStorage(os.path.join(tmp, "trades.db"))
+        for start in range(0, n, 10000):
+            storage.batch_create_trades(synthetic(min(10000, n - start)))
+        directory = os.path.join(tmp, "snapshot")
+        snapshot = TradeSnapshot(storage, directory, max_deltas=1000)
+
+        build, build_ms = timed(snapshot.refresh)
+        expected, storage_ms = timed(lambda: trade_stats(storage.get_all_trades()))
+        cold, cold_ms = timed(lambda: TradeSnapshot(storage, directory).trade_stats())
+        warm, warm_ms = timed(snapshot.trade_stats)
+        assert cold == warm == expected, "el snapshot no coincide con el almacenamiento"
+        _, export_ms = timed(lambda: sum(len(page) for page in snapshot.pages(page_size=1000)))
+        _, storage_export_ms = timed(lambda: sum(1 for _ in storage.iter_trades(page_size=1000)))
+
+        for i in range(changes):
+            storage.update_trade(1 + i * 7 % n, {"observaciones": f"revisado {i}"})
+        refresh, refresh_ms = timed(snapshot.refresh)
+        _, delta_ms = timed(snapshot.trade_stats)
+        compact, compact_ms = timed(snapshot.compact)
+        size = snapshot.stats()["bytes"]
+
+    print(f"   construir                    {build_ms:9.1f} ms  ({build['rows']} filas, {size / 1e6:.1f} MB)")
+    print(f"   /stats desde SQLite          {storage_ms:9.1f} ms")
+    print(f"   /stats snapshot en frío      {cold_ms:9.1f} ms")
+    print(f"   /stats snapshot en caliente  {warm_ms:9.1f} ms")
+    print(f"   exportar (SQLite)            {storage_export_ms:9.1f} ms")
+    print(f"   exportar (snapshot)          {export_ms:9.1f} ms")
+    print(f"   actualización incremental    {refresh_ms:9.1f} ms  ({refresh['trades']} trades)")
+    print(f"   /stats con un delta          {delta_ms:9.1f} ms")
+    print(f"   compactar                    {compact_ms:9.1f} ms")
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    changes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    main(n, changes)
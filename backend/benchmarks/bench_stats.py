@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de estadísticas (`stats_engine`) y de la curva de capital
+(`equity_engine`) con 10k, 100k y 1M trades sintéticos.
+
+`curva prep` ordena los cerrados por fecha de cierre y calcula los R-múltiplos
+(se cachea por versión); `curva` son los kernels de `compute_equity`.
+
+Uso (desde backend/): python3 -m benchmarks.bench_stats [tamaño ...]
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+
+from equity_engine import ClosedTrades, compute_equity
+from stats_engine import TradeColumns, compute_stats
+
+PARES = ["BTC/USDT", "ETH/USDT", "SOL/USDT", "ADA/USDT", "XRP/USDT"]
+MOTIVOS = ["Take profit alcanzado", "Stop loss alcanzado", "Cierre manual"]
+
+def synthetic_trades(n: int, seed: int = 42):
+    """Generar trades deterministas con precios de salida reales"""
+    rng = random.Random(seed)
+    trades = []
+    for i in range(1, n + 1):
+        entry = rng.uniform(10, 1000)
+        closed = rng.random() < 0.8
+        trade = {
+            "id": i,
+            "par": rng.choice(PARES),
+            "precio_apertura": entry,
+            "take_profit": entry * 1.05,
+            "stop_loss": entry * 0.97,
+            "fecha_apertura": f"{rng.randint(2021, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00",
+        }
+        if closed:
+            trade["fecha_cierre"] = trade["fecha_apertura"]
+            trade["motivo_cierre"] = rng.choice(MOTIVOS)
+            if trade["motivo_cierre"] == "Cierre manual":
+                trade["precio_cierre"] = entry * rng.uniform(0.97, 1.05)
+        trades.append(trade)
+    return trades
+
+def main(sizes):
+    print(f"{'trades':>10} {'columnar (ms)':>15} {'kernels (ms)':>14} {'total (ms)':>12} "
+          f"{'curva prep (ms)':>16} {'curva (ms)':>11}")
+    for n in sizes:
+        trades = synthetic_trades(n)
+        start = time.perf_counter()
+        columns = TradeColumns(trades)
+        built = time.perf_counter()
+        stats = compute_stats(columns)
+        done = time.perf_counter()
+        assert stats["total_trades"] == n
+        closed = ClosedTrades(columns, np.array([t.get("fecha_cierre") or "" for t in trades], dtype=str))
+        prepared = time.perf_counter()
+        equity = compute_equity(closed)
+        curve = time.perf_counter()
+        assert equity["trades"] == stats["closed_trades"]
+        print(f"{n:>10} {(built - start) * 1000:>15.1f} {(done - built) * 1000:>14.1f} {(done - start) * 1000:>12.1f} "
+              f"{(prepared - done) * 1000:>16.1f} {(curve - prepared) * 1000:>11.1f}")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    main(sizes)
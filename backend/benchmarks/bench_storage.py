@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Latencia de las operaciones de `TradeStorage`: DynamoDB (moto) frente al motor
+local en SQLite (`sqlite_storage.py`).
+
+Carga `trades` trades en lote y mide la mediana de: crear un trade, leerlo por
+ID, una página de 50 del índice por fecha, una página de un par en un mes
+(`par + fecha_apertura`), solo los cerrados (`status + fecha_apertura`) y la
+lista completa como registros planos. moto responde en el mismo proceso, así
+que a DynamoDB se le suma `latencia` ms por llamada para simular la red.
+
+SQLite no necesita red ni moto: `python3 -m benchmarks.bench_storage 10000 0 sqlite`
+corre en CI sin acceso a AWS.
+
+Uso (desde backend/): python3 -m benchmarks.bench_storage [trades] [latencia_ms] [sqlite|dynamodb|all]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from query_planner import TradeFilters
+
+def synthetic(n: int):
+    return [
+        {
+            "par": ["BTC/USDT", "ETH/USDT", "SOL/USDT", "XRP/USDT"][i % 4],
+            "precio_apertura": 100.0 + i % 50,
+            "take_profit": 110.0 + i % 50,
+            "stop_loss": 95.0 + i % 50,
+            "fecha_apertura": f"{2020 + i % 5}-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00",
+            "fecha_cierre": f"{2020 + i % 5}-{1 + i % 12:02d}-28T10:00:00" if i % 3 else None,
+            "motivo_cierre": "tp" if i % 3 else None,
+            "precio_cierre": 105.0 + i % 50 if i % 3 else None,
+            "observaciones": "entrada en soporte",
+        }
+        for i in range(n)
+    ]
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def measure(label: str, storage, n: int, repeat: int):
+    start = time.perf_counter()
+    storage.batch_create_trades(synthetic(n))
+    load = time.perf_counter() - start
+    trade_id = storage.get_max_trade_id() // 2 or 1
+    month = TradeFilters(par="ETH/USDT", date_prefix="2021-06")
+    closed = TradeFilters(status="closed")
+    rows = [
+        ("create_trade", timed(lambda: storage.create_trade(synthetic(1)[0]), repeat)),
+        ("get_trade", timed(lambda: storage.get_trade(trade_id), repeat)),
+        ("página de 50 (fecha)", timed(lambda: storage.query_trade_records(limit=50), repeat)),
+        ("par + mes", timed(lambda: storage.query_trade_records(month, limit=50), repeat)),
+        ("cerrados (status)", timed(lambda: storage.query_trade_records(closed, limit=50), repeat)),
+        ("todos como registros", timed(storage.get_all_trade_records, max(1, repeat // 5))),
+    ]
+    print(f"\n   {label}: carga en lote {n / load:,.0f} trades/s")
+    for name, ms in rows:
+        print(f"      {name:<24} {ms:9.2f} ms")
+
+def main(n: int, latency_ms: float, engine: str):
+    print(f"📊 TradeStorage con {n} trades ({latency_ms:g} ms por llamada a DynamoDB)")
+    if engine in ("sqlite", "all"):
+        from sqlite_storage import SQLiteTradeStorage
+
+        with tempfile.TemporaryDirectory() as tmp:
+            measure("SQLite (WAL)", SQLiteTradeStorage(os.path.join(tmp, "trades.db")), n, repeat=50)
+    if engine in ("dynamodb", "all"):
+        try:
+            from benchmarks import local_aws
+        except ImportError:
+            print("\n   DynamoDB: moto no está instalado, se omite")
+            return
+        local_aws.start(latency_ms)
+        from dynamodb_service import DynamoDBService
+
+        measure("DynamoDB (moto)", DynamoDBService(), n, repeat=10)
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    engine = sys.argv[3] if len(sys.argv) > 3 else "all"
+    main(n, latency_ms, engine)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+`/stats/timeseries` desde las filas agregadas por hora y por día frente a
+recalcular la serie desde todos los trades, con historiales crecientes (SQLite).
+
+Para cada tamaño carga trades repartidos en `años` años y mide la serie mensual
+y la diaria del último año con ventanas de 30 y 90 días. El recálculo agrupa
+los trades por mes de cierre en Python (lo mínimo que haría un dashboard sin
+agregados).
+
+Uso (desde backend/): python3 -m benchmarks.bench_timeseries [años] [tamaño ...]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlite_storage import SQLiteTradeStorage
+from stats_engine import trade_profit
+
+def synthetic(n: int, years: int):
+    start = datetime(2025 - years, 1, 1)
+    minutes = years * 365 * 24 * 60
+    trades = []
+    for i in range(n):
+        opened = start + timedelta(minutes=i * 7919 % minutes)
+        trade = {
+            "par": ["BTC/USDT", "ETH/USDT", "SOL/USDT"][i % 3],
+            "precio_apertura": 100.0,
+            "take_profit": 105.0,
+            "stop_loss": 97.0,
+            "fecha_apertura": opened.isoformat(),
+        }
+        if i % 5:
+            trade["fecha_cierre"] = (opened + timedelta(hours=1 + i % 72)).isoformat()
+            trade["motivo_cierre"] = "tp" if i % 3 else "sl"
+        trades.append(trade)
+    return trades
+
+def timed(fn, repeat: int = 5):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def recompute_monthly(storage):
+    months = defaultdict(float)
+    for trade in storage.get_all_trades():
+        profit = trade_profit(trade)
+        if profit is not None:
+            months[trade["fecha_cierre"][:7]] += profit
+    return months
+
+def main(years: int, sizes):
+    print(f"📊 Serie temporal con {years} años de historial")
+    print(f"{'trades':>10} {'mensual (ms)':>13} {'diaria 1 año (ms)':>18} {'recalcular (ms)':>16}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = SQLiteTradeStorage(os.path.join(tmp, "trades.db"))
+            trades = synthetic(n, years)
+            for start in range(0, n, 10000):
+                storage.batch_create_trades(trades[start:start + 10000])
+            monthly = timed(lambda: storage.get_timeseries("month", windows=[30, 90]))
+            daily = timed(lambda: storage.get_timeseries("day", date_from="2024-01-01", date_to="2024-12-31",
+                                                         windows=[30, 90]))
+            recompute = timed(lambda: recompute_monthly(storage), repeat=1)
+        print(f"{n:>10} {monthly:>13.1f} {daily:>18.1f} {recompute:>16.1f}")
+
+if __name__ == "__main__":
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    sizes = [int(arg) for arg in sys.argv[2:]] or [10_000, 100_000]
+    main(years, sizes)
@@ -0,0 +1,49 @@
+"""
+Entorno AWS local para benchmarks: moto + latencia de red simulada por llamada.
+
+Se debe llamar a `start()` antes de importar `main` o crear un `DynamoDBService`,
+ya que el servicio crea sus clientes al construirse (la latencia se registra en
+la sesión de `aws_clients` y solo la heredan los clientes creados después).
+"""
+
+import glob
+import json
+import os
+import time
+
+import boto3
+from moto import mock_aws
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class CallCounter:
+    """Cuenta las llamadas a AWS y simula el round trip con ``latency`` segundos"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+def start(latency_ms: float = 0.0, bucket: str = None) -> CallCounter:
+    """Arrancar moto, crear las tablas de `create_*table.json` y registrar la latencia simulada"""
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    mock_aws().start()
+
+    client = boto3.client("dynamodb", region_name="us-east-1")
+    for path in sorted(glob.glob(os.path.join(BACKEND_DIR, "create_*table*.json"))):
+        with open(path) as f:
+            client.create_table(**json.load(f))
+    if bucket:
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=bucket)
+
+    from aws_clients import aws_clients
+
+    counter = CallCounter(latency_ms / 1000)
+    aws_clients.session.events.register("before-call", counter)
+    return counter
@@ -0,0 +1,75 @@
+from typing import Dict
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se comprime con gzip
+    brotli = None
+
+BROTLI_AVAILABLE = brotli is not None
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """``Accept-Encoding`` → {codificación: q}"""
+    encodings = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            encodings[name.lower()] = q
+    return encodings
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if more_body:
+            # flush para que cada trozo de un streaming llegue sin esperar al siguiente
+            return self.compressor.process(body) + self.compressor.flush()
+        return self.compressor.process(body) + self.compressor.finish()
+
+class CompressionMiddleware:
+    """Brotli (si está instalado y el cliente lo acepta) o gzip para respuestas de al
+    menos ``minimum_size`` bytes. No toca respuestas ya comprimidas ni
+    ``text/event-stream``. Si el cliente acepta compresión el ``ETag`` pasa a ser
+    débil (también en los ``304``, para que coincida con el de la respuesta completa)."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if BROTLI_AVAILABLE and accepted.get("br", 0) > 0:
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif accepted.get("gzip", 0) > 0:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_weak_etag(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["etag"] = "W/" + etag
+            await send(message)
+
+        await responder(scope, receive, send_with_weak_etag)
@@ -3,8 +3,81 @@ import os
 # Configuración de S3
 S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME', 'trade-tracker-assets-20250713-151538-f0d3341a')
 S3_REGION = os.getenv('S3_REGION', 'us-east-1')
+# Subidas multiparte: tamaño de parte preferido (bytes), validez de las URLs y edad para recolectarlas
+S3_UPLOAD_PART_SIZE = int(os.getenv('S3_UPLOAD_PART_SIZE', 8 * 1024 * 1024))
+S3_UPLOAD_URL_EXPIRY = int(os.getenv('S3_UPLOAD_URL_EXPIRY', 3600))
+S3_UPLOAD_STALE_HOURS = float(os.getenv('S3_UPLOAD_STALE_HOURS', 24))
+# Índice local (SQLite) del listado del bucket; vacío = listar siempre contra S3
+S3_INDEX_PATH = os.getenv('S3_INDEX_PATH', 's3_index.sqlite3')
+S3_INDEX_MAX_AGE = float(os.getenv('S3_INDEX_MAX_AGE', 60))
+# Variantes de imágenes (requiere Pillow): anchos en píxeles, formatos en orden de preferencia e hilos
+IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv('IMAGE_VARIANT_WIDTHS', '160,480,1280').split(',')]
+IMAGE_VARIANT_FORMATS = os.getenv('IMAGE_VARIANT_FORMATS', 'avif,webp').split(',')
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_MAX_SOURCE_BYTES = int(os.getenv('IMAGE_MAX_SOURCE_BYTES', 50 * 1024 * 1024))
+
+# Almacenamiento de trades: dynamodb:// o sqlite:///ruta/trades.db (local, un solo nodo)
+STORAGE_URL = os.getenv('STORAGE_URL', 'dynamodb://')
+# Snapshot columnar (Arrow, requiere pyarrow) para estadísticas y exportaciones; vacío = deshabilitado
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshots')
+SNAPSHOT_MAX_AGE = float(os.getenv('SNAPSHOT_MAX_AGE', 60))
+# Deltas acumulados antes de compactar automáticamente
+SNAPSHOT_MAX_DELTAS = int(os.getenv('SNAPSHOT_MAX_DELTAS', 16))
+# Simulaciones Monte Carlo (POST /simulate): procesos (0/1 = sin pool) y límites por petición
+SIMULATION_WORKERS = int(os.getenv('SIMULATION_WORKERS', os.cpu_count() or 1))
+SIMULATION_MAX_PATHS = int(os.getenv('SIMULATION_MAX_PATHS', 200000))
+SIMULATION_MAX_TRADES = int(os.getenv('SIMULATION_MAX_TRADES', 5000))
+
+# Configuración de DynamoDB
+DYNAMODB_TABLE_NAME = os.getenv('DYNAMODB_TABLE_NAME', 'trade-tracker-trades')
+DYNAMODB_COUNTERS_TABLE = os.getenv('DYNAMODB_COUNTERS_TABLE', 'trade-tracker-counters')
+DYNAMODB_AGGREGATES_TABLE = os.getenv('DYNAMODB_AGGREGATES_TABLE', 'trade-tracker-aggregates')
+DYNAMODB_CHANGES_TABLE = os.getenv('DYNAMODB_CHANGES_TABLE', 'trade-tracker-changes')
+# Días que se conserva el registro de cambios (atributo TTL expires_at; 0 = siempre)
+CHANGES_RETENTION_DAYS = float(os.getenv('CHANGES_RETENTION_DAYS', 30))
+ID_BLOCK_SIZE = int(os.getenv('ID_BLOCK_SIZE', 20))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 1000))
+# Scan paralelo para lecturas completas (exportaciones, agregados, backfills)
+SCAN_SEGMENTS = int(os.getenv('SCAN_SEGMENTS', 4))
+SCAN_QUEUE_PAGES = int(os.getenv('SCAN_QUEUE_PAGES', 8))
+
+# Concurrencia de llamadas a AWS (pool de hilos fuera del event loop)
+AWS_MAX_CONCURRENCY = int(os.getenv('AWS_MAX_CONCURRENCY', 32))
+AWS_MAX_PENDING = int(os.getenv('AWS_MAX_PENDING', 0))
+
+# Clientes de AWS compartidos (aws_clients.py)
+AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
+# Conexiones HTTP por cliente: al menos los hilos que pueden llamar a AWS a la vez
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', AWS_MAX_CONCURRENCY + SCAN_SEGMENTS))
+AWS_CONNECT_TIMEOUT = float(os.getenv('AWS_CONNECT_TIMEOUT', 2))
+AWS_READ_TIMEOUT = float(os.getenv('AWS_READ_TIMEOUT', 10))
+AWS_RETRY_MODE = os.getenv('AWS_RETRY_MODE', 'adaptive')
+AWS_MAX_ATTEMPTS = int(os.getenv('AWS_MAX_ATTEMPTS', 5))
+AWS_TCP_KEEPALIVE = os.getenv('AWS_TCP_KEEPALIVE', 'True').lower() == 'true'
+# Endpoints alternativos (DynamoDB Local, LocalStack, MinIO...)
+DYNAMODB_ENDPOINT_URL = os.getenv('DYNAMODB_ENDPOINT_URL')
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')
+
+# Caché de lectura de trades (memory:// o redis://host:port/db)
+CACHE_URL = os.getenv('CACHE_URL', 'memory://')
+CACHE_TTL = float(os.getenv('CACHE_TTL', 30))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+
+# Compresión de respuestas (brotli si está instalado, si no gzip) a partir de este tamaño
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1000))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+
+# Eventos de escritura en tiempo real (/ws/trades, /trades/events): memory:// o redis://host:port/db
+EVENTS_URL = os.getenv('EVENTS_URL', 'memory://')
+# Eventos pendientes por suscriptor antes de pedirle que se resincronice
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 256))
+EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', 15))
+
+# Respuestas JSON de las listas de trades con orjson y payloads precodificados (opt-in)
+FAST_JSON = os.getenv('FAST_JSON', 'False').lower() == 'true'
 
 # Configuración de la API
 API_HOST = os.getenv('API_HOST', '0.0.0.0')
 API_PORT = int(os.getenv('API_PORT', 8000))
-DEBUG = os.getenv('DEBUG', 'True').lower() == 'true' 
\ No newline at end of file
+DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
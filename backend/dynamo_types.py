@@ -0,0 +1,12 @@
+from decimal import Decimal
+from typing import Any
+
+def to_dynamo(value: Any) -> Any:
+    """Convertir floats (no soportados por boto3) a ``Decimal``, recursivamente"""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_dynamo(v) for v in value]
+    return value
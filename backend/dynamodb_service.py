@@ -1,38 +1,114 @@
-import boto3
 from botocore.exceptions import ClientError
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from datetime import datetime
 import json
+import random
+import time
+from config import (
+    DYNAMODB_TABLE_NAME, DYNAMODB_COUNTERS_TABLE, DYNAMODB_AGGREGATES_TABLE, DYNAMODB_CHANGES_TABLE,
+    CHANGES_RETENTION_DAYS, ID_BLOCK_SIZE, SCAN_SEGMENTS, SCAN_QUEUE_PAGES
+)
+from aws_clients import AwsClientFactory, aws_clients
+from dynamo_types import to_dynamo
+from trade_codec import TRADE_FIELDS, decode_item, decode_trade, encode_request
+from id_allocator import IdAllocator
+from pagination import encode_cursor, decode_cursor
+from parallel_scan import parallel_scan, projection_kwargs
+from query_planner import (
+    QueryPlan, QueryPlanner, TradeFilters, OPEN_INDEX_NAME, CLOSED_INDEX_NAME, OPEN_INDEX_PARTITION, CLOSED_INDEX_PARTITION
+)
+from stats_engine import STATS_FIELDS
+from trade_aggregates import AggregateStore, aggregate_delta, merge_deltas
+from trade_changes import ChangeFeed, ChangesExpired
+from trade_storage import BatchIncompleteError, ConcurrentModificationError, TradeStorage
 
-class DynamoDBService:
-    def __init__(self, table_name: str = "trade-tracker-trades"):
-        self.dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+# Todos los trades comparten esta partición en el índice ordenado por fecha
+TIME_INDEX_NAME = 'fecha-index'
+TIME_INDEX_PARTITION = 'TRADE'
+
+# Reintentos ante escrituras concurrentes sobre el mismo trade
+MAX_WRITE_ATTEMPTS = 3
+
+# Límites de DynamoDB para operaciones en lote
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+TRANSACT_MAX_ITEMS = 100
+# Hasta 20 trades por transacción, con sus entradas en el registro de cambios, la
+# versión y sus filas agregadas; si las filas (pares, meses, días y horas distintos)
+# no caben en 100 operaciones el grupo se corta antes (``_transaction_chunks``)
+BATCH_TRANSACT_SIZE = 20
+BATCH_MAX_ATTEMPTS = 5
+# Las escrituras concurrentes compiten por la versión de la colección: siempre avanza
+# alguna, así que reintentar más veces solo acota la espera de las demás
+VERSION_MAX_ATTEMPTS = 10
+# Cancelaciones transitorias de TransactWriteItems: otra transacción tocaba el mismo
+# item (la versión o una fila agregada, que toda escritura actualiza) o hubo
+# throttling. botocore no las reintenta
+RETRYABLE_CANCELLATIONS = {'TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded',
+                           'RequestLimitExceeded'}
+BATCH_BACKOFF_BASE = 0.05
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _backoff(attempt: int) -> None:
+    """Espera exponencial con jitter entre reintentos"""
+    time.sleep(BATCH_BACKOFF_BASE * (2 ** min(attempt, 5)) * (0.5 + random.random() / 2))
+
+def _status_keys(trade: Dict[str, Any]):
+    """Atributos de los índices dispersos por estado: (a asignar, a eliminar)"""
+    if trade.get('fecha_cierre'):
+        return {'closed_pk': CLOSED_INDEX_PARTITION}, ['open_pk']
+    return {'open_pk': OPEN_INDEX_PARTITION}, ['closed_pk']
+
+def _request_id(request: Dict[str, Any]) -> int:
+    body = request.get('PutRequest', {}).get('Item') or request.get('DeleteRequest', {}).get('Key')
+    return int(body['id'])
+
+class DynamoDBService(TradeStorage):
+    def __init__(self, table_name: str = DYNAMODB_TABLE_NAME, counters_table_name: str = DYNAMODB_COUNTERS_TABLE,
+                 aggregates_table_name: str = DYNAMODB_AGGREGATES_TABLE,
+                 changes_table_name: str = DYNAMODB_CHANGES_TABLE,
+                 clients: Optional[AwsClientFactory] = None):
+        super().__init__()
+        self.dynamodb = (clients or aws_clients).resource('dynamodb')
+        # Cliente del recurso (acepta tipos Python), necesario para TransactWriteItems
+        self.client = self.dynamodb.meta.client
+        # Cliente de bajo nivel (formato de red) para el camino rápido de lectura
+        self.raw_client = (clients or aws_clients).client('dynamodb')
         self.table = self.dynamodb.Table(table_name)
+        self.aggregates = AggregateStore(self.dynamodb.Table(aggregates_table_name))
+        self.changes = ChangeFeed(
+            self.dynamodb.Table(counters_table_name),
+            self.dynamodb.Table(changes_table_name),
+            retention_days=CHANGES_RETENTION_DAYS
+        )
+        self.planner = QueryPlanner(('gsi_pk', TIME_INDEX_PARTITION), self._index_cardinality)
+        self.id_allocator = IdAllocator(
+            self.dynamodb.Table(counters_table_name),
+            block_size=ID_BLOCK_SIZE,
+            seed_loader=self.get_max_trade_id
+        )
     
     def create_trade(self, trade_data: Dict[str, Any]) -> Dict[str, Any]:
         """Crear un nuevo trade en DynamoDB"""
         try:
             # Generar ID único
-            trade_id = self._get_next_id()
-            
-            # Preparar item para DynamoDB
-            item = {
-                'id': trade_id,
-                'par': trade_data['par'],
-                'precio_apertura': float(trade_data['precio_apertura']),
-                'take_profit': float(trade_data['take_profit']),
-                'stop_loss': float(trade_data['stop_loss']),
-                'fecha_apertura': trade_data.get('fecha_apertura', datetime.now().isoformat()),
-                'fecha_cierre': trade_data.get('fecha_cierre'),
-                'motivo_cierre': trade_data.get('motivo_cierre'),
-                'observaciones': trade_data.get('observaciones'),
-                'imagenes': trade_data.get('imagenes', []),
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
+            trade_id = self.id_allocator.next_id()
+            item = self._build_item(trade_id, trade_data)
             
-            # Insertar en DynamoDB
-            self.table.put_item(Item=item)
+            # Insertar en DynamoDB junto con los agregados
+            operation = {
+                'Put': {
+                    'TableName': self.table.name,
+                    'Item': to_dynamo(item),
+                    'ConditionExpression': 'attribute_not_exists(#id)',
+                    'ExpressionAttributeNames': {'#id': 'id'}
+                }
+            }
+            if not self._transact_trade_write(operation, None, item):
+                raise ConcurrentModificationError(f"El ID {trade_id} ya existe")
             
             return item
             
@@ -40,6 +116,30 @@ class DynamoDBService:
             print(f"Error creando trade: {e}")
             raise e
     
+    @staticmethod
+    def _build_item(trade_id: int, trade_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Preparar item para DynamoDB"""
+        now = datetime.now().isoformat()
+        item = {
+            'id': trade_id,
+            'par': trade_data['par'],
+            'precio_apertura': float(trade_data['precio_apertura']),
+            'take_profit': float(trade_data['take_profit']),
+            'stop_loss': float(trade_data['stop_loss']),
+            'fecha_apertura': trade_data.get('fecha_apertura') or now,
+            'fecha_cierre': trade_data.get('fecha_cierre'),
+            'motivo_cierre': trade_data.get('motivo_cierre'),
+            'observaciones': trade_data.get('observaciones'),
+            'imagenes': trade_data.get('imagenes') or [],
+            'gsi_pk': TIME_INDEX_PARTITION,
+            'created_at': now,
+            'updated_at': now
+        }
+        if trade_data.get('precio_cierre') is not None:
+            item['precio_cierre'] = float(trade_data['precio_cierre'])
+        item.update(_status_keys(item)[0])
+        return item
+    
     def get_trade(self, trade_id: int) -> Optional[Dict[str, Any]]:
         """Obtener un trade específico por ID"""
         try:
@@ -52,13 +152,7 @@ class DynamoDBService:
     def get_all_trades(self) -> List[Dict[str, Any]]:
         """Obtener todos los trades"""
         try:
-            response = self.table.scan()
-            trades = response.get('Items', [])
-            
-            # Si hay más items, continuar escaneando
-            while 'LastEvaluatedKey' in response:
-                response = self.table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-                trades.extend(response.get('Items', []))
+            trades = [trade for page in self.scan_pages() for trade in page]
             
             # Ordenar por fecha de creación (más reciente primero)
             trades.sort(key=lambda x: x.get('created_at', ''), reverse=True)
@@ -69,54 +163,492 @@ class DynamoDBService:
             print(f"Error obteniendo trades: {e}")
             raise e
     
-    def update_trade(self, trade_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Actualizar un trade existente"""
-        try:
-            # Preparar expresión de actualización
-            update_expression = "SET "
-            expression_attribute_values = {}
-            expression_attribute_names = {}
-            
-            for key, value in updates.items():
-                if key != 'id':  # No permitir actualizar el ID
-                    attr_name = f"#{key}"
-                    attr_value = f":{key}"
-                    
-                    update_expression += f"{attr_name} = {attr_value}, "
-                    expression_attribute_names[attr_name] = key
-                    expression_attribute_values[attr_value] = value
-            
-            # Agregar updated_at
-            update_expression += "#updated_at = :updated_at"
-            expression_attribute_names["#updated_at"] = "updated_at"
-            expression_attribute_values[":updated_at"] = datetime.now().isoformat()
-            
-            # Remover la coma extra
-            update_expression = update_expression.rstrip(", ")
-            
-            response = self.table.update_item(
-                Key={'id': trade_id},
-                UpdateExpression=update_expression,
-                ExpressionAttributeNames=expression_attribute_names,
-                ExpressionAttributeValues=expression_attribute_values,
-                ReturnValues="ALL_NEW"
+    def _page_plan(self, filters: TradeFilters, next_token: Optional[str],
+                   index_name: Optional[str]) -> Tuple[QueryPlan, Optional[Dict[str, Any]]]:
+        """Plan y ``ExclusiveStartKey`` de una página.
+        
+        El token guarda el índice que lo generó: las páginas siguientes siguen por
+        ese índice aunque las estimaciones del planificador hayan cambiado (la
+        clave de un índice no sirve como ``ExclusiveStartKey`` en otro).
+        """
+        cursor = decode_cursor(next_token)
+        if not cursor:
+            return self.planner.plan(filters, index_name), None
+        token_index, start_key = cursor.get('index'), cursor.get('key')
+        if not isinstance(token_index, str) or not isinstance(start_key, dict):
+            raise ValueError("next_token inválido")
+        if index_name and index_name != token_index:
+            raise ValueError(f"next_token es del índice {token_index}, no de {index_name}")
+        plan = self.planner.plan(filters, token_index)
+        attribute, value = plan.partition
+        if start_key.get(attribute) != value:
+            raise ValueError("next_token no corresponde a estos filtros")
+        return plan, start_key
+    
+    @staticmethod
+    def _page_token(plan: QueryPlan, last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+        if not last_evaluated_key:
+            return None
+        return encode_cursor({'index': plan.index_name, 'key': last_evaluated_key})
+    
+    def query_trades(self, filters: Optional[TradeFilters] = None, limit: int = 50,
+                     next_token: Optional[str] = None, ascending: bool = False,
+                     index_name: Optional[str] = None) -> Dict[str, Any]:
+        """Obtener una página de trades filtrados por el camino de acceso más barato.
+        
+        El planificador elige el índice; el rango de fechas se resuelve con la
+        condición de clave y el resto de los filtros con FilterExpression. Como
+        DynamoDB aplica ``Limit`` antes del filtro, una página puede traer menos
+        de ``limit`` items aunque haya más resultados (``next_token``).
+        """
+        try:
+            plan, start_key = self._page_plan(filters or TradeFilters(), next_token, index_name)
+            query_kwargs = plan.query_kwargs(ascending)
+            query_kwargs['Limit'] = limit
+            if start_key:
+                query_kwargs['ExclusiveStartKey'] = start_key
+            
+            response = self.table.query(**query_kwargs)
+            
+            return {
+                'items': response.get('Items', []),
+                'next_token': self._page_token(plan, response.get('LastEvaluatedKey')),
+                'plan': plan.describe(),
+                'scanned_count': response.get('ScannedCount', 0),
+                'consumed_capacity': response.get('ConsumedCapacity', {}).get('CapacityUnits')
+            }
+            
+        except ClientError as e:
+            print(f"Error consultando trades: {e}")
+            raise e
+    
+    def query_trade_records(self, filters: Optional[TradeFilters] = None, limit: int = 50,
+                            next_token: Optional[str] = None, ascending: bool = False,
+                            index_name: Optional[str] = None,
+                            fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Igual que ``query_trades`` pero por el cliente de bajo nivel: los items llegan
+        como registros planos listos para serializar (``trade_codec``), sin ``Decimal``.
+        
+        Con ``fields`` DynamoDB devuelve solo esos atributos (``ProjectionExpression``):
+        menos bytes y menos decodificación, aunque la capacidad leída es la misma.
+        """
+        try:
+            plan, start_key = self._page_plan(filters or TradeFilters(), next_token, index_name)
+            query_kwargs = plan.query_kwargs(ascending)
+            query_kwargs['Limit'] = limit
+            if fields:
+                query_kwargs.update(projection_kwargs(fields, query_kwargs['ExpressionAttributeNames']))
+            
+            if start_key:
+                query_kwargs['ExclusiveStartKey'] = start_key
+            
+            response = self.raw_client.query(TableName=self.table.name, **encode_request(query_kwargs))
+            
+            return {
+                'items': [decode_trade(item, fields) for item in response.get('Items', [])],
+                'next_token': self._page_token(plan, decode_item(response.get('LastEvaluatedKey'))),
+                'plan': plan.describe(),
+                'scanned_count': response.get('ScannedCount', 0),
+                'consumed_capacity': response.get('ConsumedCapacity', {}).get('CapacityUnits')
+            }
+            
+        except ClientError as e:
+            print(f"Error consultando trades: {e}")
+            raise e
+    
+    def get_all_trade_records(self) -> List[Dict[str, Any]]:
+        """Todos los trades como registros planos (scan paralelo de bajo nivel), más recientes primero"""
+        fields = list(TRADE_FIELDS) + ['created_at']
+        try:
+            pages = parallel_scan(
+                self.raw_client, self.table.name,
+                segments=SCAN_SEGMENTS, queue_pages=SCAN_QUEUE_PAGES, **projection_kwargs(fields)
             )
+            items = [item for page in pages for item in page]
+        except ClientError as e:
+            print(f"Error obteniendo trades: {e}")
+            raise e
+        items.sort(key=lambda item: item.get('created_at', {}).get('S', ''), reverse=True)
+        return [decode_trade(item) for item in items]
+    
+    def _index_cardinality(self, index_name: str, par: Optional[str]) -> int:
+        """Items en la partición de un índice, según los agregados"""
+        if index_name == 'par-index':
+            return int(self.aggregates.read_row('par', par).get('trades', 0))
+        total = self.aggregates.read_row('total', 'all')
+        field = {OPEN_INDEX_NAME: 'open_trades', CLOSED_INDEX_NAME: 'closed_trades'}.get(index_name, 'trades')
+        return int(total.get(field, 0))
+    
+    def update_trade(self, trade_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Actualizar un trade existente y sus agregados en una misma transacción"""
+        try:
+            # No permitir actualizar el ID
+            updates = {k: v for k, v in updates.items() if k not in ('id', 'updated_at')}
+            for attempt in range(MAX_WRITE_ATTEMPTS):
+                old = self._get_consistent(trade_id)
+                if not old:
+                    return None
+                
+                operation, new = self._conditional_update(old, updates)
+                if self._transact_trade_write(operation, old, new):
+                    return new
             
-            return response.get('Attributes')
+            raise ConcurrentModificationError(f"Trade {trade_id} modificado concurrentemente")
             
         except ClientError as e:
             print(f"Error actualizando trade: {e}")
             raise e
     
     def delete_trade(self, trade_id: int) -> bool:
-        """Eliminar un trade"""
+        """Eliminar un trade y descontarlo de los agregados"""
         try:
-            self.table.delete_item(Key={'id': trade_id})
-            return True
+            for attempt in range(MAX_WRITE_ATTEMPTS):
+                old = self._get_consistent(trade_id)
+                if not old:
+                    return False
+                
+                expression_attribute_names = {}
+                expression_attribute_values = {}
+                condition = self._unchanged_condition(old, expression_attribute_names, expression_attribute_values)
+                
+                operation = {
+                    'Delete': {
+                        'TableName': self.table.name,
+                        'Key': {'id': trade_id},
+                        'ConditionExpression': condition,
+                        'ExpressionAttributeNames': expression_attribute_names
+                    }
+                }
+                if expression_attribute_values:
+                    operation['Delete']['ExpressionAttributeValues'] = expression_attribute_values
+                if self._transact_trade_write(operation, old, None):
+                    return True
+            
+            raise ConcurrentModificationError(f"Trade {trade_id} modificado concurrentemente")
+            
         except ClientError as e:
             print(f"Error eliminando trade: {e}")
             raise e
     
+    def _get_consistent(self, trade_id: int) -> Optional[Dict[str, Any]]:
+        response = self.table.get_item(Key={'id': trade_id}, ConsistentRead=True)
+        return response.get('Item')
+    
+    @staticmethod
+    def _unchanged_condition(old: Dict[str, Any], names: Dict[str, str], values: Dict[str, Any]) -> str:
+        """Condición de concurrencia optimista: el trade no cambió desde que se leyó"""
+        names["#updated_at"] = "updated_at"
+        if old.get('updated_at') is None:
+            names["#id"] = "id"
+            return "attribute_exists(#id) AND attribute_not_exists(#updated_at)"
+        values[":previous_updated_at"] = old['updated_at']
+        return "#updated_at = :previous_updated_at"
+    
+    def _conditional_update(self, old: Dict[str, Any], updates: Dict[str, Any]):
+        """Operación Update condicionada a que el trade no haya cambiado, y el item resultante"""
+        now = datetime.now().isoformat()
+        new = {**old, **updates, 'updated_at': now}
+        status_set, status_remove = _status_keys(new)
+        
+        names = {'#updated_at': 'updated_at'}
+        values = {':updated_at': now}
+        clauses = ["#updated_at = :updated_at"]
+        for i, (key, value) in enumerate({**updates, **status_set}.items()):
+            names[f"#u{i}"] = key
+            values[f":u{i}"] = to_dynamo(value)
+            clauses.append(f"#u{i} = :u{i}")
+        update_expression = "SET " + ", ".join(clauses)
+        
+        removed = [key for key in status_remove if key in old]
+        if removed:
+            for i, key in enumerate(removed):
+                names[f"#r{i}"] = key
+                new.pop(key, None)
+            update_expression += " REMOVE " + ", ".join(f"#r{i}" for i in range(len(removed)))
+        new.update(status_set)
+        condition = self._unchanged_condition(old, names, values)
+        
+        operation = {
+            'Update': {
+                'TableName': self.table.name,
+                'Key': {'id': old['id']},
+                'UpdateExpression': update_expression,
+                'ConditionExpression': condition,
+                'ExpressionAttributeNames': names,
+                'ExpressionAttributeValues': values
+            }
+        }
+        return operation, new
+    
+    def _transact_trade_write(self, operation: Dict[str, Any], old: Optional[Dict[str, Any]],
+                              new: Optional[Dict[str, Any]]) -> bool:
+        """Escribir el trade junto con el delta de sus agregados y la nueva versión de la colección.
+        
+        Devuelve False si la condición sobre el trade falló (escritura concurrente).
+        """
+        delta = aggregate_delta(old, new)
+        trade = new or old
+        try:
+            self._transact_versioned([operation] + self.aggregates.update_ops(delta), [(trade['id'], new)])
+            return True
+        except ClientError as e:
+            reasons = e.response.get('CancellationReasons') or []
+            if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+                return False
+            raise e
+    
+    def _transact_versioned(self, operations: List[Dict[str, Any]], changes: List[tuple]) -> None:
+        """TransactWriteItems de ``operations`` más la nueva versión y su registro de cambios.
+        
+        ``changes`` son pares ``(trade_id, item)`` (``None`` si se eliminó). Si otro
+        proceso avanzó la versión entre medio, o la transacción chocó con otra
+        (``TransactionConflict``) o con throttling en cualquier operación, se
+        reintenta releyendo la versión. Si falló la condición de un trade, o por
+        cualquier otro motivo, la cancelación se propaga. Al confirmar se avisa a
+        los listeners.
+        """
+        feed = [(trade_id, 'delete' if item is None else 'put') for trade_id, item in changes]
+        for attempt in range(VERSION_MAX_ATTEMPTS):
+            version_ops, new_version = self.changes.write_ops(self.changes.known_version(), feed)
+            try:
+                self.client.transact_write_items(TransactItems=operations + version_ops)
+            except ClientError as e:
+                codes = [reason.get('Code') for reason in e.response.get('CancellationReasons') or []]
+                trade_failed = 'ConditionalCheckFailed' in codes[:len(operations)]
+                version_moved = codes[len(operations):len(operations) + 1] == ['ConditionalCheckFailed']
+                transient = any(code in RETRYABLE_CANCELLATIONS for code in codes)
+                if trade_failed or not (version_moved or transient):
+                    raise e
+                # Otra escritura pudo avanzar la versión: releerla antes de reintentar
+                self.changes.forget()
+                _backoff(attempt)
+                continue
+            self.changes.advance(new_version)
+            self._notify(new_version, changes)
+            return
+        raise ConcurrentModificationError("La versión de la colección cambió demasiadas veces")
+    
+    # Operaciones en lote
+    
+    def batch_create_trades(self, trades_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Crear muchos trades con BatchWriteItem (25 por llamada) y un único delta de agregados.
+        
+        Los cambios se registran después de escribir los trades, así que la nueva
+        versión nunca es visible antes que los datos. Devuelve un resultado por
+        trade, en el mismo orden que la entrada.
+        """
+        try:
+            trade_ids = self.id_allocator.allocate(len(trades_data))
+            items = [self._build_item(trade_id, data) for trade_id, data in zip(trade_ids, trades_data)]
+            results = [{'index': i, 'id': item['id'], 'status': 'created', 'trade': item} for i, item in enumerate(items)]
+            
+            requests = [(i, {'PutRequest': {'Item': to_dynamo(item)}}) for i, item in enumerate(items)]
+            failed = self._batch_write(requests)
+            for index, error in failed.items():
+                results[index] = {'index': index, 'id': items[index]['id'], 'status': 'error', 'error': error}
+            
+            written = [items[r['index']] for r in results if r['status'] == 'created']
+            self._apply_aggregate_delta(merge_deltas(aggregate_delta(None, item) for item in written))
+            for chunk in _chunks(written, TRANSACT_MAX_ITEMS - 1):
+                self._transact_versioned([], [(item['id'], item) for item in chunk])
+            return results
+            
+        except ClientError as e:
+            print(f"Error creando trades en lote: {e}")
+            raise e
+    
+    def batch_get_trades(self, trade_ids: List[int]) -> Dict[str, Any]:
+        """Obtener muchos trades con BatchGetItem (100 por llamada)"""
+        try:
+            found = {}
+            unique_ids = list(dict.fromkeys(int(trade_id) for trade_id in trade_ids))
+            for chunk in _chunks(unique_ids, BATCH_GET_SIZE):
+                request = {self.table.name: {'Keys': [{'id': trade_id} for trade_id in chunk]}}
+                for attempt in range(BATCH_MAX_ATTEMPTS):
+                    response = self.client.batch_get_item(RequestItems=request)
+                    for item in response.get('Responses', {}).get(self.table.name, []):
+                        found[int(item['id'])] = item
+                    request = response.get('UnprocessedKeys') or {}
+                    if not request:
+                        break
+                    _backoff(attempt)
+                if request:
+                    raise BatchIncompleteError(f"{len(request[self.table.name]['Keys'])} claves sin procesar")
+            
+            return {
+                'trades': [found[trade_id] for trade_id in unique_ids if trade_id in found],
+                'missing': [trade_id for trade_id in unique_ids if trade_id not in found]
+            }
+            
+        except ClientError as e:
+            print(f"Error obteniendo trades en lote: {e}")
+            raise e
+    
+    def batch_close_trades(self, closes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cerrar muchos trades con TransactWriteItems, cada grupo junto con sus agregados"""
+        def operation(old, close):
+            updates = {
+                'fecha_cierre': close['fecha_cierre'],
+                'motivo_cierre': close['motivo_cierre']
+            }
+            if close.get('precio_cierre') is not None:
+                updates['precio_cierre'] = close['precio_cierre']
+            return self._conditional_update(old, updates)
+        
+        try:
+            return self._batch_transact(closes, operation, 'closed')
+        except ClientError as e:
+            print(f"Error cerrando trades en lote: {e}")
+            raise e
+    
+    def batch_delete_trades(self, trade_ids: List[int]) -> List[Dict[str, Any]]:
+        """Eliminar muchos trades con TransactWriteItems, descontándolos de los agregados"""
+        def operation(old, _):
+            names = {}
+            values = {}
+            op = {
+                'Delete': {
+                    'TableName': self.table.name,
+                    'Key': {'id': old['id']},
+                    'ConditionExpression': self._unchanged_condition(old, names, values),
+                    'ExpressionAttributeNames': names
+                }
+            }
+            if values:
+                op['Delete']['ExpressionAttributeValues'] = values
+            return op, None
+        
+        try:
+            return self._batch_transact([{'id': trade_id} for trade_id in trade_ids], operation, 'deleted')
+        except ClientError as e:
+            print(f"Error eliminando trades en lote: {e}")
+            raise e
+    
+    def _batch_transact(self, entries: List[Dict[str, Any]], build_operation, status: str) -> List[Dict[str, Any]]:
+        """Aplicar una operación por trade en transacciones de hasta ``BATCH_TRANSACT_SIZE`` trades.
+        
+        Los trades inexistentes o modificados concurrentemente se reportan y
+        se excluyen; el resto del grupo se reintenta.
+        """
+        current = {int(t['id']): t for t in self.batch_get_trades([e['id'] for e in entries])['trades']}
+        results = []
+        pending = []
+        seen = set()
+        for index, entry in enumerate(entries):
+            trade_id = int(entry['id'])
+            if trade_id not in current:
+                results.append({'index': index, 'id': trade_id, 'status': 'not_found'})
+            elif trade_id in seen:
+                results.append({'index': index, 'id': trade_id, 'status': 'duplicate'})
+            else:
+                seen.add(trade_id)
+                pending.append((index, entry))
+        
+        return sorted(results + self._run_transactions(pending, current, build_operation, status),
+                      key=lambda r: r['index'])
+    
+    @staticmethod
+    def _transaction_chunks(pending: List[tuple], current: Dict[int, Dict[str, Any]],
+                            build_operation) -> Iterator[List[tuple]]:
+        """Agrupar ``(índice, entrada)`` en grupos de hasta ``BATCH_TRANSACT_SIZE`` trades cuyas
+        operaciones (trade, registro de cambios, versión y filas agregadas distintas) quepan
+        en ``TRANSACT_MAX_ITEMS``"""
+        chunk: List[tuple] = []
+        keys: set = set()
+        for index, entry in pending:
+            old = current.get(int(entry['id']))
+            entry_keys = set(aggregate_delta(old, build_operation(old, entry)[1]))
+            size = 2 * (len(chunk) + 1) + 1 + len(keys | entry_keys)
+            if chunk and (len(chunk) == BATCH_TRANSACT_SIZE or size > TRANSACT_MAX_ITEMS):
+                yield chunk
+                chunk, keys = [], set()
+            chunk.append((index, entry))
+            keys |= entry_keys
+        if chunk:
+            yield chunk
+    
+    def _run_transactions(self, pending: List[tuple], current: Dict[int, Dict[str, Any]],
+                          build_operation, status: str) -> List[Dict[str, Any]]:
+        """Escribir ``(índice, entrada)`` en los grupos de ``_transaction_chunks``, cada uno con sus
+        agregados y su versión; los trades cuya condición falla se reportan como ``conflict``"""
+        results = []
+        for chunk in self._transaction_chunks(pending, current, build_operation):
+            for attempt in range(BATCH_MAX_ATTEMPTS):
+                if not chunk:
+                    break
+                operations = []
+                deltas = []
+                new_items = []
+                for index, entry in chunk:
+                    old = current.get(int(entry['id']))
+                    operation, new = build_operation(old, entry)
+                    operations.append(operation)
+                    deltas.append(aggregate_delta(old, new))
+                    new_items.append(new)
+                
+                changes = [(int(entry['id']), new) for (_, entry), new in zip(chunk, new_items)]
+                try:
+                    self._transact_versioned(
+                        operations + self.aggregates.update_ops(merge_deltas(deltas)), changes
+                    )
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'TransactionCanceledException':
+                        raise e
+                    # Los trades que cambiaron desde la lectura se reportan y se excluyen;
+                    # cualquier otra cancelación (conflicto, throttling) reintenta el grupo
+                    reasons = e.response.get('CancellationReasons') or []
+                    conflicts = {
+                        i for i, reason in enumerate(reasons[:len(chunk)])
+                        if reason.get('Code') == 'ConditionalCheckFailed'
+                    }
+                    for i in sorted(conflicts):
+                        index, entry = chunk[i]
+                        results.append({'index': index, 'id': int(entry['id']), 'status': 'conflict'})
+                    chunk = [c for i, c in enumerate(chunk) if i not in conflicts]
+                    _backoff(attempt)
+                    continue
+                
+                for (index, entry), new in zip(chunk, new_items):
+                    result = {'index': index, 'id': int(entry['id']), 'status': status}
+                    if new is not None:
+                        result['trade'] = new
+                    results.append(result)
+                chunk = []
+            
+            for index, entry in chunk:
+                results.append({'index': index, 'id': int(entry['id']), 'status': 'error',
+                                'error': 'Transacción cancelada tras varios reintentos'})
+        
+        return results
+    
+    def _batch_write(self, requests: List[tuple]) -> Dict[int, str]:
+        """BatchWriteItem en grupos de 25, reintentando UnprocessedItems con backoff exponencial.
+        
+        Recibe pares ``(índice, request)`` y devuelve los índices que no se pudieron escribir.
+        """
+        failed = {}
+        for chunk in _chunks(requests, BATCH_WRITE_SIZE):
+            pending = chunk
+            for attempt in range(BATCH_MAX_ATTEMPTS):
+                response = self.client.batch_write_item(
+                    RequestItems={self.table.name: [request for _, request in pending]}
+                )
+                unprocessed = response.get('UnprocessedItems', {}).get(self.table.name, [])
+                if not unprocessed:
+                    pending = []
+                    break
+                # Los items sin procesar se identifican por su clave
+                unprocessed_ids = {_request_id(request) for request in unprocessed}
+                pending = [(i, r) for i, r in pending if _request_id(r) in unprocessed_ids]
+                _backoff(attempt)
+            for index, _ in pending:
+                failed[index] = 'Sin procesar tras varios reintentos'
+        return failed
+    
+    def _apply_aggregate_delta(self, delta) -> None:
+        for chunk in _chunks(self.aggregates.update_ops(delta), TRANSACT_MAX_ITEMS):
+            self.client.transact_write_items(TransactItems=chunk)
+    
     def get_trades_by_par(self, par: str) -> List[Dict[str, Any]]:
         """Obtener trades por par usando el índice secundario"""
         try:
@@ -146,35 +678,119 @@ class DynamoDBService:
             print(f"Error obteniendo trades por par: {e}")
             raise e
     
-    def _get_next_id(self) -> int:
-        """Obtener el siguiente ID disponible"""
+    def scan_pages(self, fields: Optional[List[str]] = None, filters: Optional[TradeFilters] = None,
+                   segments: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Recorrer la tabla completa con un scan paralelo, página a página y sin ordenar.
+        
+        ``fields`` limita los atributos leídos y ``filters`` se aplica como
+        FilterExpression (las mismas condiciones que ``query_trades``).
+        """
+        scan_kwargs: Dict[str, Any] = {}
+        if filters is not None and filters.model_dump(exclude_none=True):
+            scan_kwargs = self.planner.plan(filters).scan_kwargs()
+        if fields:
+            scan_kwargs.update(projection_kwargs(fields, scan_kwargs.get('ExpressionAttributeNames')))
         try:
-            # Escanear para obtener el ID más alto
-            response = self.table.scan(
-                ProjectionExpression='#id',
-                ExpressionAttributeNames={'#id': 'id'}
+            yield from parallel_scan(
+                self.client, self.table.name,
+                segments=segments or SCAN_SEGMENTS, queue_pages=SCAN_QUEUE_PAGES, **scan_kwargs
             )
+        except ClientError as e:
+            print(f"Error recorriendo trades: {e}")
+            raise e
+    
+    def get_collection_version(self) -> Dict[str, Any]:
+        """Versión actual de la colección de trades y fecha de su última escritura"""
+        try:
+            return self.changes.current()
+        except ClientError as e:
+            print(f"Error obteniendo versión: {e}")
+            raise e
+    
+    def get_changes(self, since: int) -> Dict[str, Any]:
+        """Trades creados o modificados y IDs eliminados después de la versión ``since``.
+        
+        Los trades se devuelven con su estado actual (puede ser posterior a
+        ``version``; aplicarlos de nuevo es idempotente). ``ChangesExpired`` si
+        los cambios desde ``since`` ya no se conservan.
+        """
+        try:
+            state = self.changes.current()
+            if since >= state['version']:
+                return {**state, 'trades': [], 'deleted': []}
+            oldest = self.changes.oldest_version()
+            if oldest is None or since + 1 < oldest:
+                raise ChangesExpired(f"No se conservan los cambios desde la versión {since}")
             
-            max_id = 0
-            for item in response.get('Items', []):
-                item_id = item.get('id', 0)
-                if isinstance(item_id, int) and item_id > max_id:
-                    max_id = item_id
-            
-            return max_id + 1
+            touched = list(dict.fromkeys(int(e['trade_id']) for e in self.changes.since(since, state['version'])))
+            found = self.batch_get_trades(touched)
+            return {
+                **state,
+                'trades': found['trades'],
+                'deleted': found['missing']
+            }
+        except ClientError as e:
+            print(f"Error obteniendo cambios: {e}")
+            raise e
+    
+    def get_stats_summary(self) -> Dict[str, Any]:
+        """Estadísticas precalculadas a partir de las filas agregadas"""
+        try:
+            return self.aggregates.summary()
+        except ClientError as e:
+            print(f"Error obteniendo agregados: {e}")
+            raise e
+    
+    def get_aggregate_rows(self, scope: str, low: Optional[str] = None,
+                           high: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Filas agregadas de un ámbito en un rango de buckets (una Query por página)"""
+        try:
+            return self.aggregates.read_scope(scope, low, high)
+        except ClientError as e:
+            print(f"Error obteniendo agregados: {e}")
+            raise e
+    
+    def reconcile_aggregates(self, apply: bool = False) -> List[Dict[str, Any]]:
+        """Recalcular los agregados desde los trades y devolver el drift encontrado"""
+        return self.aggregates.reconcile(self.scan_trades(STATS_FIELDS), apply=apply)
+    
+    def get_max_trade_id(self) -> int:
+        """Obtener el ID más alto existente (recorre todas las páginas, solo para migraciones)"""
+        try:
+            return max((int(item.get('id', 0)) for item in self.scan_trades(['id'])), default=0)
             
         except ClientError as e:
-            print(f"Error obteniendo siguiente ID: {e}")
-            # Si hay error, usar timestamp como fallback
-            return int(datetime.now().timestamp())
+            print(f"Error obteniendo ID máximo: {e}")
+            raise e
     
-    def close_trade(self, trade_id: int, fecha_cierre: str, motivo_cierre: str) -> Optional[Dict[str, Any]]:
-        """Cerrar un trade"""
-        updates = {
-            'fecha_cierre': fecha_cierre,
-            'motivo_cierre': motivo_cierre
-        }
-        return self.update_trade(trade_id, updates)
-
-# Instancia global del servicio
-dynamodb_service = DynamoDBService() 
\ No newline at end of file
+    def backfill_index_keys(self) -> int:
+        """Agregar las claves de los índices (fecha, abiertos/cerrados) a trades creados antes de existir"""
+        try:
+            scan_kwargs = {
+                'ProjectionExpression': '#id, #fecha_cierre',
+                'FilterExpression': 'attribute_not_exists(#pk) OR (attribute_not_exists(#open) AND attribute_not_exists(#closed))',
+                'ExpressionAttributeNames': {
+                    '#id': 'id', '#fecha_cierre': 'fecha_cierre', '#pk': 'gsi_pk',
+                    '#open': 'open_pk', '#closed': 'closed_pk'
+                }
+            }
+            updated = 0
+            pages = parallel_scan(
+                self.client, self.table.name,
+                segments=SCAN_SEGMENTS, queue_pages=SCAN_QUEUE_PAGES, **scan_kwargs
+            )
+            for page in pages:
+                for item in page:
+                    status_key, status_value = next(iter(_status_keys(item)[0].items()))
+                    self.table.update_item(
+                        Key={'id': item['id']},
+                        UpdateExpression='SET #pk = :pk, #status = :status',
+                        ExpressionAttributeNames={'#pk': 'gsi_pk', '#status': status_key},
+                        ExpressionAttributeValues={':pk': TIME_INDEX_PARTITION, ':status': status_value}
+                    )
+                    updated += 1
+            return updated
+            
+        except ClientError as e:
+            print(f"Error actualizando claves de índices: {e}")
+            raise e
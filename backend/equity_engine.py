@@ -0,0 +1,189 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+import threading
+import numpy as np
+from stats_engine import TradeColumns
+
+# Histograma de R-múltiplos: tramos de medio R entre -3R y +5R (más las dos colas)
+R_BIN_EDGES = np.arange(-3.0, 5.5, 0.5)
+
+class ClosedTrades:
+    """Trades cerrados con precio de salida conocido y riesgo definido, ordenados por
+    fecha de cierre (y ID), con su resultado en R-múltiplos.
+
+    El riesgo de un trade es la distancia entre la entrada y el stop loss, así que
+    ``r = ganancia / |precio_apertura - stop_loss|`` (1R = se perdió lo arriesgado).
+    Así se pueden sumar trades de pares con precios muy distintos.
+    """
+
+    def __init__(self, columns: TradeColumns, closed_at: np.ndarray):
+        profit = columns.profit
+        risk = np.abs(columns.entry - columns.stop_loss)
+        realized = ~np.isnan(profit)
+        with np.errstate(invalid='ignore'):
+            has_risk = risk > 0
+        self.closed = int(columns.closed.sum())
+        self.without_exit = self.closed - int(realized.sum())
+        self.without_risk = int((realized & ~has_risk).sum())
+
+        index = np.flatnonzero(realized & has_risk)
+        order = index[np.lexsort((columns.ids[index], closed_at[index]))]
+        self.size = len(order)
+        self.ids = columns.ids[order]
+        self.pars = columns.pars[order]
+        self.closed_at = closed_at[order]
+        self.r = profit[order] / risk[order]
+
+    @classmethod
+    def from_trades(cls, trades: Iterable[Dict[str, Any]]) -> 'ClosedTrades':
+        trades = list(trades)
+        closed_at = np.array([t.get('fecha_cierre') or '' for t in trades], dtype=str)
+        return cls(TradeColumns(trades), closed_at)
+
+def _finite(value: float) -> Optional[float]:
+    """``None`` en lugar de infinito/NaN (JSON no los admite)"""
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+def _ratio(numerator: float, denominator: float) -> Optional[float]:
+    return _finite(numerator / denominator) if denominator else None
+
+def equity_curve(r: np.ndarray, capital: float, risk: float, compound: bool = False):
+    """Capital después de cada trade (con el punto inicial) arriesgando ``risk`` por trade.
+
+    Sin ``compound`` se arriesga siempre ``risk`` del capital inicial; con ``compound``,
+    ``risk`` del capital del momento (se acumula en escala logarítmica para no
+    desbordar con muchos trades; un trade que pierde todo deja el capital en 0).
+    Devuelve ``(equity, drawdown)``, el drawdown como fracción del máximo anterior.
+    """
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        if compound:
+            log_equity = np.log(capital) + np.concatenate(([0.0], np.cumsum(np.log1p(np.maximum(risk * r, -1.0)))))
+            drawdown = np.exp(log_equity - np.maximum.accumulate(log_equity)) - 1.0
+            return np.exp(log_equity), drawdown
+        equity = capital * (1.0 + risk * np.concatenate(([0.0], np.cumsum(r))))
+        peak = np.maximum.accumulate(equity)
+        return equity, equity / peak - 1.0
+
+def r_distribution(r: np.ndarray) -> List[Dict[str, Any]]:
+    """Cuántos trades caen en cada tramo de medio R (``from``/``to`` ``None`` en las colas)"""
+    counts = np.bincount(np.searchsorted(R_BIN_EDGES, r, side='right'), minlength=len(R_BIN_EDGES) + 1)
+    edges = [None] + [float(edge) for edge in R_BIN_EDGES] + [None]
+    return [{'from': edges[i], 'to': edges[i + 1], 'trades': int(count)} for i, count in enumerate(counts)]
+
+def compute_equity(closed: ClosedTrades, capital: float = 10000.0, risk: float = 0.01,
+                   compound: bool = False, points: int = 500) -> Dict[str, Any]:
+    """Curva de capital, drawdown máximo y métricas de riesgo con operaciones vectorizadas.
+
+    Sharpe y Sortino son por trade (media de R sobre su desviación, o sobre la
+    desviación de las pérdidas), sin anualizar. ``curve`` trae como mucho
+    ``points`` puntos repartidos a lo largo de la curva, siempre con el máximo
+    y el mínimo del drawdown más profundo.
+    """
+    r = closed.r
+    n = closed.size
+    equity, drawdown = equity_curve(r, capital, risk, compound)
+
+    wins, losses = r[r > 0], r[r < 0]
+    gross_win, gross_loss = float(wins.sum()), float(-losses.sum())
+    mean = float(r.mean()) if n else 0.0
+    std = float(r.std(ddof=1)) if n > 1 else 0.0
+    downside = float(np.sqrt(np.mean(np.minimum(r, 0.0) ** 2))) if n else 0.0
+
+    trough = int(np.argmin(drawdown))
+    peak = int(np.argmax(equity[:trough + 1]))
+    recovered = np.flatnonzero(equity[trough + 1:] >= equity[peak]) if trough > peak else []
+    recovery = trough + 1 + int(recovered[0]) if len(recovered) else None
+    with np.errstate(invalid='ignore'):
+        amount = equity[peak] - equity[trough]  # inf - inf si la curva compuesta desborda
+
+    def point(k: int) -> Dict[str, Any]:
+        return {
+            'trade': k,
+            'id': int(closed.ids[k - 1]) if k else None,
+            'par': str(closed.pars[k - 1]) if k else None,
+            'date': str(closed.closed_at[k - 1]) if k else None,
+            'r': float(r[k - 1]) if k else None,
+            'equity': _finite(equity[k]),
+            'drawdown_pct': float(drawdown[k] * 100)
+        }
+
+    sample = np.unique(np.concatenate((
+        np.linspace(0, n, min(points, n + 1)).round().astype(np.int64), [peak, trough]
+    )))
+    return {
+        'capital': capital,
+        'risk': risk,
+        'compound': compound,
+        'closed_trades': closed.closed,
+        'trades': n,
+        'without_exit': closed.without_exit,
+        'without_risk': closed.without_risk,
+        'final_equity': _finite(equity[-1]),
+        'return_pct': _finite((equity[-1] / capital - 1) * 100),
+        'win_rate': float(len(wins) / n * 100) if n else 0.0,
+        'total_r': float(r.sum()),
+        'expectancy_r': mean,
+        'average_win_r': float(wins.mean()) if len(wins) else 0.0,
+        'average_loss_r': float(losses.mean()) if len(losses) else 0.0,
+        'profit_factor': _ratio(gross_win, gross_loss),
+        'sharpe': _ratio(mean, std),
+        'sortino': _ratio(mean, downside),
+        'max_drawdown': {
+            'pct': float(drawdown[trough] * 100),
+            'amount': _finite(amount),
+            'peak': point(peak),
+            'trough': point(trough),
+            'recovered': point(recovery) if recovery is not None else None,
+            'trades': trough - peak
+        },
+        'r_distribution': r_distribution(r),
+        'curve': [point(int(k)) for k in sample]
+    }
+
+class EquityEngine:
+    """``compute_equity`` con caché por versión de los datos.
+
+    La preparación (ordenar por fecha de cierre y calcular los R-múltiplos) es
+    lo caro; se guarda por ``key`` (origen, par y versión de la colección), así
+    que mientras no haya escrituras cada combinación de parámetros se calcula
+    solo con los kernels de NumPy y los resultados también se reutilizan.
+    """
+
+    def __init__(self, max_prepared: int = 4, max_results: int = 64):
+        self.max_prepared = max_prepared
+        self.max_results = max_results
+        self._prepared: 'OrderedDict[Hashable, ClosedTrades]' = OrderedDict()
+        self._results: 'OrderedDict[Hashable, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _remember(entries: OrderedDict, key: Hashable, value: Any, limit: int) -> None:
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > limit:
+            entries.popitem(last=False)
+
+    def prepared(self, key: Hashable, loader: Callable[[], ClosedTrades]) -> ClosedTrades:
+        with self._lock:
+            closed = self._prepared.get(key)
+            if closed is not None:
+                self._prepared.move_to_end(key)
+                return closed
+        closed = loader()
+        with self._lock:
+            self._remember(self._prepared, key, closed, self.max_prepared)
+        return closed
+
+    def metrics(self, key: Hashable, loader: Callable[[], ClosedTrades], capital: float = 10000.0,
+                risk: float = 0.01, compound: bool = False, points: int = 500) -> Dict[str, Any]:
+        result_key = (key, capital, risk, compound, points)
+        with self._lock:
+            result = self._results.get(result_key)
+            if result is not None:
+                self._results.move_to_end(result_key)
+                return result
+        result = compute_equity(self.prepared(key, loader), capital, risk, compound, points)
+        with self._lock:
+            self._remember(self._results, result_key, result, self.max_results)
+        return result
@@ -0,0 +1,34 @@
+from decimal import Decimal
+from typing import Any
+import json
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json de la biblioteca estándar
+    orjson = None
+
+ORJSON_AVAILABLE = orjson is not None
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+def dumps(value: Any) -> bytes:
+    """Serializar a JSON (UTF-8, compacto) con orjson si está instalado"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """Respuesta JSON sin validación ni ``jsonable_encoder``; acepta bytes ya codificados"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
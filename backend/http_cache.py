@@ -0,0 +1,50 @@
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional
+import hashlib
+from fastapi import Request, Response
+
+def etag_for(version: int, *parts: Any) -> str:
+    """ETag fuerte de una representación: la versión de la colección y lo que la distingue
+    (parámetros de la consulta, ID del trade)"""
+    tag = f"v{version}"
+    if parts:
+        tag += "-" + hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+    return f'"{tag}"'
+
+def epoch_of(timestamp: Optional[str]) -> Optional[float]:
+    """``updated_at`` guardado (ISO en hora local del servidor) → epoch"""
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp).astimezone().timestamp()
+    except ValueError:
+        return None
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float]) -> bool:
+    """Evaluar ``If-None-Match`` (tiene prioridad) o ``If-Modified-Since``"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # Las fechas HTTP tienen resolución de segundos
+        return int(last_modified) <= since
+    return False
+
+def validator_headers(etag: str, last_modified: Optional[float], version: Optional[int] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    if version is not None:
+        headers["X-Trades-Version"] = str(version)
+    return headers
+
+def not_modified(etag: str, last_modified: Optional[float] = None, version: Optional[int] = None) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, last_modified, version))
@@ -0,0 +1,287 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
+import io
+import json
+import re
+import threading
+import time
+from botocore.exceptions import ClientError
+from trade_cache import MISS, InMemoryCache
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow es opcional: sin él no se generan variantes (se sirven los originales)
+    Image = None
+
+PILLOW_AVAILABLE = Image is not None
+
+# Formato → (formato de Pillow, Content-Type, opciones del codificador)
+ENCODERS = {
+    'avif': ('AVIF', 'image/avif', {'quality': 50, 'speed': 8}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+}
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Etiqueta EXIF de orientación; los valores 5 a 8 giran la imagen 90° (intercambian ancho y alto)
+EXIF_ORIENTATION = 0x0112
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+SOURCE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp', '.tif', '.tiff', '.avif')
+VARIANT_SUFFIX = re.compile(r"\.\d+w\.(?:avif|webp)$|\.variants\.json$")
+
+def available_formats(formats: Sequence[str]) -> List[str]:
+    """Los formatos pedidos que esta instalación de Pillow sabe codificar"""
+    if not PILLOW_AVAILABLE:
+        return []
+    return [f for f in formats if f in ENCODERS and features.check(f)]
+
+def variant_key(key: str, width: int, fmt: str) -> str:
+    """Clave determinista de una variante, junto al original: ``<original>.480w.webp``"""
+    return f"{key}.{width}w.{fmt}"
+
+def manifest_key(key: str) -> str:
+    return f"{key}.variants.json"
+
+def is_source_image(key: str) -> bool:
+    """Imagen original (por extensión), no una variante ni un manifiesto"""
+    return key.lower().endswith(SOURCE_EXTENSIONS) and not VARIANT_SUFFIX.search(key)
+
+def source_key(ref: str, bucket: str) -> str:
+    """Clave de S3 de una imagen de ``imagenes`` (se guardan como clave o como URL del bucket)"""
+    if not ref.startswith(("http://", "https://")):
+        return ref.lstrip("/")
+    url = urlparse(ref)
+    if url.hostname and url.hostname.startswith(f"{bucket}."):
+        return unquote(url.path.lstrip("/"))
+    if url.path.startswith(f"/{bucket}/"):  # estilo path: s3.amazonaws.com/<bucket>/<clave>
+        return unquote(url.path[len(bucket) + 2:])
+    raise ValueError(f"La imagen no está en el bucket {bucket}: {ref}")
+
+def render(data: bytes, widths: Sequence[int], formats: Sequence[str]) -> Tuple[Tuple[int, int], List[Dict[str, Any]]]:
+    """Decodificar una imagen y generar cada ancho en cada formato.
+
+    No se agranda: los anchos mayores que el original se reemplazan por el ancho
+    original. Cada tamaño se reduce desde el anterior (más grande), que es más
+    barato que partir siempre del original. Devuelve el tamaño original y las
+    variantes (``width``, ``height``, ``format``, ``body``).
+    """
+    image = Image.open(io.BytesIO(data))
+    # Tamaño original ya orientado, leído antes de reducir
+    transposed = image.getexif().get(EXIF_ORIENTATION, 1) in TRANSPOSED_ORIENTATIONS
+    size = (image.height, image.width) if transposed else image.size
+    # JPEG: decodificar ya reducido (1/2, 1/4, 1/8) si alcanza para el ancho mayor una vez
+    # orientada; draft trabaja sin orientar, así que con un giro de 90° la caja se invierte
+    widest = min(max(widths), size[0])
+    box = (widest, max(1, widest * size[1] // max(1, size[0])))
+    image.draft('RGB', box[::-1] if transposed else box)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    variants = []
+    for width in sorted({min(w, size[0]) for w in widths}, reverse=True):
+        height = max(1, round(image.height * width / image.width))
+        if width != image.width:
+            image = image.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            pil_format, _, options = ENCODERS[fmt]
+            out = io.BytesIO()
+            image.save(out, pil_format, **options)
+            variants.append({'width': width, 'height': height, 'format': fmt, 'body': out.getvalue()})
+    return size, variants
+
+def accepted_formats(accept: str, formats: Sequence[str]) -> List[str]:
+    """Formatos de variantes que el cliente declara en ``Accept``, en orden de preferencia"""
+    accept = accept.lower()
+    return [f for f in formats if ENCODERS[f][1] in accept]
+
+def best_variant(manifest: Dict[str, Any], width: int, formats: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """La variante más chica que cubre ``width`` (o la más grande si ninguna lo cubre) y,
+    entre los ``formats`` aceptados, la que menos pesa a ese ancho"""
+    candidates = [v for v in manifest['variants'] if v['format'] in formats]
+    if not candidates:
+        return None
+    widths = sorted({v['width'] for v in candidates})
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return min((v for v in candidates if v['width'] == chosen), key=lambda v: v['bytes'])
+
+class ImageVariants:
+    """Variantes redimensionadas (WebP/AVIF) de las imágenes de los trades.
+
+    ``submit`` encola el procesamiento de una clave en un pool de hilos propio
+    (Pillow libera el GIL al redimensionar y codificar) y descarta pedidos
+    repetidos mientras haya uno en curso. Las variantes se guardan junto al
+    original con claves deterministas y al final un manifiesto
+    (``<original>.variants.json``) que ``resolve`` lee (con caché en memoria)
+    para elegir la variante según ancho y formatos aceptados.
+    """
+
+    def __init__(self, s3_client, bucket: str, widths: Sequence[int] = (160, 480, 1280),
+                 formats: Sequence[str] = ('avif', 'webp'), workers: int = 2,
+                 max_source_bytes: int = 50 * 1024 * 1024, manifest_cache_entries: int = 10000):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.widths = tuple(sorted(widths))
+        self.formats = available_formats(formats)
+        self.max_source_bytes = max_source_bytes
+        self.workers = workers
+        # Los manifiestos no cambian salvo al regenerar (en este proceso); las ausencias expiran pronto
+        self._manifests = InMemoryCache(max_entries=manifest_cache_entries, default_ttl=0)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-variants")
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.formats)
+
+    def public_url(self, key: str) -> str:
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+    # Procesamiento
+
+    def submit(self, key: str, force: bool = False) -> Optional[Future]:
+        """Encolar ``key``; ``None`` si no hay nada que hacer (sin Pillow, ya procesada o en curso)"""
+        if not self.enabled or not is_source_image(key):
+            return None
+        if not force and self._manifests.get(key) not in (MISS, None):
+            return None
+        with self._lock:
+            if key in self._inflight:
+                return None
+            future = self._pool.submit(self._run, key, force)
+            self._inflight[key] = future
+        return future
+
+    def submit_many(self, refs: Iterable[str], force: bool = False) -> int:
+        """Encolar varias imágenes (claves o URLs del bucket); las ajenas al bucket se ignoran"""
+        queued = 0
+        for ref in refs:
+            try:
+                queued += self.submit(source_key(ref, self.bucket), force) is not None
+            except ValueError:
+                continue
+        return queued
+
+    def on_trade_changes(self, version: int, changes: List[Tuple[int, Optional[Dict[str, Any]]]]) -> None:
+        """Listener de escrituras: procesar las imágenes nuevas de los trades creados o modificados"""
+        self.submit_many(ref for _, item in changes if item for ref in item.get('imagenes') or [])
+
+    def _run(self, key: str, force: bool) -> Optional[Dict[str, Any]]:
+        try:
+            return self.process(key, force)
+        except Exception as e:
+            self.failed += 1
+            print(f"Error generando variantes de {key}: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def process(self, key: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Generar y subir las variantes de ``key`` (bloqueante). Devuelve el manifiesto,
+        o ``None`` si el original no existe"""
+        if not force:
+            manifest = self.manifest(key)
+            if manifest is not None:
+                self.skipped += 1
+                return manifest
+        start = time.perf_counter()
+        try:
+            original = self.s3.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise e
+        if original['ContentLength'] > self.max_source_bytes:
+            raise ValueError(f"Imagen de {original['ContentLength']} bytes (máximo {self.max_source_bytes})")
+        data = original['Body'].read()
+        (width, height), variants = render(data, self.widths, self.formats)
+
+        entries = []
+        for variant in variants:
+            target = variant_key(key, variant['width'], variant['format'])
+            self.s3.put_object(
+                Bucket=self.bucket, Key=target, Body=variant['body'],
+                ContentType=ENCODERS[variant['format']][1], CacheControl=CACHE_CONTROL
+            )
+            entries.append({
+                'key': target, 'width': variant['width'], 'height': variant['height'],
+                'format': variant['format'], 'bytes': len(variant['body'])
+            })
+        manifest = {
+            'source': key, 'width': width, 'height': height, 'bytes': len(data),
+            'content_type': original.get('ContentType'), 'variants': entries
+        }
+        # El manifiesto va último: si existe, todas las variantes ya están subidas
+        self.s3.put_object(Bucket=self.bucket, Key=manifest_key(key), Body=json.dumps(manifest).encode(),
+                           ContentType='application/json')
+        self._manifests.set(key, manifest)
+        self.processed += 1
+        self.bytes_in += len(data)
+        self.bytes_out += sum(e['bytes'] for e in entries)
+        self.seconds += time.perf_counter() - start
+        return manifest
+
+    # Lectura
+
+    def manifest(self, key: str) -> Optional[Dict[str, Any]]:
+        """Manifiesto de variantes de ``key`` o ``None`` si todavía no se generaron"""
+        cached = self._manifests.get(key)
+        if cached is not MISS:
+            return cached
+        try:
+            body = self.s3.get_object(Bucket=self.bucket, Key=manifest_key(key))['Body'].read()
+            manifest = json.loads(body)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                raise e
+            manifest = None
+        self._manifests.set(key, manifest, ttl=None if manifest else 30)
+        return manifest
+
+    def resolve(self, ref: str, width: int, accept: str = "") -> Dict[str, Any]:
+        """La mejor variante de una imagen para ``width`` píxeles y los formatos de ``accept``.
+
+        Si todavía no hay variantes se devuelve el original y se encola el
+        procesamiento (``pending``).
+        """
+        key = source_key(ref, self.bucket)
+        manifest = self.manifest(key) if self.enabled else None
+        variant = best_variant(manifest, width, accepted_formats(accept, self.formats)) if manifest else None
+        if variant is None:
+            if manifest is None:
+                self.submit(key)
+            pending = key in self._inflight
+            return {
+                'source': key, 'key': key, 'url': self.public_url(key), 'format': None,
+                'width': manifest['width'] if manifest else None,
+                'height': manifest['height'] if manifest else None,
+                'bytes': manifest['bytes'] if manifest else None,
+                'original': True, 'pending': pending
+            }
+        return {'source': key, **variant, 'url': self.public_url(variant['key']), 'original': False, 'pending': False}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'formats': self.formats,
+            'widths': list(self.widths),
+            'workers': self.workers,
+            'in_flight': len(self._inflight),
+            'processed': self.processed,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'avg_seconds': self.seconds / self.processed if self.processed else 0.0,
+            'manifests': self._manifests.stats()
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,17 +1,76 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
-import boto3
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Union
+from collections import Counter
+from datetime import datetime, timezone
+import asyncio
+from contextlib import asynccontextmanager
 from botocore.exceptions import ClientError
-from config import S3_BUCKET_NAME, S3_REGION, API_HOST, API_PORT, DEBUG
-from dynamodb_service import dynamodb_service
+from config import (
+    S3_BUCKET_NAME, S3_REGION, S3_UPLOAD_PART_SIZE, S3_UPLOAD_URL_EXPIRY, S3_INDEX_PATH, S3_INDEX_MAX_AGE,
+    IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_FORMATS, IMAGE_WORKERS, IMAGE_MAX_SOURCE_BYTES, API_HOST, API_PORT, DEBUG, AWS_MAX_CONCURRENCY, AWS_MAX_PENDING,
+    CACHE_URL, CACHE_TTL, CACHE_MAX_ENTRIES, BATCH_MAX_ITEMS, FAST_JSON,
+    EVENTS_URL, EVENTS_QUEUE_SIZE, EVENTS_HEARTBEAT,
+    COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY, STORAGE_URL,
+    SNAPSHOT_DIR, SNAPSHOT_MAX_AGE, SNAPSHOT_MAX_DELTAS, SIMULATION_WORKERS, SIMULATION_MAX_PATHS, SIMULATION_MAX_TRADES
+)
+from trade_storage import BatchIncompleteError, ConcurrentModificationError, create_storage
+from aws_clients import aws_clients
+from async_service import AsyncProxy, BoundedExecutor, ExecutorSaturated
+from stats_engine import trade_stats
+from trade_cache import CachedTradeService, create_cache
+from trade_export import EXPORT_COLUMNS, MEDIA_TYPES, PARQUET_AVAILABLE, encode_pages, gzip_chunks
+from query_planner import TradeFilters
+from fast_json import FastJSONResponse
+from http_cache import epoch_of, etag_for, is_not_modified, not_modified, validator_headers
+from trade_changes import ChangesExpired
+from trade_events import EventHub, create_broker, sse_frames, stream_websocket
+from trade_codec import project_records, select_fields
+from compression import CompressionMiddleware, accepted_encodings
+from s3_uploads import MultipartUploads, UploadNotFound
+from image_variants import ImageVariants, source_key
+from s3_listing import MAX_PAGE_SIZE, S3Listing, S3ObjectIndex
+from trade_snapshot import SNAPSHOT_AVAILABLE, TradeSnapshot
+from equity_engine import ClosedTrades, EquityEngine
+from monte_carlo import DEFAULT_PERCENTILES, MonteCarloSimulator
+
+if __name__ == "__main__":
+    # `python main.py` se reemplaza por `python -m uvicorn main:app` antes de crear ningún
+    # servicio: los procesos spawn de MonteCarloSimulator reimportan __main__, y si fuera
+    # este fichero cada uno reconstruiría almacenamiento, pools, broker y cachés.
+    import os
+    import sys
+    args = [sys.executable, "-m", "uvicorn", "main:app", "--host", API_HOST, "--port", str(API_PORT)]
+    os.execv(sys.executable, args + (["--reload"] if DEBUG else []))
+
+# Almacenamiento de trades (DynamoDB o SQLite local según STORAGE_URL)
+trade_service = create_storage(STORAGE_URL)
+
+# Las llamadas a boto3 son bloqueantes: se ejecutan en un pool acotado
+aws_executor = BoundedExecutor(max_workers=AWS_MAX_CONCURRENCY, max_pending=AWS_MAX_PENDING)
+
+# Eventos de escritura hacia los clientes conectados (WebSocket / SSE)
+event_hub = EventHub(queue_size=EVENTS_QUEUE_SIZE)
+event_broker = create_broker(EVENTS_URL, event_hub)
+trade_service.add_change_listener(event_broker.publish)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    event_broker.start(asyncio.get_running_loop())
+    yield
+    event_broker.stop()
+    image_variants.shutdown()
+    simulator.shutdown()
+    aws_executor.shutdown()
 
 app = FastAPI(
     title="Trade Tracker API",
     description="API para gestionar operaciones de trading con S3",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -23,8 +82,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Inicializar cliente S3
-s3_client = boto3.client('s3', region_name=S3_REGION)
+# Comprimir respuestas grandes (brotli o gzip según Accept-Encoding)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY
+)
+
+# Inicializar cliente S3 (compartido, con la configuración de aws_clients.py)
+s3_client = aws_clients.client('s3', region=S3_REGION)
+
+# Respuesta de las listas de trades: orjson y payloads precodificados con FAST_JSON=true
+ListResponse = FastJSONResponse if FAST_JSON else JSONResponse
+
+# Tamaño de página al recorrer la tabla para exportar
+EXPORT_PAGE_SIZE = 500
+
+# Versiones asíncronas de los servicios
+trades_cache = create_cache(CACHE_URL, default_ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES)
+cached_trades = CachedTradeService(trade_service, trades_cache)
+trades_store = AsyncProxy(cached_trades, aws_executor)
+s3_store = AsyncProxy(s3_client, aws_executor)
+multipart_uploads = MultipartUploads(
+    s3_client, S3_BUCKET_NAME, part_size=S3_UPLOAD_PART_SIZE, url_expiry=S3_UPLOAD_URL_EXPIRY
+)
+uploads_store = AsyncProxy(multipart_uploads, aws_executor)
+# Variantes WebP/AVIF de las imágenes: se generan en segundo plano al guardar un trade o completar una subida
+image_variants = ImageVariants(
+    s3_client, S3_BUCKET_NAME, widths=IMAGE_VARIANT_WIDTHS, formats=IMAGE_VARIANT_FORMATS,
+    workers=IMAGE_WORKERS, max_source_bytes=IMAGE_MAX_SOURCE_BYTES
+)
+images_store = AsyncProxy(image_variants, aws_executor)
+trade_service.add_change_listener(image_variants.on_trade_changes)
+# Listado del bucket: directo a S3 o desde el índice local, que se sincroniza de forma incremental
+s3_listing = S3Listing(s3_client, S3_BUCKET_NAME)
+s3_index = S3ObjectIndex(s3_listing, S3_INDEX_PATH, max_age=S3_INDEX_MAX_AGE) if S3_INDEX_PATH else None
+listing_store = AsyncProxy(s3_listing, aws_executor)
+index_store = AsyncProxy(s3_index, aws_executor) if s3_index else None
+# Snapshot columnar de los trades para estadísticas y exportaciones (se actualiza desde el registro de cambios)
+trade_snapshot = TradeSnapshot(
+    trade_service, SNAPSHOT_DIR, max_age=SNAPSHOT_MAX_AGE, max_deltas=SNAPSHOT_MAX_DELTAS
+) if SNAPSHOT_DIR and SNAPSHOT_AVAILABLE else None
+snapshot_store = AsyncProxy(trade_snapshot, aws_executor) if trade_snapshot else None
+# Curva de capital y métricas de riesgo, cacheadas por versión de los datos
+equity_engine = EquityEngine()
+# Simulaciones Monte Carlo de secuencias de trades en un pool de procesos (se crea con la primera)
+simulator = MonteCarloSimulator(workers=SIMULATION_WORKERS)
+
+@app.exception_handler(ConcurrentModificationError)
+async def concurrent_modification_handler(request: Request, exc: ConcurrentModificationError):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(BatchIncompleteError)
+async def batch_incomplete_handler(request: Request, exc: BatchIncompleteError):
+    return JSONResponse(status_code=503, content={"detail": f"Lote incompleto: {exc}"})
+
+@app.exception_handler(ChangesExpired)
+async def changes_expired_handler(request: Request, exc: ChangesExpired):
+    return JSONResponse(status_code=410, content={"detail": str(exc)})
+
+@app.exception_handler(UploadNotFound)
+async def upload_not_found_handler(request: Request, exc: UploadNotFound):
+    return JSONResponse(status_code=404, content={"detail": f"Subida multiparte no encontrada: {exc}"})
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    return JSONResponse(status_code=503, content={"detail": f"Servicio saturado: {exc}"})
 
 # Modelos Pydantic
 class TradeBase(BaseModel):
@@ -43,12 +167,47 @@ class Trade(TradeBase):
     fecha_apertura: datetime
     fecha_cierre: Optional[datetime] = None
     motivo_cierre: Optional[str] = None
+    precio_cierre: Optional[float] = None
     observaciones: Optional[str] = None
     imagenes: Optional[List[str]] = []
 
     class Config:
         from_attributes = True
 
+class TradePage(BaseModel):
+    items: List[Trade]
+    next_token: Optional[str] = None
+    plan: Optional[Dict[str, Any]] = None
+    scanned_count: Optional[int] = None
+    consumed_capacity: Optional[float] = None
+
+class TradeChanges(BaseModel):
+    version: int
+    modified_at: Optional[float] = None
+    trades: List[Trade]
+    deleted: List[int]
+
+class TradeImport(TradeCreate):
+    fecha_apertura: Optional[str] = None
+    fecha_cierre: Optional[str] = None
+    motivo_cierre: Optional[str] = None
+    precio_cierre: Optional[float] = None
+
+class TradeCloseItem(BaseModel):
+    id: int
+    fecha_cierre: str
+    motivo_cierre: str
+    precio_cierre: Optional[float] = None
+
+class BatchCreateRequest(BaseModel):
+    trades: List[TradeImport] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class BatchIdsRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class BatchCloseRequest(BaseModel):
+    trades: List[TradeCloseItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
 class PresignedUrlRequest(BaseModel):
     file_name: str
     file_type: str
@@ -59,6 +218,43 @@ class PresignedUrlResponse(BaseModel):
     expires_in: int
     file_key: str
 
+class MultipartInitRequest(BaseModel):
+    file_name: str
+    file_type: str
+    size: int = Field(..., gt=0)
+
+class MultipartUploadRef(BaseModel):
+    key: str
+    upload_id: str
+
+class MultipartPartsRequest(MultipartUploadRef):
+    part_numbers: List[int] = Field(..., min_length=1)
+
+class MultipartCompleteRequest(MultipartUploadRef):
+    part_count: Optional[int] = Field(None, gt=0)
+
+class ImageSourcesRequest(BaseModel):
+    sources: List[str] = Field(..., min_length=1, max_length=500)
+
+class ImageVariantsRequest(ImageSourcesRequest):
+    force: bool = False
+
+class ImageResolveRequest(ImageSourcesRequest):
+    width: int = Field(..., gt=0, le=8192)
+
+class SimulationRequest(BaseModel):
+    paths: int = Field(10000, gt=0, le=SIMULATION_MAX_PATHS)
+    trades: int = Field(1000, gt=0, le=SIMULATION_MAX_TRADES)
+    capital: float = Field(10000, gt=0)
+    risk: float = Field(0.01, gt=0, le=1)
+    compound: bool = False
+    ruin: float = Field(0.5, gt=0, le=1)  # pérdida desde el capital inicial que cuenta como ruina
+    seed: Optional[int] = Field(None, ge=0)
+    par: Optional[str] = None
+    source: str = Field("storage", pattern="^(storage|snapshot)$")
+    percentiles: List[float] = Field(list(DEFAULT_PERCENTILES), min_length=1, max_length=20)
+    points: int = Field(50, ge=2, le=500)
+
 # Los datos ahora se almacenan en DynamoDB
 
 @app.get("/")
@@ -69,11 +265,29 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now()}
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Aciertos, fallos y tamaño de la caché de trades"""
+    return trades_cache.stats()
+
+@app.get("/events/stats")
+async def get_event_stats():
+    """Suscriptores conectados y eventos repartidos en este worker"""
+    return event_broker.stats()
+
+@app.get("/metrics/aws")
+async def get_aws_metrics():
+    """Uso de los pools de conexiones a AWS y del pool de hilos"""
+    return {
+        "clients": aws_clients.metrics(),
+        "executor": {"max_workers": aws_executor.max_workers, "pending": aws_executor.pending}
+    }
+
 @app.get("/s3/bucket-info")
 async def get_s3_bucket_info():
     """Obtener información del bucket S3"""
     try:
-        response = s3_client.head_bucket(Bucket=S3_BUCKET_NAME)
+        response = await s3_store.head_bucket(Bucket=S3_BUCKET_NAME)
         return {
             "bucket_name": S3_BUCKET_NAME,
             "region": S3_REGION,
@@ -125,56 +339,355 @@ async def generate_presigned_url(request: PresignedUrlRequest):
         raise HTTPException(status_code=500, detail=f"Error generando presigned URL: {str(e)}")
 
 @app.get("/s3/files")
-async def list_s3_files(prefix: str = ""):
-    """Listar archivos en S3"""
+async def list_s3_files(
+    prefix: str = "",
+    delimiter: Optional[str] = Query(None, max_length=1),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    next_token: Optional[str] = None,
+    variants: bool = False,
+    source: str = Query("index", pattern="^(index|s3)$")
+):
+    """Listar archivos en S3 página a página (``delimiter=/`` agrupa por carpetas).
+
+    Se lee del índice local si está sincronizado; mientras se construye (o con
+    ``source=s3``) se lista directo contra S3. Los ``next_token`` de una fuente
+    no sirven para la otra.
+    """
     try:
-        response = s3_client.list_objects_v2(
-            Bucket=S3_BUCKET_NAME,
-            Prefix=prefix
-        )
-        
-        files = []
-        if 'Contents' in response:
-            for obj in response['Contents']:
-                files.append({
-                    "key": obj['Key'],
-                    "size": obj['Size'],
-                    "last_modified": obj['LastModified'].isoformat(),
-                    "url": f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{obj['Key']}"
-                })
-        
-        return {"files": files}
-        
+        if source == "index" and index_store is not None and await index_store.ensure_fresh():
+            return await index_store.list_page(prefix, delimiter, limit, next_token, variants)
+        return await listing_store.list_page(prefix, delimiter, limit, next_token, variants)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"Error listando archivos: {str(e)}")
 
-@app.delete("/s3/files/{file_key}")
+@app.get("/s3/index")
+async def get_s3_index_stats():
+    """Estado del índice local del bucket"""
+    if s3_index is None:
+        raise HTTPException(status_code=404, detail="Índice de S3 deshabilitado (S3_INDEX_PATH vacío)")
+    return await index_store.stats()
+
+@app.post("/s3/index/refresh")
+async def refresh_s3_index(full: bool = False):
+    """Sincronizar el índice ahora (incremental, o completo con ``full=true``)"""
+    if s3_index is None:
+        raise HTTPException(status_code=404, detail="Índice de S3 deshabilitado (S3_INDEX_PATH vacío)")
+    try:
+        return await index_store.refresh(full)
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error sincronizando índice: {str(e)}")
+
+@app.delete("/s3/files/{file_key:path}")
 async def delete_s3_file(file_key: str):
     """Eliminar archivo de S3"""
     try:
-        s3_client.delete_object(Bucket=S3_BUCKET_NAME, Key=file_key)
+        await s3_store.delete_object(Bucket=S3_BUCKET_NAME, Key=file_key)
+        if index_store is not None:
+            await index_store.remove(file_key)
         return {"message": f"Archivo {file_key} eliminado exitosamente"}
         
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"Error eliminando archivo: {str(e)}")
 
+# Subidas multiparte: el cliente sube las partes directo a S3 con URLs prefirmadas
+@app.post("/s3/multipart")
+async def initiate_multipart_upload(request: MultipartInitRequest):
+    """Iniciar una subida multiparte; devuelve la clave, el ID y el tamaño de parte"""
+    try:
+        return await uploads_store.initiate(request.file_name, request.file_type, request.size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error iniciando subida: {str(e)}")
+
+@app.post("/s3/multipart/parts")
+async def presign_multipart_parts(request: MultipartPartsRequest):
+    """URLs prefirmadas para un grupo de partes (se pueden subir en paralelo)"""
+    try:
+        parts = multipart_uploads.presign_parts(request.key, request.upload_id, request.part_numbers)
+        return {"parts": parts, "expires_in": multipart_uploads.url_expiry}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/s3/multipart/parts")
+async def list_multipart_parts(key: str, upload_id: str):
+    """Partes ya subidas, para retomar una subida interrumpida"""
+    try:
+        return {"parts": await uploads_store.list_parts(key, upload_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error listando partes: {str(e)}")
+
+@app.post("/s3/multipart/complete")
+async def complete_multipart_upload(request: MultipartCompleteRequest):
+    """Completar la subida (``part_count`` exige que estén todas las partes)"""
+    try:
+        result = await uploads_store.complete(request.key, request.upload_id, request.part_count)
+        if index_store is not None:
+            await index_store.put(request.key, result['size'], datetime.now(timezone.utc), result['etag'])
+        image_variants.submit(request.key)
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error completando subida: {str(e)}")
+
+@app.delete("/s3/multipart")
+async def abort_multipart_upload(key: str, upload_id: str):
+    """Abortar una subida y liberar sus partes"""
+    try:
+        await uploads_store.abort(key, upload_id)
+        return {"message": "Subida abortada"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error abortando subida: {str(e)}")
+
+# Variantes de imágenes: miniaturas y versiones WebP/AVIF junto a cada original
+@app.get("/images/resolve")
+async def resolve_image(request: Request, src: str, width: int = Query(..., gt=0, le=8192),
+                        dpr: float = Query(1.0, gt=0, le=4), redirect: bool = False):
+    """Mejor variante de ``src`` (clave o URL del bucket) para ``width`` píxeles CSS según ``Accept``.
+    Con ``redirect=true`` responde 307 hacia la imagen (sirve como ``src`` de un ``<img>``)"""
+    try:
+        variant = await images_store.resolve(src, round(width * dpr), request.headers.get("accept", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error resolviendo imagen: {str(e)}")
+    headers = {"Vary": "Accept"}
+    if not redirect:
+        return JSONResponse(variant, headers=headers)
+    # Mientras no haya variantes se redirige al original por poco tiempo
+    headers["Cache-Control"] = "public, max-age=60" if variant["original"] else "public, max-age=86400"
+    return Response(status_code=307, headers={**headers, "Location": variant["url"]})
+
+@app.post("/images/resolve")
+async def resolve_images(request: Request, body: ImageResolveRequest):
+    """Resolver varias imágenes a la vez (una galería) para el mismo ancho"""
+    accept = request.headers.get("accept", "")
+    try:
+        variants = await asyncio.gather(*(images_store.resolve(src, body.width, accept) for src in body.sources))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error resolviendo imágenes: {str(e)}")
+    return JSONResponse({"images": variants}, headers={"Vary": "Accept"})
+
+@app.get("/images/variants")
+async def get_image_variants(src: str):
+    """Manifiesto de variantes de una imagen"""
+    try:
+        manifest = await images_store.manifest(source_key(src, S3_BUCKET_NAME))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="La imagen no tiene variantes")
+    return manifest
+
+@app.post("/images/variants", status_code=202)
+async def generate_image_variants(request: ImageVariantsRequest):
+    """Encolar la generación de variantes (``force`` las regenera)"""
+    if not image_variants.enabled:
+        raise HTTPException(status_code=501, detail="Generación de variantes no disponible (instalar Pillow)")
+    return {"queued": image_variants.submit_many(request.sources, force=request.force)}
+
+@app.get("/images/stats")
+async def get_image_stats():
+    """Estado del pool de variantes y de la caché de manifiestos"""
+    return image_variants.stats()
+
 # Endpoints existentes para trades
-@app.get("/trades", response_model=List[Trade])
-async def get_trades():
-    """Obtener todas las operaciones"""
+@app.get("/trades", response_model=Union[TradePage, List[Trade]])
+async def get_trades(
+    request: Request,
+    filters: TradeFilters = Depends(),
+    limit: int = Query(50, ge=1, le=1000),
+    next_token: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    all_trades: bool = Query(False, alias="all"),
+    fields: Optional[str] = None
+):
+    """Obtener operaciones paginadas por fecha de apertura, filtradas en DynamoDB
+    (``all=true`` devuelve la lista completa sin filtros). ``fields=par,fecha_apertura``
+    devuelve solo esos campos (y ``id``).
+
+    Los registros ya vienen con los tipos de ``Trade`` (``trade_codec``), así que se
+    responden sin volver a validarlos. Responde ``304`` si la colección no cambió
+    desde el ``ETag``/``Last-Modified`` del cliente."""
     try:
-        trades = dynamodb_service.get_all_trades()
-        return trades
+        selected = select_fields(fields)
+        state = await trades_store.get_collection_version()
+        etag = etag_for(state['version'], sorted(request.query_params.multi_items()))
+        if is_not_modified(request, etag, state['modified_at']):
+            return not_modified(etag, state['modified_at'], state['version'])
+        headers = validator_headers(etag, state['modified_at'], state['version'])
+
+        # Las listas cacheadas se piden para la versión del ETag: con la caché en
+        # memoria, una escritura en otro worker no las invalida
+        if all_trades:
+            if selected:
+                records = await trades_store.get_all_trade_records(state['version'])
+                return ListResponse(project_records(records, selected), headers=headers)
+            if FAST_JSON:
+                return FastJSONResponse(await trades_store.get_all_trades_json(state['version']), headers=headers)
+            return JSONResponse(await trades_store.get_all_trade_records(state['version']), headers=headers)
+        return ListResponse(await trades_store.query_trade_records(
+            filters, limit, next_token, ascending=order == "asc", fields=selected
+        ), headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo trades: {str(e)}")
 
+@app.get("/trades/changes", response_model=TradeChanges)
+async def get_trade_changes(since: int = Query(..., ge=0)):
+    """Trades creados o modificados e IDs eliminados desde la versión ``since``
+    (la versión viene en ``X-Trades-Version``; ``410`` si ya no se conservan esos cambios)"""
+    try:
+        return await trades_store.get_changes(since)
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo cambios: {str(e)}")
+
+async def _hello() -> Dict[str, Any]:
+    state = await trades_store.get_collection_version()
+    return {"type": "hello", "version": state['version']}
+
+@app.get("/trades/events")
+async def trade_events(request: Request):
+    """Server-Sent Events con cada escritura de trades (misma forma que ``/trades/changes``)"""
+    # Suscribirse antes de leer la versión: ningún evento posterior se pierde
+    subscription = event_hub.subscribe()
+    try:
+        hello = await _hello()
+    except ClientError as e:
+        subscription.close()
+        raise HTTPException(status_code=500, detail=f"Error obteniendo versión: {str(e)}")
+    return StreamingResponse(
+        sse_frames(request, subscription, hello, EVENTS_HEARTBEAT),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/trades")
+async def trades_websocket(websocket: WebSocket):
+    """WebSocket con cada escritura de trades; ``resync`` y cierre si el cliente se atrasa"""
+    await websocket.accept()
+    subscription = event_hub.subscribe()
+    try:
+        hello = await _hello()
+    except ClientError:
+        subscription.close()
+        await websocket.close(code=1011)
+        return
+    await stream_websocket(websocket, subscription, hello, EVENTS_HEARTBEAT)
+
+@app.get("/trades/export")
+async def export_trades(
+    request: Request,
+    filters: TradeFilters = Depends(),
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    order: str = Query("desc", pattern="^(asc|desc|none)$"),
+    source: str = Query("storage", pattern="^(storage|snapshot)$")
+):
+    """Exportar operaciones en streaming (CSV, NDJSON o Parquet) sin cargarlas en memoria.
+
+    ``order=none`` lee la tabla con un scan paralelo (más rápido, sin orden).
+    ``source=snapshot`` lee del snapshot columnar si está listo."""
+    if format == "parquet" and not PARQUET_AVAILABLE:
+        raise HTTPException(status_code=400, detail="La exportación a Parquet requiere pyarrow")
+
+    async def pages():
+        next_token = None
+        while True:
+            page = await trades_store.query_trades(
+                filters, EXPORT_PAGE_SIZE, next_token, ascending=order == "asc"
+            )
+            yield page['items']
+            next_token = page['next_token']
+            if not next_token:
+                return
+
+    if source == "snapshot" and snapshot_store is not None and await snapshot_store.ensure_fresh():
+        try:
+            snapshot_pages = await snapshot_store.pages(filters, order, EXPORT_PAGE_SIZE)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        body = encode_pages(aws_executor.iterate(snapshot_pages), format)
+    elif order == "none":
+        scan = trade_service.scan_pages(EXPORT_COLUMNS, filters)
+        body = encode_pages(aws_executor.iterate(scan), format)
+    else:
+        body = encode_pages(pages(), format)
+    headers = {
+        "Content-Disposition": f'attachment; filename="trades.{format}"',
+        "Vary": "Accept-Encoding"
+    }
+    # Misma negociación que CompressionMiddleware: "gzip;q=0" rechaza gzip
+    if accepted_encodings(request.headers.get("accept-encoding", "")).get("gzip", 0) > 0:
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format], headers=headers)
+
+# Operaciones en lote
+def _batch_response(results):
+    return {"summary": Counter(r['status'] for r in results), "results": results}
+
+@app.post("/trades/batch")
+async def batch_create_trades(request: BatchCreateRequest):
+    """Crear (importar) muchas operaciones; devuelve un resultado por operación"""
+    try:
+        now = datetime.now().isoformat()
+        trades_data = [{**trade.dict(), 'fecha_apertura': trade.fecha_apertura or now} for trade in request.trades]
+        return _batch_response(await trades_store.batch_create_trades(trades_data))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error creando trades: {str(e)}")
+
+@app.post("/trades/batch-get")
+async def batch_get_trades(request: BatchIdsRequest):
+    """Obtener muchas operaciones por ID"""
+    try:
+        return await trades_store.batch_get_trades(request.ids)
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo trades: {str(e)}")
+
+@app.put("/trades/batch-close")
+async def batch_close_trades(request: BatchCloseRequest):
+    """Cerrar muchas operaciones; devuelve un resultado por operación"""
+    try:
+        closes = [close.dict() for close in request.trades]
+        return _batch_response(await trades_store.batch_close_trades(closes))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error cerrando trades: {str(e)}")
+
+@app.delete("/trades/batch")
+async def batch_delete_trades(request: BatchIdsRequest):
+    """Eliminar muchas operaciones; devuelve un resultado por operación"""
+    try:
+        return _batch_response(await trades_store.batch_delete_trades(request.ids))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error eliminando trades: {str(e)}")
+
 @app.get("/trades/{trade_id}", response_model=Trade)
-async def get_trade(trade_id: int):
-    """Obtener una operación específica"""
+async def get_trade(trade_id: int, request: Request, response: Response):
+    """Obtener una operación específica (``304`` si no cambió)"""
     try:
-        trade = dynamodb_service.get_trade(trade_id)
+        state = await trades_store.get_collection_version()
+        etag = etag_for(state['version'], 'trade', trade_id)
+        # Si la colección no cambió, el trade tampoco: se responde sin leerlo
+        if is_not_modified(request, etag, state['modified_at']):
+            return not_modified(etag)
+
+        trade = await trades_store.get_trade(trade_id, state['version'])
         if not trade:
             raise HTTPException(status_code=404, detail="Trade no encontrado")
+        last_modified = epoch_of(trade.get('updated_at'))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+        response.headers.update(validator_headers(etag, last_modified))
         return trade
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo trade: {str(e)}")
@@ -185,7 +698,7 @@ async def create_trade(trade: TradeCreate):
     try:
         trade_data = trade.dict()
         trade_data['fecha_apertura'] = datetime.now().isoformat()
-        new_trade = dynamodb_service.create_trade(trade_data)
+        new_trade = await trades_store.create_trade(trade_data)
         return new_trade
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"Error creando trade: {str(e)}")
@@ -195,7 +708,7 @@ async def update_trade(trade_id: int, trade_update: TradeCreate):
     """Actualizar una operación"""
     try:
         updates = trade_update.dict(exclude_unset=True)
-        updated_trade = dynamodb_service.update_trade(trade_id, updates)
+        updated_trade = await trades_store.update_trade(trade_id, updates)
         if not updated_trade:
             raise HTTPException(status_code=404, detail="Trade no encontrado")
         return updated_trade
@@ -206,7 +719,7 @@ async def update_trade(trade_id: int, trade_update: TradeCreate):
 async def delete_trade(trade_id: int):
     """Eliminar una operación"""
     try:
-        success = dynamodb_service.delete_trade(trade_id)
+        success = await trades_store.delete_trade(trade_id)
         if success:
             return {"message": f"Trade {trade_id} eliminado exitosamente"}
         else:
@@ -214,26 +727,172 @@ async def delete_trade(trade_id: int):
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"Error eliminando trade: {str(e)}")
 
-@app.get("/trades/par/{par}")
-async def get_trades_by_par(par: str):
-    """Obtener trades por par"""
+@app.get("/trades/par/{par:path}", response_model=Union[TradePage, List[Trade]])
+async def get_trades_by_par(
+    par: str,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    prefix: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=1000),
+    next_token: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    all_trades: bool = Query(False, alias="all"),
+    fields: Optional[str] = None
+):
+    """Obtener trades de un par paginados por fecha de apertura (``from``/``to`` o ``prefix``,
+    p. ej. ``2025-07`` para un mes; ``all=true`` devuelve la lista completa; ``fields``
+    como en ``/trades``)"""
     try:
-        trades = dynamodb_service.get_trades_by_par(par)
-        return trades
+        selected = select_fields(fields)
+        if all_trades:
+            if selected:
+                return ListResponse(project_records(await trades_store.get_trade_records_by_par(par), selected))
+            if FAST_JSON:
+                return FastJSONResponse(await trades_store.get_trades_by_par_json(par))
+            return await trades_store.get_trades_by_par(par)
+        return ListResponse(await trades_store.get_trade_records_by_par_page(
+            par, limit, next_token, ascending=order == "asc",
+            date_from=date_from, date_to=date_to, date_prefix=prefix, fields=selected
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo trades por par: {str(e)}")
 
 @app.put("/trades/{trade_id}/close")
-async def close_trade(trade_id: int, fecha_cierre: str, motivo_cierre: str):
+async def close_trade(trade_id: int, fecha_cierre: str, motivo_cierre: str, precio_cierre: Optional[float] = None):
     """Cerrar un trade"""
     try:
-        updated_trade = dynamodb_service.close_trade(trade_id, fecha_cierre, motivo_cierre)
+        updated_trade = await trades_store.close_trade(trade_id, fecha_cierre, motivo_cierre, precio_cierre)
         if not updated_trade:
             raise HTTPException(status_code=404, detail="Trade no encontrado")
         return updated_trade
     except ClientError as e:
         raise HTTPException(status_code=500, detail=f"Error cerrando trade: {str(e)}")
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host=API_HOST, port=API_PORT, reload=DEBUG) 
\ No newline at end of file
+# Estadísticas
+@app.get("/stats")
+async def get_stats(par: Optional[str] = None, source: str = Query("storage", pattern="^(storage|snapshot)$")):
+    """Estadísticas del journal (win rate, P&L, por par y por mes) calculadas en el servidor.
+
+    ``source=snapshot`` las calcula sobre el snapshot columnar (sin recorrer el
+    almacenamiento); mientras el snapshot se construye se lee del almacenamiento."""
+    try:
+        if source == "snapshot" and snapshot_store is not None and await snapshot_store.ensure_fresh():
+            return await snapshot_store.trade_stats(par)
+        if par:
+            trades = await trades_store.get_trades_by_par(par)
+        else:
+            trades = await trades_store.get_all_trades()
+        return await run_in_threadpool(trade_stats, trades)
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error calculando estadísticas: {str(e)}")
+
+async def closed_trades_source(par: Optional[str], source: str):
+    """Versión de los datos, clave de caché y cargador de los trades cerrados (``ClosedTrades``)"""
+    if source == "snapshot" and snapshot_store is not None and await snapshot_store.ensure_fresh():
+        version = (await snapshot_store.manifest())['version']
+        return version, ("snapshot", par, version), lambda: trade_snapshot.closed_trades(par)
+    version = (await trades_store.get_collection_version())['version']
+    return version, ("storage", par, version), lambda: ClosedTrades.from_trades(
+        cached_trades.get_trades_by_par(par, version) if par else cached_trades.get_all_trades(version)
+    )
+
+@app.get("/stats/equity")
+async def get_equity_stats(
+    request: Request,
+    par: Optional[str] = None,
+    capital: float = Query(10000, gt=0),
+    risk: float = Query(0.01, gt=0, le=1),
+    compound: bool = False,
+    points: int = Query(500, ge=2, le=5000),
+    source: str = Query("storage", pattern="^(storage|snapshot)$")
+):
+    """Curva de capital, drawdown máximo, Sharpe/Sortino, expectativa, profit factor y
+    R-múltiplos de los trades cerrados, arriesgando ``risk`` del capital por trade.
+
+    El resultado se cachea por versión de los datos (``ETag``; ``304`` si no cambió)."""
+    try:
+        version, key, loader = await closed_trades_source(par, source)
+        etag = etag_for(version, key[0], sorted(request.query_params.multi_items()))
+        if is_not_modified(request, etag, None):
+            return not_modified(etag, version=version)
+        result = await run_in_threadpool(
+            equity_engine.metrics, key, loader, capital=capital, risk=risk, compound=compound, points=points
+        )
+        return JSONResponse(result, headers=validator_headers(etag, None, version))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error calculando la curva de capital: {str(e)}")
+
+@app.get("/snapshot")
+async def get_snapshot_stats():
+    """Estado del snapshot columnar de los trades"""
+    if trade_snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot deshabilitado (SNAPSHOT_DIR vacío o sin pyarrow)")
+    return await snapshot_store.stats()
+
+@app.post("/snapshot/refresh")
+async def refresh_snapshot(full: bool = False):
+    """Actualizar el snapshot ahora (incremental, o completo con ``full=true``)"""
+    if trade_snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot deshabilitado (SNAPSHOT_DIR vacío o sin pyarrow)")
+    try:
+        return await snapshot_store.refresh(full)
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error actualizando snapshot: {str(e)}")
+
+@app.get("/stats/timeseries")
+async def get_stats_timeseries(
+    request: Request,
+    bucket: str = Query("day", pattern="^(hour|day|week|month)$"),
+    par: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    windows: str = Query("30,90", pattern=r"^(\d+(,\d+)*)?$")
+):
+    """Aperturas, cierres, win rate y P&L por hora, día, semana o mes, con ventanas móviles
+    de ``windows`` días (win rate y P&L de los últimos 30/90 días al final de cada bucket).
+
+    Se lee de las filas agregadas por hora y por día (mantenidas en cada escritura),
+    así que el costo depende del rango pedido y no del número de trades."""
+    try:
+        state = await trades_store.get_collection_version()
+        etag = etag_for(state['version'], sorted(request.query_params.multi_items()))
+        if is_not_modified(request, etag, state['modified_at']):
+            return not_modified(etag, state['modified_at'], state['version'])
+        window_days = sorted({int(days) for days in windows.split(",") if days and int(days) > 0})
+        result = await trades_store.get_timeseries(bucket, par, date_from, date_to, window_days)
+        return JSONResponse(result, headers=validator_headers(etag, state['modified_at'], state['version']))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo la serie temporal: {str(e)}")
+
+@app.post("/simulate")
+async def simulate_trades(request: SimulationRequest):
+    """Monte Carlo de secuencias de trades: remuestrea los R-múltiplos de los trades cerrados
+    en ``paths`` caminos de ``trades`` trades y devuelve la probabilidad de ruina, percentiles
+    del capital final y del drawdown máximo, y bandas de percentiles de la curva de capital.
+
+    Los R-múltiplos salen de la misma caché que ``/stats/equity``; con la misma ``seed``
+    (la respuesta trae la usada) el resultado es el mismo."""
+    try:
+        _, key, loader = await closed_trades_source(request.par, request.source)
+        closed = await run_in_threadpool(equity_engine.prepared, key, loader)
+        return await run_in_threadpool(
+            simulator.run, closed.r, paths=request.paths, trades=request.trades, capital=request.capital,
+            risk=request.risk, compound=request.compound, ruin=request.ruin, seed=request.seed,
+            points=request.points, percentiles=request.percentiles
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error simulando trades: {str(e)}")
+
+@app.get("/stats/summary")
+async def get_stats_summary():
+    """Estadísticas precalculadas (O(1), mantenidas en cada escritura de trades)"""
+    try:
+        return await trades_store.get_stats_summary()
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo estadísticas: {str(e)}")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Comandos de mantenimiento para los datos de Trade Tracker (DynamoDB o SQLite, según STORAGE_URL)
+"""
+
+import sys
+from datetime import timedelta
+from aws_clients import aws_clients
+from concurrent.futures import wait
+from config import (
+    S3_BUCKET_NAME, S3_REGION, S3_UPLOAD_STALE_HOURS, S3_INDEX_PATH,
+    IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_FORMATS, IMAGE_WORKERS, IMAGE_MAX_SOURCE_BYTES, STORAGE_URL,
+    SNAPSHOT_DIR, SNAPSHOT_MAX_DELTAS
+)
+from dynamodb_service import DynamoDBService
+from image_variants import ImageVariants, source_key
+from s3_listing import S3Listing, S3ObjectIndex
+from s3_uploads import MultipartUploads
+from trade_snapshot import SNAPSHOT_AVAILABLE, TradeSnapshot
+from trade_storage import create_storage
+
+trade_service = create_storage(STORAGE_URL)
+
+def _require_dynamodb():
+    if not isinstance(trade_service, DynamoDBService):
+        print(f"❌ Este comando solo aplica a DynamoDB (STORAGE_URL={STORAGE_URL})")
+        sys.exit(1)
+
+def seed_id_counter():
+    """
+    Migrar los IDs enteros existentes al contador atómico de IDs
+    """
+    _require_dynamodb()
+    print("🔢 Buscando el ID más alto en la tabla de trades...")
+    max_id = trade_service.get_max_trade_id()
+    print(f"   ID máximo encontrado: {max_id}")
+
+    value = trade_service.id_allocator.seed(max_id)
+    print(f"✅ Contador de IDs inicializado en {value}")
+    print(f"   El próximo trade recibirá un ID mayor a {value}")
+
+def backfill_index_keys():
+    """
+    Agregar las claves de los índices (fecha-index, open-index, closed-index) a los trades existentes
+    """
+    _require_dynamodb()
+    print("🗂️  Actualizando trades sin claves de índices...")
+    updated = trade_service.backfill_index_keys()
+    print(f"✅ {updated} trades actualizados")
+
+def _report_drift(drift):
+    for row in drift[:50]:
+        print(f"   ⚠️  {row['scope']}/{row['bucket']}:")
+        for field, values in row['fields'].items():
+            print(f"      {field}: esperado {values['expected']}, guardado {values['stored']}")
+    if len(drift) > 50:
+        print(f"   ... y {len(drift) - 50} filas más")
+
+def check_aggregates():
+    """
+    Recalcular los agregados desde los trades y reportar diferencias (sin escribir)
+    """
+    print("🔍 Comparando agregados con los trades...")
+    drift = trade_service.reconcile_aggregates(apply=False)
+    if not drift:
+        print("✅ Agregados consistentes")
+        return
+    print(f"❌ {len(drift)} filas con drift")
+    _report_drift(drift)
+    sys.exit(2)
+
+def rebuild_aggregates():
+    """
+    Recalcular los agregados desde cero y corregir las filas con drift
+    """
+    print("🛠️  Reconstruyendo agregados...")
+    drift = trade_service.reconcile_aggregates(apply=True)
+    _report_drift(drift)
+    print(f"✅ {len(drift)} filas corregidas")
+
+def gc_uploads(hours: str = None):
+    """
+    Abortar las subidas multiparte sin completar más antiguas que S3_UPLOAD_STALE_HOURS (o [horas])
+    """
+    hours = float(hours) if hours else S3_UPLOAD_STALE_HOURS
+    uploads = MultipartUploads(aws_clients.client('s3', region=S3_REGION), S3_BUCKET_NAME)
+    print(f"🧹 Buscando subidas multiparte iniciadas hace más de {hours:g} h...")
+    stale = uploads.collect_stale(timedelta(hours=hours))
+    for upload in stale[:50]:
+        print(f"   🗑️  {upload['key']} (iniciada {upload['initiated'].isoformat()})")
+    print(f"✅ {len(stale)} subidas abortadas")
+
+def build_image_variants(force: str = None):
+    """
+    Generar las variantes WebP/AVIF de las imágenes de todos los trades ([force] las regenera)
+    """
+    variants = ImageVariants(
+        aws_clients.client('s3', region=S3_REGION), S3_BUCKET_NAME, widths=IMAGE_VARIANT_WIDTHS,
+        formats=IMAGE_VARIANT_FORMATS, workers=IMAGE_WORKERS, max_source_bytes=IMAGE_MAX_SOURCE_BYTES
+    )
+    if not variants.enabled:
+        print("❌ Pillow no está instalado o no soporta los formatos pedidos")
+        sys.exit(1)
+    print(f"🖼️  Generando variantes {','.join(variants.formats)} de {list(variants.widths)} px...")
+    futures = []
+    for trade in trade_service.scan_trades(['imagenes']):
+        for ref in trade.get('imagenes') or []:
+            try:
+                future = variants.submit(source_key(ref, S3_BUCKET_NAME), force=force == "force")
+            except ValueError:
+                continue
+            if future is not None:
+                futures.append(future)
+    wait(futures)
+    stats = variants.stats()
+    print(f"✅ {stats['processed']} imágenes procesadas, {stats['skipped']} ya tenían variantes, "
+          f"{stats['failed']} con error")
+    if stats['bytes_in']:
+        print(f"   {stats['bytes_in'] / 1024:.0f} KB de originales → {stats['bytes_out'] / 1024:.0f} KB de variantes")
+
+def sync_s3_index(full: str = None):
+    """
+    Sincronizar el índice local del bucket (incremental, o [full] para recorrerlo completo)
+    """
+    if not S3_INDEX_PATH:
+        print("❌ S3_INDEX_PATH está vacío: el índice está deshabilitado")
+        sys.exit(1)
+    index = S3ObjectIndex(S3Listing(aws_clients.client('s3', region=S3_REGION), S3_BUCKET_NAME), S3_INDEX_PATH)
+    print(f"🗂️  Sincronizando {S3_INDEX_PATH} con s3://{S3_BUCKET_NAME}...")
+    result = index.refresh(full=full == "full")
+    kind = "completa" if result['full'] else "incremental"
+    print(f"✅ Sincronización {kind}: {result['listed']} claves listadas, {result['removed']} eliminadas "
+          f"en {result['seconds']} s ({index.stats()['objects']} objetos en el índice)")
+
+def _snapshot() -> TradeSnapshot:
+    if not SNAPSHOT_AVAILABLE:
+        print("❌ pyarrow no está instalado: pip install pyarrow")
+        sys.exit(1)
+    if not SNAPSHOT_DIR:
+        print("❌ SNAPSHOT_DIR está vacío: el snapshot está deshabilitado")
+        sys.exit(1)
+    return TradeSnapshot(trade_service, SNAPSHOT_DIR, max_deltas=SNAPSHOT_MAX_DELTAS)
+
+def build_snapshot(full: str = None):
+    """
+    Actualizar el snapshot columnar de los trades (incremental, o [full] para reconstruirlo)
+    """
+    snapshot = _snapshot()
+    print(f"🧊 Actualizando el snapshot en {SNAPSHOT_DIR}...")
+    result = snapshot.refresh(full=full == "full")
+    if result['full']:
+        print(f"✅ Snapshot completo en la versión {result['version']}: {result['rows']} trades "
+              f"en {result['seconds']} s")
+    else:
+        print(f"✅ Delta hasta la versión {result['version']}: {result['trades']} trades modificados, "
+              f"{result['deleted']} eliminados en {result['seconds']} s"
+              + (" (compactado)" if result['compacted'] else ""))
+
+def verify_snapshot():
+    """
+    Comparar el snapshot con el almacenamiento (sale con código 2 si difieren)
+    """
+    snapshot = _snapshot()
+    result = snapshot.verify()
+    for problem in result['problems']:
+        print(f"   ❌ {problem}")
+    if 'rows' in result:
+        print(f"🧊 Snapshot en la versión {result['version']} ({result['rows']} trades), "
+              f"almacenamiento en la {result['storage_version']}")
+        for key, label in (('missing', 'faltan'), ('extra', 'sobran'), ('stale', 'desactualizados')):
+            if result[f'{key}_count']:
+                print(f"   ⚠️  {result[f'{key}_count']} {label}: {result[key]}")
+    if result['ok']:
+        print("✅ El snapshot coincide con el almacenamiento")
+        return
+    print("❌ El snapshot no coincide (python3 manage.py build-snapshot para ponerlo al día)")
+    sys.exit(2)
+
+def compact_snapshot():
+    """
+    Fundir la base y los deltas del snapshot en una base nueva
+    """
+    try:
+        result = _snapshot().compact()
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ {result['merged_deltas']} deltas fundidos: {result['rows']} trades en la versión "
+          f"{result['version']} ({len(result['removed_files'])} archivos eliminados) en {result['seconds']} s")
+
+COMMANDS = {
+    "seed-id-counter": seed_id_counter,
+    "backfill-index-keys": backfill_index_keys,
+    "check-aggregates": check_aggregates,
+    "rebuild-aggregates": rebuild_aggregates,
+    "gc-uploads": gc_uploads,
+    "build-image-variants": build_image_variants,
+    "sync-s3-index": sync_s3_index,
+    "build-snapshot": build_snapshot,
+    "verify-snapshot": verify_snapshot,
+    "compact-snapshot": compact_snapshot,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print("Uso: python3 manage.py <comando> [argumentos]")
+        print("\n📋 Comandos disponibles:")
+        for name, command in COMMANDS.items():
+            print(f"   {name:<20} {command.__doc__.strip()}")
+        sys.exit(1)
+
+    COMMANDS[sys.argv[1]](*sys.argv[2:])
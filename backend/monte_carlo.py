@@ -0,0 +1,153 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Sequence
+import multiprocessing
+import secrets
+import threading
+import time
+import numpy as np
+
+# Caminos por tarea: fijo para que una semilla dé el mismo resultado con cualquier número de procesos
+TASK_PATHS = 5000
+# Caminos que se generan juntos dentro de una tarea (matriz caminos × trades en memoria)
+CHUNK_PATHS = 500
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+def checkpoints(trades: int, points: int) -> np.ndarray:
+    """Índices de trade (1..trades) donde se guardan las bandas de capital"""
+    return np.unique(np.linspace(1, trades, min(points, trades)).round().astype(np.int64))
+
+def simulate_paths(r: np.ndarray, seed: np.random.SeedSequence, paths: int, trades: int, capital: float,
+                   risk: float, compound: bool, ruin_equity: float, marks: np.ndarray) -> Dict[str, Any]:
+    """Simular ``paths`` secuencias de ``trades`` trades remuestreando los R-múltiplos ``r``.
+
+    Corre en un proceso del pool: genera los caminos de a ``CHUNK_PATHS`` con
+    NumPy y devuelve, por camino, el capital final, el drawdown máximo, si tocó
+    ``ruin_equity`` y el capital en cada ``marks`` (float32, para las bandas).
+    """
+    rng = np.random.default_rng(seed)
+    final, drawdown, bands = [], [], []
+    ruined = 0
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        for start in range(0, paths, CHUNK_PATHS):
+            rows = min(CHUNK_PATHS, paths - start)
+            steps = risk * r[rng.integers(0, len(r), size=(rows, trades), dtype=np.int32)]
+            if compound:
+                # Escala logarítmica: miles de trades compuestos desbordan un float
+                level = np.cumsum(np.log1p(np.maximum(steps, -1.0)), axis=1)
+                peak = np.maximum(np.maximum.accumulate(level, axis=1), 0.0)
+                drawdown.append(np.exp(level - peak).min(axis=1) - 1.0)
+                ruined += int((level.min(axis=1) <= np.log(ruin_equity / capital)).sum())
+                final.append(capital * np.exp(level[:, -1]))
+                bands.append((capital * np.exp(level[:, marks - 1])).astype(np.float32))
+            else:
+                equity = capital + capital * np.cumsum(steps, axis=1)
+                peak = np.maximum(np.maximum.accumulate(equity, axis=1), capital)
+                drawdown.append((equity / peak).min(axis=1) - 1.0)
+                ruined += int((equity.min(axis=1) <= ruin_equity).sum())
+                final.append(equity[:, -1])
+                bands.append(equity[:, marks - 1].astype(np.float32))
+    return {
+        'final': np.concatenate(final),
+        'drawdown': np.concatenate(drawdown),
+        'ruined': ruined,
+        'bands': np.concatenate(bands)
+    }
+
+def _finite(value: float) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+def _percentiles(values: np.ndarray, percentiles: Sequence[float], scale: float = 1.0) -> Dict[str, Optional[float]]:
+    with np.errstate(invalid='ignore'):
+        found = np.percentile(values, percentiles, axis=0)
+    return {f"p{q:g}": _finite(v * scale) for q, v in zip(percentiles, found)}
+
+class MonteCarloSimulator:
+    """Simulaciones de riesgo de ruina repartidas en un pool de procesos.
+
+    Las tareas son de ``TASK_PATHS`` caminos, cada una con su semilla hija
+    (``SeedSequence.spawn``): la misma ``seed`` da los mismos resultados sin
+    importar cuántos procesos haya. Con ``workers`` ≤ 1 las tareas corren en
+    el hilo que llama, sin pool.
+    """
+
+    def __init__(self, workers: int = 0):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: un fork del proceso de la API copiaría sus hilos y conexiones abiertas
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def run(self, r: np.ndarray, paths: int = 10000, trades: int = 1000, capital: float = 10000.0,
+            risk: float = 0.01, compound: bool = False, ruin: float = 0.5, seed: Optional[int] = None,
+            points: int = 50, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+        """Remuestrear ``r`` en ``paths`` caminos de ``trades`` trades arriesgando ``risk`` del capital.
+
+        Un camino se arruina si en algún momento perdió ``ruin`` del capital inicial
+        (0.5 = quedó en la mitad). Devuelve la probabilidad de ruina, percentiles del
+        capital final, del retorno y del drawdown máximo, y bandas de percentiles del
+        capital en ``points`` puntos de la secuencia.
+        """
+        if not len(r):
+            raise ValueError("No hay trades cerrados con riesgo definido para simular")
+        if any(not 0 <= q <= 100 for q in percentiles):
+            raise ValueError("Los percentiles deben estar entre 0 y 100")
+        started = time.perf_counter()
+        if seed is None:
+            seed = secrets.randbits(52)  # cabe en un número de JavaScript
+        r = np.ascontiguousarray(r, dtype=np.float64)
+        ruin_equity = capital * (1.0 - ruin)
+        marks = checkpoints(trades, points)
+        sizes = [min(TASK_PATHS, paths - start) for start in range(0, paths, TASK_PATHS)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        args = [(r, child, size, trades, capital, risk, compound, ruin_equity, marks)
+                for child, size in zip(seeds, sizes)]
+
+        if self.workers > 1:
+            pool = self._executor()
+            parts = list(pool.map(simulate_paths, *zip(*args)))
+        else:
+            parts = [simulate_paths(*task) for task in args]
+
+        final = np.concatenate([part['final'] for part in parts])
+        drawdown = np.concatenate([part['drawdown'] for part in parts])
+        bands = np.concatenate([part['bands'] for part in parts])
+        ruined = sum(part['ruined'] for part in parts)
+        with np.errstate(invalid='ignore'):
+            found = np.percentile(bands, percentiles, axis=0)
+        return {
+            'paths': paths,
+            'trades': trades,
+            'sample_size': len(r),
+            'seed': seed,
+            'capital': capital,
+            'risk': risk,
+            'compound': compound,
+            'ruin': {
+                'threshold': ruin,
+                'equity': ruin_equity,
+                'probability': ruined / paths
+            },
+            'probability_of_profit': float((final > capital).mean()),
+            'final_equity': _percentiles(final, percentiles),
+            'return_pct': _percentiles(final / capital - 1.0, percentiles, 100.0),
+            'max_drawdown_pct': _percentiles(drawdown, percentiles, 100.0),
+            'bands': [{'trade': 0, **{f"p{q:g}": capital for q in percentiles}}] + [
+                {'trade': int(k), **{f"p{q:g}": _finite(found[i, j]) for i, q in enumerate(percentiles)}}
+                for j, k in enumerate(marks)
+            ],
+            'workers': max(1, min(self.workers, len(sizes))),
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
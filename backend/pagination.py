@@ -0,0 +1,29 @@
+from decimal import Decimal
+from typing import Any, Dict, Optional
+import base64
+import json
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+def encode_cursor(last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Convertir un ``LastEvaluatedKey`` de DynamoDB en un token opaco para el cliente"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, default=_json_default, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(token: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Recuperar el ``ExclusiveStartKey`` de un token; ``ValueError`` si es inválido"""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()), parse_float=Decimal)
+    except (ValueError, TypeError) as e:
+        raise ValueError("next_token inválido") from e
+    if not isinstance(key, dict):
+        raise ValueError("next_token inválido")
+    return key
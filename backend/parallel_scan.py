@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import queue
+import threading
+
+_DONE = object()
+
+def projection_kwargs(fields: Iterable[str], names: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """``ProjectionExpression`` con placeholders para leer solo ``fields``"""
+    names = dict(names or {})
+    placeholders = []
+    for i, field in enumerate(fields):
+        names[f'#p{i}'] = field
+        placeholders.append(f'#p{i}')
+    return {'ProjectionExpression': ', '.join(placeholders), 'ExpressionAttributeNames': names}
+
+def parallel_scan(client, table_name: str, segments: int = 4, queue_pages: int = 8,
+                  **scan_kwargs) -> Iterator[List[Dict[str, Any]]]:
+    """Scan de la tabla dividido en ``segments`` segmentos leídos en paralelo.
+
+    Cada hilo recorre su segmento (``Segment``/``TotalSegments``) y deja sus
+    páginas en una cola acotada a ``queue_pages``: si el consumidor es más lento,
+    los hilos esperan en lugar de acumular la tabla en memoria. Las páginas
+    llegan en cualquier orden. Cerrar el generador detiene a los hilos.
+    """
+    if segments <= 1:
+        kwargs = {**scan_kwargs, 'TableName': table_name}
+        while True:
+            response = client.scan(**kwargs)
+            yield response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    pages: "queue.Queue[Any]" = queue.Queue(maxsize=queue_pages)
+    stop = threading.Event()
+
+    def put(value: Any) -> None:
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def scan_segment(segment: int) -> None:
+        kwargs = {**scan_kwargs, 'TableName': table_name, 'Segment': segment, 'TotalSegments': segments}
+        try:
+            while not stop.is_set():
+                response = client.scan(**kwargs)
+                put(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    pool = ThreadPoolExecutor(max_workers=segments, thread_name_prefix="scan")
+    try:
+        for segment in range(segments):
+            pool.submit(scan_segment, segment)
+        remaining = segments
+        while remaining:
+            page = pages.get()
+            if page is _DONE:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield page
+    finally:
+        stop.set()
+        pool.shutdown(wait=False)
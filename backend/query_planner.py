@@ -0,0 +1,202 @@
+from pydantic import BaseModel
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+import threading
+import time
+from dynamo_types import to_dynamo
+
+# Claves de los índices dispersos por estado: el atributo solo existe mientras el trade está en ese estado
+OPEN_INDEX_NAME = 'open-index'
+CLOSED_INDEX_NAME = 'closed-index'
+OPEN_INDEX_PARTITION = 'OPEN'
+CLOSED_INDEX_PARTITION = 'CLOSED'
+
+# Mayor que cualquier carácter de una fecha ISO: hace inclusivo el límite superior ("2025-07" incluye todo julio)
+DATE_UPPER_SUFFIX = '~'
+
+# Rangos numéricos que se resuelven con FilterExpression: (atributo, campo desde, campo hasta)
+RANGE_FILTERS = [
+    ('precio_apertura', 'price_from', 'price_to'),
+    ('take_profit', 'take_profit_from', 'take_profit_to'),
+    ('stop_loss', 'stop_loss_from', 'stop_loss_to'),
+]
+
+class TradeFilters(BaseModel):
+    """Los mismos filtros que ``applyFilters`` del frontend"""
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    date_prefix: Optional[str] = None
+    price_from: Optional[float] = None
+    price_to: Optional[float] = None
+    take_profit_from: Optional[float] = None
+    take_profit_to: Optional[float] = None
+    stop_loss_from: Optional[float] = None
+    stop_loss_to: Optional[float] = None
+    par: Optional[str] = None
+    status: Optional[Literal['open', 'closed']] = None
+
+class QueryPlan:
+    """Camino de acceso elegido: un índice, su partición y las condiciones a aplicar"""
+
+    def __init__(self, index_name: str, partition: Tuple[str, str], filters: TradeFilters,
+                 estimated_items: Optional[int], alternatives: List[Dict[str, Any]]):
+        self.index_name = index_name
+        self.partition = partition
+        self.filters = filters
+        self.estimated_items = estimated_items
+        self.alternatives = alternatives
+        self._build_expressions()
+
+    def _build_expressions(self) -> None:
+        f = self.filters
+        names = {'#pk': self.partition[0]}
+        values: Dict[str, Any] = {':pk': self.partition[1]}
+        key_condition = '#pk = :pk'
+
+        # Rango de fechas sobre la clave de ordenamiento (fecha_apertura) de todos los índices
+        if f.date_prefix and (f.date_from or f.date_to):
+            raise ValueError("date_prefix no se puede combinar con date_from/date_to")
+        if f.date_prefix:
+            names['#fecha'] = 'fecha_apertura'
+            values[':date_prefix'] = f.date_prefix
+            key_condition += ' AND begins_with(#fecha, :date_prefix)'
+        elif f.date_from or f.date_to:
+            names['#fecha'] = 'fecha_apertura'
+            upper = f.date_to + DATE_UPPER_SUFFIX if f.date_to else None
+            if f.date_from and upper:
+                key_condition += ' AND #fecha BETWEEN :date_from AND :date_to'
+                values.update({':date_from': f.date_from, ':date_to': upper})
+            elif f.date_from:
+                key_condition += ' AND #fecha >= :date_from'
+                values[':date_from'] = f.date_from
+            else:
+                key_condition += ' AND #fecha <= :date_to'
+                values[':date_to'] = upper
+
+        # Lo que el índice no resuelve se filtra en DynamoDB (no viaja por la red)
+        clauses = []
+        for attribute, low_field, high_field in RANGE_FILTERS:
+            low, high = getattr(f, low_field), getattr(f, high_field)
+            if low is None and high is None:
+                continue
+            names[f'#{attribute}'] = attribute
+            if low is not None and high is not None:
+                clauses.append(f'#{attribute} BETWEEN :{low_field} AND :{high_field}')
+                values.update({f':{low_field}': to_dynamo(low), f':{high_field}': to_dynamo(high)})
+            elif low is not None:
+                clauses.append(f'#{attribute} >= :{low_field}')
+                values[f':{low_field}'] = to_dynamo(low)
+            else:
+                clauses.append(f'#{attribute} <= :{high_field}')
+                values[f':{high_field}'] = to_dynamo(high)
+
+        if f.par and self.partition[0] != 'par':
+            names['#par'] = 'par'
+            values[':par'] = f.par
+            clauses.append('#par = :par')
+
+        if f.status and self.index_name not in (OPEN_INDEX_NAME, CLOSED_INDEX_NAME):
+            names['#fecha_cierre'] = 'fecha_cierre'
+            values[':string'] = 'S'
+            clause = 'attribute_type(#fecha_cierre, :string)'
+            clauses.append(clause if f.status == 'closed' else f'NOT {clause}')
+
+        self.key_condition = key_condition
+        self.filter_expression = ' AND '.join(clauses) or None
+        self.names = names
+        self.values = values
+
+    def query_kwargs(self, ascending: bool = False) -> Dict[str, Any]:
+        kwargs = {
+            'IndexName': self.index_name,
+            'KeyConditionExpression': self.key_condition,
+            'ExpressionAttributeNames': self.names,
+            'ExpressionAttributeValues': self.values,
+            'ScanIndexForward': ascending,
+            'ReturnConsumedCapacity': 'TOTAL'
+        }
+        if self.filter_expression:
+            kwargs['FilterExpression'] = self.filter_expression
+        return kwargs
+
+    def scan_kwargs(self) -> Dict[str, Any]:
+        """Las mismas condiciones como filtro de un scan de la tabla base (sin orden)"""
+        condition = self.key_condition
+        if self.filter_expression:
+            condition = f'{condition} AND {self.filter_expression}'
+        return {
+            'FilterExpression': condition,
+            'ExpressionAttributeNames': dict(self.names),
+            'ExpressionAttributeValues': dict(self.values)
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'index': self.index_name,
+            'key_condition': self.key_condition,
+            'filter': self.filter_expression,
+            'estimated_items': self.estimated_items,
+            'alternatives': self.alternatives
+        }
+
+class QueryPlanner:
+    """Elige el índice más barato para un conjunto de filtros.
+
+    El costo estimado de cada índice es el número de items en su partición,
+    tomado de los agregados (``cardinality``) y cacheado ``ttl`` segundos.
+    Todos los índices comparten ``fecha_apertura`` como clave de ordenamiento,
+    así que el rango de fechas reduce a todos por igual.
+    """
+
+    # Preferencia cuando no hay estadísticas disponibles
+    FALLBACK_RANK = {'par-index': 0, OPEN_INDEX_NAME: 1, CLOSED_INDEX_NAME: 2, 'fecha-index': 3}
+
+    def __init__(self, time_partition: Tuple[str, str],
+                 cardinality: Callable[[str, Optional[str]], Optional[int]], ttl: float = 60):
+        self.time_partition = time_partition
+        self.cardinality = cardinality
+        self.ttl = ttl
+        self._estimates: Dict[Tuple[str, Optional[str]], Tuple[float, Optional[int]]] = {}
+        self._lock = threading.Lock()
+
+    def candidates(self, filters: TradeFilters) -> List[Tuple[str, Tuple[str, str]]]:
+        paths = [('fecha-index', self.time_partition)]
+        if filters.par:
+            paths.append(('par-index', ('par', filters.par)))
+        if filters.status == 'open':
+            paths.append((OPEN_INDEX_NAME, ('open_pk', OPEN_INDEX_PARTITION)))
+        elif filters.status == 'closed':
+            paths.append((CLOSED_INDEX_NAME, ('closed_pk', CLOSED_INDEX_PARTITION)))
+        return paths
+
+    def plan(self, filters: TradeFilters, index_name: Optional[str] = None) -> QueryPlan:
+        """Elegir el camino de acceso (o usar ``index_name`` si se indica)"""
+        candidates = self.candidates(filters)
+        if index_name:
+            candidates = [c for c in candidates if c[0] == index_name]
+            if not candidates:
+                raise ValueError(f"El índice {index_name} no aplica a estos filtros")
+        scored = []
+        for index_name, partition in candidates:
+            estimate = self._estimate(index_name, filters.par if index_name == 'par-index' else None)
+            scored.append((index_name, partition, estimate))
+
+        scored.sort(key=lambda c: (c[2] is None, c[2] if c[2] is not None else 0, self.FALLBACK_RANK[c[0]]))
+        index_name, partition, estimate = scored[0]
+        alternatives = [{'index': name, 'estimated_items': est} for name, _, est in scored[1:]]
+        return QueryPlan(index_name, partition, filters, estimate, alternatives)
+
+    def _estimate(self, index_name: str, par: Optional[str]) -> Optional[int]:
+        key = (index_name, par)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._estimates.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
+        try:
+            estimate = self.cardinality(index_name, par)
+        except Exception as e:
+            print(f"Error estimando cardinalidad de {index_name}: {e}")
+            estimate = None
+        with self._lock:
+            self._estimates[key] = (now + self.ttl, estimate)
+        return estimate
@@ -0,0 +1,277 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+import sqlite3
+import threading
+import time
+from image_variants import VARIANT_SUFFIX
+from pagination import decode_cursor, encode_cursor
+from s3_uploads import UPLOAD_PREFIX
+
+MAX_PAGE_SIZE = 1000
+
+def prefix_end(prefix: str) -> Optional[str]:
+    """Primera cadena mayor que todas las que empiezan con ``prefix`` (``None`` si no hay)"""
+    while prefix and prefix[-1] == "\U0010ffff":
+        prefix = prefix[:-1]
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+
+def _file(base_url: str, key: str, size: int, last_modified: str) -> Dict[str, Any]:
+    return {"key": key, "size": size, "last_modified": last_modified, "url": base_url + key}
+
+def _token(token: Optional[str], name: str) -> Optional[str]:
+    position = decode_cursor(token)
+    if position is None:
+        return None
+    if not isinstance(position.get(name), str):
+        raise ValueError("next_token inválido")
+    return position[name]
+
+class S3Listing:
+    """Listado directo de S3 (``ListObjectsV2``), página a página.
+
+    Con ``delimiter`` las "carpetas" (``uploads/2025/``, ``uploads/2025/01/``...)
+    llegan como ``folders`` en lugar de todos los objetos de debajo. Sin
+    ``variants`` se ocultan las variantes y manifiestos de ``image_variants``
+    (una página puede traer menos de ``limit`` archivos).
+    """
+
+    def __init__(self, s3_client, bucket: str):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.base_url = f"https://{bucket}.s3.amazonaws.com/"
+
+    def list_page(self, prefix: str = "", delimiter: Optional[str] = None, limit: int = MAX_PAGE_SIZE,
+                  token: Optional[str] = None, variants: bool = False) -> Dict[str, Any]:
+        kwargs = {"Bucket": self.bucket, "Prefix": prefix, "MaxKeys": min(limit, MAX_PAGE_SIZE)}
+        if delimiter:
+            kwargs["Delimiter"] = delimiter
+        continuation = _token(token, "ct")
+        if continuation:
+            kwargs["ContinuationToken"] = continuation
+        response = self.s3.list_objects_v2(**kwargs)
+        files = [
+            _file(self.base_url, obj["Key"], obj["Size"], obj["LastModified"].isoformat())
+            for obj in response.get("Contents", [])
+            if variants or not VARIANT_SUFFIX.search(obj["Key"])
+        ]
+        next_token = response.get("NextContinuationToken") if response.get("IsTruncated") else None
+        return {
+            "files": files,
+            "folders": [p["Prefix"] for p in response.get("CommonPrefixes", [])],
+            "next_token": encode_cursor({"ct": next_token}) if next_token else None,
+            "source": "s3"
+        }
+
+    def scan(self, prefix: str = "", start_after: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Todas las páginas de objetos bajo ``prefix`` (después de ``start_after``)"""
+        kwargs = {"Bucket": self.bucket, "Prefix": prefix, "MaxKeys": MAX_PAGE_SIZE}
+        if start_after:
+            kwargs["StartAfter"] = start_after
+        while True:
+            response = self.s3.list_objects_v2(**kwargs)
+            yield response.get("Contents", [])
+            if not response.get("IsTruncated"):
+                return
+            kwargs.pop("StartAfter", None)
+            kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+class S3ObjectIndex:
+    """Índice local (SQLite en modo WAL) de los metadatos de los objetos del bucket.
+
+    La primera sincronización recorre todo el bucket página a página (memoria
+    acotada a una página). Las siguientes son incrementales: como las claves de
+    ``generate_presigned_url`` llevan la fecha (``uploads/AAAA/MM/DD/``), solo se
+    vuelven a listar los días desde la sincronización anterior (con un día de
+    margen) y se borran del índice las claves de ese rango que ya no están. Los
+    cambios fuera de ese rango hechos por fuera de la API se recogen con una
+    sincronización completa (``python3 manage.py sync-s3-index full``).
+    """
+
+    def __init__(self, listing: S3Listing, path: str, max_age: float = 60):
+        self.listing = listing
+        self.path = path
+        self.max_age = max_age
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._background: Optional[threading.Thread] = None
+        with self._connection() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS objects (
+                    key TEXT PRIMARY KEY, size INTEGER, etag TEXT, last_modified TEXT, sync INTEGER
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Una conexión por hilo; WAL deja leer mientras otro hilo sincroniza"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _meta(self) -> Dict[str, str]:
+        return dict(self._connection().execute("SELECT name, value FROM meta"))
+
+    @property
+    def ready(self) -> bool:
+        """Hubo al menos una sincronización completa"""
+        return "full_sync_at" in self._meta()
+
+    # Sincronización
+
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Sincronizar con S3 (completa o incremental). Devuelve lo que se hizo"""
+        with self._refresh_lock:
+            return self._refresh(full or not self.ready)
+
+    def _refresh(self, full: bool) -> Dict[str, Any]:
+        db = self._connection()
+        meta = self._meta()
+        sync = int(meta.get("sync", 0)) + 1
+        started = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        if full:
+            prefix, low = "", None
+        else:
+            # Las claves usan la fecha local del servidor: un día de margen cubre la zona horaria
+            since = datetime.fromisoformat(meta["synced_at"]) - timedelta(days=1)
+            prefix, low = UPLOAD_PREFIX, f"{UPLOAD_PREFIX}{since.strftime('%Y/%m/%d')}/"
+
+        listed = 0
+        for page in self.listing.scan(prefix, start_after=low[:-1] if low else None):
+            with db:
+                db.executemany(
+                    "INSERT INTO objects (key, size, etag, last_modified, sync) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET size = excluded.size, etag = excluded.etag, "
+                    "last_modified = excluded.last_modified, sync = excluded.sync",
+                    [(o["Key"], o["Size"], o.get("ETag"), o["LastModified"].isoformat(), sync) for o in page]
+                )
+            listed += len(page)
+
+        # Lo que quedó con una marca anterior dentro del rango listado ya no existe en S3
+        where, args = "sync != ?", [sync]
+        if low:
+            where += " AND key >= ? AND key < ?"
+            args += [low, prefix_end(prefix)]
+        with db:
+            removed = db.execute(f"DELETE FROM objects WHERE {where}", args).rowcount
+            updates = {"sync": sync, "synced_at": started.isoformat()}
+            if full:
+                updates["full_sync_at"] = started.isoformat()
+            db.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                           [(k, str(v)) for k, v in updates.items()])
+        return {"full": full, "listed": listed, "removed": removed,
+                "seconds": round(time.perf_counter() - start, 3)}
+
+    def ensure_fresh(self) -> bool:
+        """Preparar el índice para una lectura. ``False`` si todavía no se puede usar (la
+        primera sincronización completa corre en segundo plano). Si el índice tiene más de
+        ``max_age`` segundos se sincroniza de forma incremental, salvo que otro hilo ya lo
+        esté haciendo (se lee el estado anterior)"""
+        meta = self._meta()
+        if "full_sync_at" not in meta:
+            self.refresh_in_background(full=True)
+            return False
+        age = (datetime.now(timezone.utc) - datetime.fromisoformat(meta["synced_at"])).total_seconds()
+        if age > self.max_age and self._refresh_lock.acquire(blocking=False):
+            try:
+                self._refresh(full=False)
+            finally:
+                self._refresh_lock.release()
+        return True
+
+    def refresh_in_background(self, full: bool = False) -> None:
+        if self._background is not None and self._background.is_alive():
+            return
+        self._background = threading.Thread(target=self._refresh_logged, args=(full,),
+                                            name="s3-index", daemon=True)
+        self._background.start()
+
+    def _refresh_logged(self, full: bool) -> None:
+        try:
+            self.refresh(full)
+        except Exception as e:
+            print(f"Error sincronizando el índice de S3: {e}")
+
+    def put(self, key: str, size: int, last_modified: datetime, etag: Optional[str] = None) -> None:
+        """Registrar un objeto escrito por la API (sin esperar a la próxima sincronización)"""
+        db = self._connection()
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO objects (key, size, etag, last_modified, sync) "
+                "VALUES (?, ?, ?, ?, COALESCE((SELECT value FROM meta WHERE name = 'sync'), 0))",
+                (key, size, etag, last_modified.isoformat())
+            )
+
+    def remove(self, key: str) -> None:
+        db = self._connection()
+        with db:
+            db.execute("DELETE FROM objects WHERE key = ?", (key,))
+
+    # Lectura
+
+    def list_page(self, prefix: str = "", delimiter: Optional[str] = None, limit: int = MAX_PAGE_SIZE,
+                  token: Optional[str] = None, variants: bool = False) -> Dict[str, Any]:
+        """La misma página que ``S3Listing.list_page`` pero desde el índice.
+
+        Cada "carpeta" se salta con una sola consulta por rango (el índice está
+        ordenado por clave), así que el costo depende del tamaño de la página y
+        no de cuántos objetos haya debajo de cada carpeta.
+        """
+        db = self._connection()
+        limit = min(limit, MAX_PAGE_SIZE)
+        low = _token(token, "from") or prefix
+        high = prefix_end(prefix)
+        bounds = "key >= ?" + (" AND key < ?" if high else "")
+        files: List[Dict[str, Any]] = []
+        folders: List[str] = []
+        base_url = self.listing.base_url
+
+        while len(files) + len(folders) < limit:
+            # El cursor avanza fila a fila: al cortar en una carpeta no se leyó el resto
+            rows = db.execute(
+                f"SELECT key, size, last_modified FROM objects WHERE {bounds} ORDER BY key",
+                [low, high] if high else [low]
+            )
+            empty = True
+            for key, size, last_modified in rows:
+                empty = False
+                cut = key.find(delimiter, len(prefix)) if delimiter else -1
+                if cut >= 0:
+                    folder = key[:cut + len(delimiter)]
+                    folders.append(folder)
+                    low = prefix_end(folder)
+                    break  # las filas siguientes de esta consulta están dentro de la carpeta
+                low = key + "\x00"
+                if variants or not VARIANT_SUFFIX.search(key):
+                    files.append(_file(base_url, key, size, last_modified))
+                    if len(files) + len(folders) == limit:
+                        break
+            rows.close()
+            if empty:
+                break
+
+        more = low is not None and db.execute(
+            f"SELECT 1 FROM objects WHERE {bounds} LIMIT 1", [low, high] if high else [low]
+        ).fetchone()
+        return {
+            "files": files,
+            "folders": folders,
+            "next_token": encode_cursor({"from": low}) if more else None,
+            "source": "index"
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        meta = self._meta()
+        return {
+            "path": self.path,
+            "ready": "full_sync_at" in meta,
+            "objects": self._connection().execute("SELECT count(*) FROM objects").fetchone()[0],
+            "synced_at": meta.get("synced_at"),
+            "full_sync_at": meta.get("full_sync_at"),
+            "max_age": self.max_age,
+            "syncing": self._refresh_lock.locked()
+        }
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+import math
+import uuid
+from botocore.exceptions import ClientError
+
+UPLOAD_PREFIX = "uploads/"
+# Límites de S3: partes de 5 MiB a 5 GiB (la última puede ser menor), hasta 10.000 partes
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PART_SIZE = 5 * 1024 ** 3
+MAX_PARTS = 10_000
+
+class UploadNotFound(Exception):
+    """La subida multiparte no existe (completada, abortada o recolectada)"""
+
+def upload_key(file_name: str, now: Optional[datetime] = None) -> str:
+    """Clave única bajo ``uploads/AAAA/MM/DD/``"""
+    now = now or datetime.now()
+    return f"{UPLOAD_PREFIX}{now.strftime('%Y/%m/%d')}/{uuid.uuid4()}-{file_name}"
+
+def part_size_for(size: int, preferred: int) -> int:
+    """Tamaño de parte: el preferido, agrandado si hace falta para no pasar de 10.000 partes"""
+    part_size = max(MIN_PART_SIZE, preferred, math.ceil(size / MAX_PARTS))
+    if part_size > MAX_PART_SIZE:
+        raise ValueError("El archivo supera el tamaño máximo de una subida multiparte")
+    return part_size
+
+class MultipartUploads:
+    """Subidas multiparte a S3 con URLs prefirmadas por parte.
+
+    El cliente sube las partes directamente a S3 (en paralelo, en el orden que
+    quiera) y puede retomar una subida interrumpida consultando las partes ya
+    subidas. Al completar, las ETags se leen de S3 (``ListParts``), así que el
+    navegador no necesita leer la cabecera ``ETag`` de cada parte.
+    """
+
+    def __init__(self, s3_client, bucket: str, part_size: int = 8 * 1024 * 1024,
+                 url_expiry: int = 3600, max_urls: int = 100):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.part_size = part_size
+        self.url_expiry = url_expiry
+        self.max_urls = max_urls
+
+    @staticmethod
+    def _check_key(key: str) -> None:
+        if not key.startswith(UPLOAD_PREFIX) or ".." in key:
+            raise ValueError(f"Clave fuera de {UPLOAD_PREFIX}: {key}")
+
+    def _call(self, method: str, **kwargs) -> Dict[str, Any]:
+        try:
+            return getattr(self.s3, method)(Bucket=self.bucket, **kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchUpload', '404'):
+                raise UploadNotFound(kwargs.get('UploadId', '')) from e
+            raise e
+
+    def initiate(self, file_name: str, content_type: str, size: int) -> Dict[str, Any]:
+        """Iniciar una subida de ``size`` bytes; devuelve clave, ID y cómo partir el archivo"""
+        if size <= 0:
+            raise ValueError("El tamaño debe ser mayor a 0")
+        part_size = part_size_for(size, self.part_size)
+        key = upload_key(file_name)
+        response = self.s3.create_multipart_upload(Bucket=self.bucket, Key=key, ContentType=content_type)
+        return {
+            'key': key,
+            'upload_id': response['UploadId'],
+            'part_size': part_size,
+            'part_count': math.ceil(size / part_size),
+            'expires_in': self.url_expiry
+        }
+
+    def presign_parts(self, key: str, upload_id: str, part_numbers: List[int]) -> List[Dict[str, Any]]:
+        """URLs prefirmadas para subir ``part_numbers`` (hasta ``max_urls`` por llamada)"""
+        self._check_key(key)
+        if len(part_numbers) > self.max_urls:
+            raise ValueError(f"Como máximo {self.max_urls} partes por pedido")
+        invalid = [n for n in part_numbers if not 1 <= n <= MAX_PARTS]
+        if invalid:
+            raise ValueError(f"Números de parte inválidos: {invalid}")
+        return [
+            {
+                'part_number': number,
+                'url': self.s3.generate_presigned_url(
+                    'upload_part',
+                    Params={'Bucket': self.bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': number},
+                    ExpiresIn=self.url_expiry
+                )
+            }
+            for number in part_numbers
+        ]
+
+    def list_parts(self, key: str, upload_id: str) -> List[Dict[str, Any]]:
+        """Partes ya subidas (para retomar), en orden"""
+        self._check_key(key)
+        parts = []
+        kwargs = {'Key': key, 'UploadId': upload_id}
+        while True:
+            response = self._call('list_parts', **kwargs)
+            parts.extend(
+                {'part_number': p['PartNumber'], 'etag': p['ETag'], 'size': p['Size']}
+                for p in response.get('Parts', [])
+            )
+            if not response.get('IsTruncated'):
+                return parts
+            kwargs['PartNumberMarker'] = response['NextPartNumberMarker']
+
+    def complete(self, key: str, upload_id: str, part_count: Optional[int] = None) -> Dict[str, Any]:
+        """Completar con las partes que S3 ya tiene; con ``part_count`` se exige que estén todas"""
+        parts = self.list_parts(key, upload_id)
+        numbers = [p['part_number'] for p in parts]
+        expected = list(range(1, (part_count or len(parts)) + 1))
+        if not parts or numbers != expected:
+            missing = sorted(set(expected) - set(numbers))
+            raise ValueError(f"Faltan partes: {missing[:20]}" if missing else "Partes fuera de secuencia")
+        response = self._call(
+            'complete_multipart_upload', Key=key, UploadId=upload_id,
+            MultipartUpload={'Parts': [{'PartNumber': p['part_number'], 'ETag': p['etag']} for p in parts]}
+        )
+        return {
+            'key': key,
+            'etag': response.get('ETag'),
+            'size': sum(p['size'] for p in parts),
+            'parts': len(parts)
+        }
+
+    def abort(self, key: str, upload_id: str) -> None:
+        self._check_key(key)
+        self._call('abort_multipart_upload', Key=key, UploadId=upload_id)
+
+    def pending(self) -> Iterator[Dict[str, Any]]:
+        """Subidas sin completar bajo ``uploads/`` (todas las páginas)"""
+        kwargs = {'Bucket': self.bucket, 'Prefix': UPLOAD_PREFIX}
+        while True:
+            response = self.s3.list_multipart_uploads(**kwargs)
+            for upload in response.get('Uploads', []):
+                yield {'key': upload['Key'], 'upload_id': upload['UploadId'], 'initiated': upload['Initiated']}
+            if not response.get('IsTruncated'):
+                return
+            kwargs['KeyMarker'] = response['NextKeyMarker']
+            kwargs['UploadIdMarker'] = response['NextUploadIdMarker']
+
+    def collect_stale(self, older_than: timedelta, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """Abortar las subidas iniciadas hace más de ``older_than`` (sus partes ocupan espacio
+        facturado aunque no sean visibles como objetos)"""
+        cutoff = datetime.now(timezone.utc) - older_than
+        stale = [upload for upload in self.pending() if upload['initiated'] < cutoff]
+        if not dry_run:
+            for upload in stale:
+                try:
+                    self.abort(upload['key'], upload['upload_id'])
+                except UploadNotFound:
+                    pass
+        return stale
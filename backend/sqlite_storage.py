@@ -0,0 +1,481 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import sqlite3
+import threading
+import time
+from config import CHANGES_RETENTION_DAYS
+from pagination import decode_cursor, encode_cursor
+from query_planner import DATE_UPPER_SUFFIX, RANGE_FILTERS, TradeFilters
+from stats_engine import STATS_FIELDS
+from trade_aggregates import AGGREGATE_FIELDS, aggregate_delta, find_drift, merge_deltas, summarize
+from trade_changes import ChangesExpired
+from trade_codec import TRADE_FIELDS
+from trade_storage import TradeStorage
+
+# Columnas de la tabla de trades, en el orden de los items
+COLUMNS = list(TRADE_FIELDS) + ['created_at', 'updated_at']
+UPDATABLE = set(COLUMNS) - {'id', 'created_at', 'updated_at'}
+
+# IDs por sentencia al leer en lote y filas por página al recorrer la tabla
+BATCH_GET_SIZE = 500
+SCAN_PAGE_SIZE = 1000
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    par TEXT NOT NULL,
+    precio_apertura REAL NOT NULL,
+    take_profit REAL NOT NULL,
+    stop_loss REAL NOT NULL,
+    fecha_apertura TEXT NOT NULL,
+    fecha_cierre TEXT,
+    motivo_cierre TEXT,
+    precio_cierre REAL,
+    observaciones TEXT,
+    imagenes TEXT NOT NULL DEFAULT '[]',
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    status TEXT GENERATED ALWAYS AS (
+        CASE WHEN fecha_cierre IS NOT NULL AND fecha_cierre != '' THEN 'closed' ELSE 'open' END
+    ) VIRTUAL
+);
+CREATE INDEX IF NOT EXISTS trades_fecha ON trades (fecha_apertura, id);
+CREATE INDEX IF NOT EXISTS trades_par_fecha ON trades (par, fecha_apertura, id);
+CREATE INDEX IF NOT EXISTS trades_status_fecha ON trades (status, fecha_apertura, id);
+CREATE TABLE IF NOT EXISTS trade_changes (
+    version INTEGER PRIMARY KEY, trade_id INTEGER NOT NULL, op TEXT NOT NULL, modified_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aggregates (
+    scope TEXT NOT NULL, bucket TEXT NOT NULL,
+    {', '.join(f"{field} {'REAL' if field == 'profit' else 'INTEGER'} NOT NULL DEFAULT 0" for field in AGGREGATE_FIELDS)},
+    PRIMARY KEY (scope, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value);
+"""
+
+def _record(columns: List[str], row: tuple) -> Dict[str, Any]:
+    record = dict(zip(columns, row))
+    if 'imagenes' in record:
+        record['imagenes'] = json.loads(record['imagenes'] or '[]')
+    return record
+
+def _values(item: Dict[str, Any], columns: List[str]) -> List[Any]:
+    return [json.dumps(item.get(c) or []) if c == 'imagenes' else item.get(c) for c in columns]
+
+def _where(clauses: List[str]) -> str:
+    return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+def _conditions(filters: TradeFilters) -> Tuple[List[str], List[Any]]:
+    """Los filtros de ``TradeFilters`` como condiciones SQL (las mismas que ``QueryPlan``)"""
+    f = filters
+    clauses: List[str] = []
+    args: List[Any] = []
+    if f.date_prefix and (f.date_from or f.date_to):
+        raise ValueError("date_prefix no se puede combinar con date_from/date_to")
+    if f.par:
+        clauses.append("par = ?")
+        args.append(f.par)
+    if f.status:
+        clauses.append("status = ?")
+        args.append(f.status)
+    # Rangos sobre fecha_apertura (no LIKE/substr): así los resuelven los índices
+    if f.date_prefix:
+        clauses.append("fecha_apertura BETWEEN ? AND ?")
+        args += [f.date_prefix, f.date_prefix + DATE_UPPER_SUFFIX]
+    if f.date_from:
+        clauses.append("fecha_apertura >= ?")
+        args.append(f.date_from)
+    if f.date_to:
+        clauses.append("fecha_apertura <= ?")
+        args.append(f.date_to + DATE_UPPER_SUFFIX)
+    for attribute, low_field, high_field in RANGE_FILTERS:
+        low, high = getattr(f, low_field), getattr(f, high_field)
+        if low is not None:
+            clauses.append(f"{attribute} >= ?")
+            args.append(low)
+        if high is not None:
+            clauses.append(f"{attribute} <= ?")
+            args.append(high)
+    return clauses, args
+
+class SQLiteTradeStorage(TradeStorage):
+    """Almacenamiento local de trades en SQLite (modo WAL), sin red ni cuenta de AWS.
+
+    Para un solo nodo, desarrollo y benchmarks en CI. Los trades se ordenan por
+    ``(fecha_apertura, id)`` con índices por fecha, par + fecha y estado + fecha
+    (``status`` es una columna generada), y las páginas avanzan por cursor sobre
+    esa clave, sin ``OFFSET``. Cada escritura es una transacción
+    (``BEGIN IMMEDIATE``) que incluye la versión de la colección, el registro de
+    cambios y los agregados, igual que ``TransactWriteItems`` en DynamoDB. Una
+    conexión por hilo: con WAL las lecturas no esperan a las escrituras.
+    """
+
+    def __init__(self, path: str, retention_days: float = CHANGES_RETENTION_DAYS):
+        super().__init__()
+        self.path = path
+        self.retention = retention_days * 86400
+        self._local = threading.local()
+        self._plans: Dict[str, List[str]] = {}
+        db = self._connection()
+        db.executescript(SCHEMA)
+        db.execute("PRAGMA optimize")
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Sin transacciones implícitas: cada escritura abre la suya
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self, mode: str = "IMMEDIATE") -> Iterator[sqlite3.Connection]:
+        """``IMMEDIATE`` toma el lock de escritura al empezar; ``DEFERRED`` da una lectura consistente"""
+        db = self._connection()
+        db.execute(f"BEGIN {mode}")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _build_item(trade_data: Dict[str, Any], now: str) -> Dict[str, Any]:
+        precio_cierre = trade_data.get('precio_cierre')
+        return {
+            'par': trade_data['par'],
+            'precio_apertura': float(trade_data['precio_apertura']),
+            'take_profit': float(trade_data['take_profit']),
+            'stop_loss': float(trade_data['stop_loss']),
+            'fecha_apertura': trade_data.get('fecha_apertura') or now,
+            'fecha_cierre': trade_data.get('fecha_cierre'),
+            'motivo_cierre': trade_data.get('motivo_cierre'),
+            'precio_cierre': float(precio_cierre) if precio_cierre is not None else None,
+            'observaciones': trade_data.get('observaciones'),
+            'imagenes': trade_data.get('imagenes') or [],
+            'created_at': now,
+            'updated_at': now
+        }
+
+    def _insert(self, db: sqlite3.Connection, item: Dict[str, Any]) -> Dict[str, Any]:
+        columns = COLUMNS[1:]
+        cursor = db.execute(
+            f"INSERT INTO trades ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            _values(item, columns)
+        )
+        return {'id': cursor.lastrowid, **item}
+
+    def _write(self, db: sqlite3.Connection, new: Dict[str, Any]) -> None:
+        columns = COLUMNS[1:]
+        db.execute(f"UPDATE trades SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                   _values(new, columns) + [new['id']])
+
+    def _fetch(self, db: sqlite3.Connection, trade_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        found = {}
+        for start in range(0, len(trade_ids), BATCH_GET_SIZE):
+            chunk = trade_ids[start:start + BATCH_GET_SIZE]
+            rows = db.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM trades WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            for row in rows:
+                found[row[0]] = _record(COLUMNS, row)
+        return found
+
+    def _commit_changes(self, db: sqlite3.Connection, changes: List[tuple],
+                        delta: Dict[Tuple[str, str], Dict[str, float]]) -> int:
+        """Dentro de la transacción de la escritura: agregados, registro de cambios y nueva versión"""
+        for (scope, bucket), values in delta.items():
+            fields = sorted(values)
+            db.execute(
+                f"INSERT INTO aggregates (scope, bucket, {', '.join(fields)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(fields))}) ON CONFLICT (scope, bucket) DO UPDATE SET "
+                + ", ".join(f"{f} = {f} + excluded.{f}" for f in fields),
+                [scope, bucket] + [values[f] for f in fields]
+            )
+        now = round(time.time(), 3)
+        row = db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        version = int(row[0]) if row else 0
+        db.executemany(
+            "INSERT INTO trade_changes (version, trade_id, op, modified_at) VALUES (?, ?, ?, ?)",
+            [(version + offset, int(trade_id), 'delete' if item is None else 'put', now)
+             for offset, (trade_id, item) in enumerate(changes, start=1)]
+        )
+        new_version = version + len(changes)
+        db.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                       [('version', new_version), ('modified_at', now)])
+        if self.retention:
+            # Las versiones crecen con el tiempo: se borra desde la más antigua hasta la primera vigente
+            db.execute(
+                "DELETE FROM trade_changes WHERE version < "
+                "(SELECT version FROM trade_changes WHERE modified_at >= ? ORDER BY version LIMIT 1)",
+                (now - self.retention,)
+            )
+        return new_version
+
+    # Trades individuales
+
+    def create_trade(self, trade_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Crear un nuevo trade (el ID lo asigna SQLite)"""
+        with self._transaction() as db:
+            item = self._insert(db, self._build_item(trade_data, datetime.now().isoformat()))
+            version = self._commit_changes(db, [(item['id'], item)], aggregate_delta(None, item))
+        self._notify(version, [(item['id'], item)])
+        return item
+
+    def get_trade(self, trade_id: int) -> Optional[Dict[str, Any]]:
+        return self._fetch(self._connection(), [int(trade_id)]).get(int(trade_id))
+
+    def update_trade(self, trade_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Actualizar un trade y sus agregados en una misma transacción"""
+        updates = {k: v for k, v in updates.items() if k in UPDATABLE}
+        with self._transaction() as db:
+            old = self._fetch(db, [int(trade_id)]).get(int(trade_id))
+            if old is None:
+                return None
+            new = {**old, **updates, 'updated_at': datetime.now().isoformat()}
+            self._write(db, new)
+            version = self._commit_changes(db, [(new['id'], new)], aggregate_delta(old, new))
+        self._notify(version, [(new['id'], new)])
+        return new
+
+    def delete_trade(self, trade_id: int) -> bool:
+        """Eliminar un trade y descontarlo de los agregados"""
+        with self._transaction() as db:
+            old = self._fetch(db, [int(trade_id)]).get(int(trade_id))
+            if old is None:
+                return False
+            db.execute("DELETE FROM trades WHERE id = ?", (old['id'],))
+            version = self._commit_changes(db, [(old['id'], None)], aggregate_delta(old, None))
+        self._notify(version, [(old['id'], None)])
+        return True
+
+    # Listas y consultas
+
+    def _select(self, columns: List[str], suffix: str = "", args: tuple = ()) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(f"SELECT {', '.join(columns)} FROM trades{suffix}", args)
+        return [_record(columns, row) for row in rows]
+
+    def get_all_trades(self) -> List[Dict[str, Any]]:
+        return self._select(COLUMNS, " ORDER BY created_at DESC")
+
+    def get_all_trade_records(self) -> List[Dict[str, Any]]:
+        return self._select(list(TRADE_FIELDS), " ORDER BY created_at DESC")
+
+    def get_trades_by_par(self, par: str) -> List[Dict[str, Any]]:
+        return self._select(COLUMNS, " WHERE par = ? ORDER BY fecha_apertura, id", (par,))
+
+    def _plan(self, db: sqlite3.Connection, sql: str, args: List[Any]) -> Dict[str, Any]:
+        """Plan de SQLite para la consulta (``EXPLAIN QUERY PLAN``), memorizado por sentencia"""
+        steps = self._plans.get(sql)
+        if steps is None:
+            steps = [row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", args)]
+            self._plans[sql] = steps
+        return {'engine': 'sqlite', 'query_plan': steps}
+
+    def _query_page(self, filters: Optional[TradeFilters], limit: int, next_token: Optional[str],
+                    ascending: bool, columns: List[str]) -> Dict[str, Any]:
+        clauses, args = _conditions(filters or TradeFilters())
+        position = decode_cursor(next_token)
+        if position is not None:
+            if not isinstance(position.get('fecha_apertura'), str) or not isinstance(position.get('id'), int):
+                raise ValueError("next_token inválido")
+            clauses.append(f"(fecha_apertura, id) {'>' if ascending else '<'} (?, ?)")
+            args += [position['fecha_apertura'], position['id']]
+        order = "ASC" if ascending else "DESC"
+        # Se lee una fila de más para saber si hay otra página
+        sql = (f"SELECT fecha_apertura, id, {', '.join(columns)} FROM trades{_where(clauses)} "
+               f"ORDER BY fecha_apertura {order}, id {order} LIMIT ?")
+        db = self._connection()
+        rows = db.execute(sql, args + [limit + 1]).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'items': [_record(columns, row[2:]) for row in rows],
+            'next_token': encode_cursor({'fecha_apertura': rows[-1][0], 'id': rows[-1][1]}) if more else None,
+            'plan': self._plan(db, sql, args + [limit + 1]),
+            'scanned_count': len(rows),
+            'consumed_capacity': None
+        }
+
+    def query_trades(self, filters: Optional[TradeFilters] = None, limit: int = 50,
+                     next_token: Optional[str] = None, ascending: bool = False,
+                     index_name: Optional[str] = None) -> Dict[str, Any]:
+        """Una página de trades; el índice lo elige SQLite (``index_name`` se ignora)"""
+        return self._query_page(filters, limit, next_token, ascending, COLUMNS)
+
+    def query_trade_records(self, filters: Optional[TradeFilters] = None, limit: int = 50,
+                            next_token: Optional[str] = None, ascending: bool = False,
+                            index_name: Optional[str] = None,
+                            fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        return self._query_page(filters, limit, next_token, ascending, fields or list(TRADE_FIELDS))
+
+    def scan_pages(self, fields: Optional[List[str]] = None, filters: Optional[TradeFilters] = None,
+                   segments: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Recorrer la tabla por ID en páginas de ``SCAN_PAGE_SIZE`` (``segments`` no aplica)"""
+        columns = fields or COLUMNS
+        clauses, args = _conditions(filters or TradeFilters())
+        sql = (f"SELECT id, {', '.join(columns)} FROM trades{_where(clauses + ['id > ?'])} "
+               f"ORDER BY id LIMIT {SCAN_PAGE_SIZE}")
+        last = 0
+        while True:
+            # Cada página en su propia lectura: el generador puede avanzar desde otro hilo
+            rows = self._connection().execute(sql, args + [last]).fetchall()
+            if rows:
+                yield [_record(columns, row[1:]) for row in rows]
+            if len(rows) < SCAN_PAGE_SIZE:
+                return
+            last = rows[-1][0]
+
+    # Operaciones en lote
+
+    def batch_create_trades(self, trades_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Crear muchos trades en una sola transacción (una versión por trade, un aviso)"""
+        now = datetime.now().isoformat()
+        with self._transaction() as db:
+            items = [self._insert(db, self._build_item(data, now)) for data in trades_data]
+            changes = [(item['id'], item) for item in items]
+            version = self._commit_changes(db, changes, merge_deltas(aggregate_delta(None, i) for i in items))
+        if changes:
+            self._notify(version, changes)
+        return [{'index': i, 'id': item['id'], 'status': 'created', 'trade': item} for i, item in enumerate(items)]
+
+    def batch_get_trades(self, trade_ids: List[int]) -> Dict[str, Any]:
+        unique_ids = list(dict.fromkeys(int(trade_id) for trade_id in trade_ids))
+        found = self._fetch(self._connection(), unique_ids)
+        return {
+            'trades': [found[trade_id] for trade_id in unique_ids if trade_id in found],
+            'missing': [trade_id for trade_id in unique_ids if trade_id not in found]
+        }
+
+    def batch_close_trades(self, closes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cerrar muchos trades en una sola transacción junto con sus agregados"""
+        def close(old, entry):
+            updates = {'fecha_cierre': entry['fecha_cierre'], 'motivo_cierre': entry['motivo_cierre']}
+            if entry.get('precio_cierre') is not None:
+                updates['precio_cierre'] = entry['precio_cierre']
+            return {**old, **updates, 'updated_at': datetime.now().isoformat()}
+
+        return self._batch_write(closes, close, 'closed')
+
+    def batch_delete_trades(self, trade_ids: List[int]) -> List[Dict[str, Any]]:
+        return self._batch_write([{'id': trade_id} for trade_id in trade_ids], lambda old, entry: None, 'deleted')
+
+    def _batch_write(self, entries: List[Dict[str, Any]], build, status: str) -> List[Dict[str, Any]]:
+        """Aplicar ``build(old, entry)`` (item nuevo o ``None`` para borrar) a cada trade en una transacción"""
+        results = []
+        changes = []
+        deltas = []
+        with self._transaction() as db:
+            current = self._fetch(db, list(dict.fromkeys(int(e['id']) for e in entries)))
+            seen = set()
+            for index, entry in enumerate(entries):
+                trade_id = int(entry['id'])
+                if trade_id not in current:
+                    results.append({'index': index, 'id': trade_id, 'status': 'not_found'})
+                    continue
+                if trade_id in seen:
+                    results.append({'index': index, 'id': trade_id, 'status': 'duplicate'})
+                    continue
+                seen.add(trade_id)
+                old = current[trade_id]
+                new = build(old, entry)
+                if new is None:
+                    db.execute("DELETE FROM trades WHERE id = ?", (trade_id,))
+                else:
+                    self._write(db, new)
+                changes.append((trade_id, new))
+                deltas.append(aggregate_delta(old, new))
+                result = {'index': index, 'id': trade_id, 'status': status}
+                if new is not None:
+                    result['trade'] = new
+                results.append(result)
+            version = self._commit_changes(db, changes, merge_deltas(deltas)) if changes else None
+        if changes:
+            self._notify(version, changes)
+        return results
+
+    # Versión, cambios y agregados
+
+    def get_collection_version(self) -> Dict[str, Any]:
+        meta = dict(self._connection().execute(
+            "SELECT name, value FROM meta WHERE name IN ('version', 'modified_at')"
+        ))
+        return {
+            'version': int(meta.get('version', 0)),
+            'modified_at': float(meta['modified_at']) if 'modified_at' in meta else None
+        }
+
+    def get_changes(self, since: int) -> Dict[str, Any]:
+        """Trades creados o modificados y IDs eliminados después de la versión ``since``,
+        leídos en una misma transacción (versión y trades consistentes)"""
+        with self._transaction("DEFERRED") as db:
+            state = self.get_collection_version()
+            if since >= state['version']:
+                return {**state, 'trades': [], 'deleted': []}
+            oldest = db.execute("SELECT min(version) FROM trade_changes").fetchone()[0]
+            if oldest is None or since + 1 < oldest:
+                raise ChangesExpired(f"No se conservan los cambios desde la versión {since}")
+            touched = list(dict.fromkeys(row[0] for row in db.execute(
+                "SELECT trade_id FROM trade_changes WHERE version > ? AND version <= ? ORDER BY version",
+                (since, state['version'])
+            )))
+            found = self.batch_get_trades(touched)
+        return {**state, 'trades': found['trades'], 'deleted': found['missing']}
+
+    def _aggregate_rows(self, scopes: Optional[List[str]] = None) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        where = f" WHERE scope IN ({', '.join('?' * len(scopes))})" if scopes else ""
+        rows = self._connection().execute(
+            f"SELECT scope, bucket, {', '.join(AGGREGATE_FIELDS)} FROM aggregates{where} ORDER BY scope, bucket",
+            scopes or []
+        )
+        return {(row[0], row[1]): {'bucket': row[1], **dict(zip(AGGREGATE_FIELDS, row[2:]))} for row in rows}
+
+    def get_stats_summary(self) -> Dict[str, Any]:
+        """Estadísticas precalculadas a partir de las filas agregadas"""
+        scopes: Dict[str, List[Dict[str, Any]]] = {'total': [], 'par': [], 'month': []}
+        for (scope, _), row in self._aggregate_rows(list(scopes)).items():
+            scopes[scope].append(row)
+        return summarize(next(iter(scopes['total']), {}), scopes['par'], scopes['month'])
+
+    def get_aggregate_rows(self, scope: str, low: Optional[str] = None,
+                           high: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = f"SELECT bucket, {', '.join(AGGREGATE_FIELDS)} FROM aggregates WHERE scope = ?"
+        args = [scope]
+        if low:
+            sql += " AND bucket >= ?"
+            args.append(low)
+        if high:
+            sql += " AND bucket <= ?"
+            args.append(high)
+        rows = self._connection().execute(sql + " ORDER BY bucket", args)
+        return [dict(zip(['bucket'] + AGGREGATE_FIELDS, row)) for row in rows]
+
+    def reconcile_aggregates(self, apply: bool = False) -> List[Dict[str, Any]]:
+        """Recalcular los agregados desde los trades y devolver el drift encontrado.
+
+        Con ``apply=True`` el recálculo y la corrección van en una misma
+        transacción: ninguna escritura se cuela entre medio.
+        """
+        with self._transaction("IMMEDIATE" if apply else "DEFERRED") as db:
+            expected = merge_deltas(aggregate_delta(None, trade) for trade in self.scan_trades(STATS_FIELDS))
+            drift = find_drift(expected, self._aggregate_rows())
+            if apply:
+                for row in drift:
+                    key = (row['scope'], row['bucket'])
+                    if key in expected:
+                        values = [expected[key].get(field, 0) for field in AGGREGATE_FIELDS]
+                        db.execute(
+                            f"INSERT OR REPLACE INTO aggregates (scope, bucket, {', '.join(AGGREGATE_FIELDS)}) "
+                            f"VALUES (?, ?, {', '.join('?' * len(AGGREGATE_FIELDS))})", [*key, *values]
+                        )
+                    else:
+                        db.execute("DELETE FROM aggregates WHERE scope = ? AND bucket = ?", key)
+        return drift
+
+    def get_max_trade_id(self) -> int:
+        return self._connection().execute("SELECT coalesce(max(id), 0) FROM trades").fetchone()[0]
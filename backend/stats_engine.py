@@ -0,0 +1,140 @@
+from typing import Any, Dict, Iterable, Optional
+import re
+import numpy as np
+
+# Atributos que usan las estadísticas y los agregados (proyección para los scans)
+STATS_FIELDS = [
+    'id', 'par', 'precio_apertura', 'take_profit', 'stop_loss', 'precio_cierre',
+    'fecha_apertura', 'fecha_cierre', 'motivo_cierre'
+]
+
+# Motivos de cierre que indican el nivel alcanzado: sólo la primera palabra cuenta
+# ("Take profit alcanzado", "SL"), no "mistake" ni "cierre non-stop". ASCII para que
+# \b sea igual en re y en RE2 (trade_snapshot.exit_prices)
+TAKE_PROFIT_REASON = r'^\s*(?:take|tp)\b'
+STOP_LOSS_REASON = r'^\s*(?:stop|sl)\b'
+_TAKE_PROFIT = re.compile(TAKE_PROFIT_REASON, re.ASCII)
+_STOP_LOSS = re.compile(STOP_LOSS_REASON, re.ASCII)
+
+def exit_price(trade: Dict[str, Any]) -> Optional[float]:
+    """Precio de salida real de un trade cerrado.
+
+    Usa ``precio_cierre`` si existe; si no, lo deduce del motivo de cierre
+    cuando empieza por take profit / tp o stop loss / sl. Devuelve ``None``
+    si no se conoce.
+    """
+    if not trade.get('fecha_cierre'):
+        return None
+    if trade.get('precio_cierre') is not None:
+        return float(trade['precio_cierre'])
+
+    motivo = (trade.get('motivo_cierre') or '').lower()
+    if _TAKE_PROFIT.match(motivo):
+        return float(trade['take_profit'])
+    if _STOP_LOSS.match(motivo):
+        return float(trade['stop_loss'])
+    return None
+
+def trade_profit(trade: Dict[str, Any]) -> Optional[float]:
+    """Ganancia por unidad de un trade cerrado (misma fórmula que ``TradeColumns.profit``)"""
+    exit_value = exit_price(trade)
+    if exit_value is None:
+        return None
+    entry = float(trade['precio_apertura'])
+    direction = 1.0 if float(trade['take_profit']) >= entry else -1.0
+    return (exit_value - entry) * direction
+
+def _number(value: Any) -> float:
+    return np.nan if value is None else float(value)
+
+class TradeColumns:
+    """Vista columnar (arrays de NumPy) de un conjunto de trades"""
+
+    def __init__(self, trades: Iterable[Dict[str, Any]]):
+        trades = list(trades)
+        n = len(trades)
+        self.size = n
+        self.ids = np.fromiter((int(t['id']) for t in trades), dtype=np.int64, count=n)
+        self.entry = np.fromiter((_number(t.get('precio_apertura')) for t in trades), dtype=np.float64, count=n)
+        self.take_profit = np.fromiter((_number(t.get('take_profit')) for t in trades), dtype=np.float64, count=n)
+        self.stop_loss = np.fromiter((_number(t.get('stop_loss')) for t in trades), dtype=np.float64, count=n)
+        self.exit = np.fromiter((_number(exit_price(t)) for t in trades), dtype=np.float64, count=n)
+        self.closed = np.fromiter((bool(t.get('fecha_cierre')) for t in trades), dtype=bool, count=n)
+        self.pars = np.array([t.get('par', '') for t in trades], dtype=str)
+        self.months = np.array([(t.get('fecha_apertura') or '')[:7] for t in trades], dtype=str)
+
+    @classmethod
+    def from_arrays(cls, ids: np.ndarray, entry: np.ndarray, take_profit: np.ndarray, stop_loss: np.ndarray,
+                    exit: np.ndarray, closed: np.ndarray, pars: np.ndarray, months: np.ndarray) -> 'TradeColumns':
+        """Vista a partir de columnas ya calculadas (p. ej. de un snapshot de Arrow), sin pasar por dicts"""
+        columns = cls.__new__(cls)
+        columns.size = len(ids)
+        columns.ids = ids
+        columns.entry = entry
+        columns.take_profit = take_profit
+        columns.stop_loss = stop_loss
+        columns.exit = exit
+        columns.closed = closed
+        columns.pars = pars
+        columns.months = months
+        return columns
+
+    @property
+    def direction(self) -> np.ndarray:
+        """+1 para largos (take profit por encima de la entrada), -1 para cortos"""
+        return np.where(self.take_profit >= self.entry, 1.0, -1.0)
+
+    @property
+    def profit(self) -> np.ndarray:
+        """Ganancia por unidad de cada trade; NaN si está abierto o sin precio de salida"""
+        return (self.exit - self.entry) * self.direction
+
+def _trade_ref(columns: TradeColumns, index: int, profit: np.ndarray) -> Dict[str, Any]:
+    return {
+        'id': int(columns.ids[index]),
+        'par': str(columns.pars[index]),
+        'profit': float(profit[index])
+    }
+
+def compute_stats(columns: TradeColumns) -> Dict[str, Any]:
+    """Calcular las estadísticas del journal con operaciones vectorizadas"""
+    profit = columns.profit
+    realized = ~np.isnan(profit)
+    realized_profit = profit[realized]
+    closed_count = int(columns.closed.sum())
+    realized_count = int(realized.sum())
+    total_profit = float(realized_profit.sum())
+
+    best_trade = worst_trade = None
+    if realized_count:
+        realized_idx = np.flatnonzero(realized)
+        best_trade = _trade_ref(columns, realized_idx[np.argmax(realized_profit)], profit)
+        worst_trade = _trade_ref(columns, realized_idx[np.argmin(realized_profit)], profit)
+
+    pars, par_codes = np.unique(columns.pars, return_inverse=True)
+    par_counts = np.bincount(par_codes, minlength=len(pars))
+
+    months, month_codes = np.unique(columns.months, return_inverse=True)
+    month_counts = np.bincount(month_codes, minlength=len(months))
+    month_profit = np.bincount(month_codes, weights=np.where(realized, profit, 0.0), minlength=len(months))
+
+    return {
+        'total_trades': columns.size,
+        'closed_trades': closed_count,
+        'open_trades': columns.size - closed_count,
+        'closed_without_exit': closed_count - realized_count,
+        'win_rate': float((realized_profit > 0).sum() / realized_count * 100) if realized_count else 0.0,
+        'total_profit': total_profit,
+        'average_profit': total_profit / realized_count if realized_count else 0.0,
+        'best_trade': best_trade,
+        'worst_trade': worst_trade,
+        'trades_by_par': {str(par): int(count) for par, count in zip(pars, par_counts)},
+        'monthly_stats': [
+            {'month': str(month), 'trades': int(count), 'profit': float(month_total)}
+            for month, count, month_total in zip(months, month_counts, month_profit)
+        ]
+    }
+
+def trade_stats(trades: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Atajo: construir la vista columnar y calcular las estadísticas"""
+    return compute_stats(TradeColumns(trades))
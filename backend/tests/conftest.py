@@ -0,0 +1,60 @@
+"""Fixtures de las pruebas del backend (desde la raíz: python -m pytest -q)"""
+
+import glob
+import json
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    """``DynamoDBService`` sobre moto con las tablas de ``create_*table.json`` y sin esperas entre reintentos"""
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    for name, value in (("AWS_ACCESS_KEY_ID", "test"), ("AWS_SECRET_ACCESS_KEY", "test"),
+                        ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        client = boto3.client("dynamodb", region_name="us-east-1")
+        for path in sorted(glob.glob(os.path.join(BACKEND_DIR, "create_*table*.json"))):
+            with open(path) as f:
+                client.create_table(**json.load(f))
+        import dynamodb_service
+
+        monkeypatch.setattr(dynamodb_service, "_backoff", lambda attempt: None)
+        yield dynamodb_service.DynamoDBService()
+
+@pytest.fixture
+def cancel_transactions(monkeypatch):
+    """Cancelar las próximas TransactWriteItems de un servicio con los motivos indicados.
+
+    ``cancel(service, reasons_for(operations) -> [códigos], times)``: las llamadas
+    que siguen a las canceladas llegan a DynamoDB. Devuelve la lista de llamadas.
+    """
+    from botocore.exceptions import ClientError
+
+    def cancel(service, reasons_for, times: int = 1, before=None):
+        real = service.client.transact_write_items
+        calls = []
+
+        def transact_write_items(TransactItems, **kwargs):
+            calls.append(TransactItems)
+            if len(calls) <= times:
+                if before:
+                    before()
+                codes = reasons_for(TransactItems)
+                raise ClientError({
+                    'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+                    'CancellationReasons': [{'Code': code} for code in codes]
+                }, 'TransactWriteItems')
+            return real(TransactItems=TransactItems, **kwargs)
+
+        monkeypatch.setattr(service.client, "transact_write_items", transact_write_items)
+        return calls
+
+    return cancel
@@ -0,0 +1,75 @@
+"""Reintentos de las escrituras transaccionales de DynamoDBService ante cancelaciones"""
+
+import pytest
+
+from trade_storage import ConcurrentModificationError
+
+TRADE = {
+    "par": "BTC/USDT",
+    "precio_apertura": 100.0,
+    "take_profit": 110.0,
+    "stop_loss": 95.0,
+    "fecha_apertura": "2025-01-07T14:30:00",
+}
+
+def conflict_on(table_suffix: str):
+    """Motivos con ``TransactionConflict`` en la primera operación sobre esa tabla"""
+    def reasons(operations):
+        codes = ['None'] * len(operations)
+        for i, operation in enumerate(operations):
+            if next(iter(operation.values()))['TableName'].endswith(table_suffix):
+                codes[i] = 'TransactionConflict'
+                break
+        return codes
+    return reasons
+
+def test_create_retries_conflict_on_aggregate_row(dynamodb, cancel_transactions):
+    calls = cancel_transactions(dynamodb, conflict_on('aggregates'), times=2)
+    trade = dynamodb.create_trade(TRADE)
+    assert len(calls) == 3
+    assert dynamodb.get_trade(trade['id'])['par'] == "BTC/USDT"
+    assert dynamodb.get_collection_version()['version'] == 1
+    # El delta de agregados se aplicó una sola vez
+    assert dynamodb.aggregates.reconcile(dynamodb.get_all_trades()) == []
+
+def test_update_retries_throttling(dynamodb, cancel_transactions):
+    trade = dynamodb.create_trade(TRADE)
+    cancel_transactions(dynamodb, lambda ops: ['None'] * (len(ops) - 1) + ['ThrottlingError'])
+    updated = dynamodb.update_trade(trade['id'], {'observaciones': 'revisado'})
+    assert updated['observaciones'] == 'revisado'
+    assert dynamodb.get_collection_version()['version'] == 2
+
+def test_conflicts_give_up_after_bounded_attempts(dynamodb, cancel_transactions):
+    import dynamodb_service
+
+    calls = cancel_transactions(dynamodb, conflict_on('aggregates'), times=1000)
+    with pytest.raises(ConcurrentModificationError):
+        dynamodb.create_trade(TRADE)
+    assert len(calls) == dynamodb_service.VERSION_MAX_ATTEMPTS
+
+def test_other_cancellations_are_raised(dynamodb, cancel_transactions):
+    from botocore.exceptions import ClientError
+
+    calls = cancel_transactions(dynamodb, lambda ops: ['ValidationError'] + ['None'] * (len(ops) - 1))
+    with pytest.raises(ClientError):
+        dynamodb.create_trade(TRADE)
+    assert len(calls) == 1
+
+def test_counter_conflict_rereads_version(dynamodb, cancel_transactions):
+    trade = dynamodb.create_trade(TRADE)
+
+    def other_writer():
+        # Otra escritura confirma la versión 2 mientras la nuestra choca en el contador
+        dynamodb.changes.counters.update_item(
+            Key={'name': dynamodb.changes.counter_name},
+            UpdateExpression='SET #value = #value + :one',
+            ExpressionAttributeNames={'#value': 'value'},
+            ExpressionAttributeValues={':one': 1}
+        )
+
+    calls = cancel_transactions(dynamodb, conflict_on('counters'), before=other_writer)
+    dynamodb.update_trade(trade['id'], {'observaciones': 'revisado'})
+    # El reintento usa la versión releída: no hace falta un tercer intento
+    assert len(calls) == 2
+    assert dynamodb.get_collection_version()['version'] == 3
+    assert [t['id'] for t in dynamodb.get_changes(2)['trades']] == [trade['id']]
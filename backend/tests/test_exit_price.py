@@ -0,0 +1,38 @@
+import pytest
+
+from stats_engine import exit_price
+
+TRADE = {'precio_apertura': 100.0, 'take_profit': 110.0, 'stop_loss': 95.0, 'fecha_cierre': '2024-01-02'}
+
+# (motivo_cierre, precio_cierre, salida esperada)
+CASES = [
+    ("Take profit alcanzado", None, 110.0),
+    ("TP", None, 110.0),
+    ("  stop loss", None, 95.0),
+    ("SL tocado", None, 95.0),
+    ("Cierre manual: mistake", None, None),
+    ("Salida non-stop", None, None),
+    ("slippage", None, None),
+    ("Take profit alcanzado", 108.5, 108.5),
+    ("Cierre manual", 101.0, 101.0),
+    (None, None, None),
+]
+
+def test_exit_price_matches_leading_token():
+    for motivo, precio, expected in CASES:
+        trade = dict(TRADE, motivo_cierre=motivo, precio_cierre=precio)
+        assert exit_price(trade) == expected, motivo
+
+def test_exit_prices_arrow_matches_exit_price():
+    pa = pytest.importorskip("pyarrow")
+    from trade_snapshot import exit_prices
+
+    n = len(CASES)
+    table = pa.table({
+        'take_profit': [TRADE['take_profit']] * n,
+        'stop_loss': [TRADE['stop_loss']] * n,
+        'fecha_cierre': [TRADE['fecha_cierre']] * n,
+        'motivo_cierre': pa.array([motivo for motivo, _, _ in CASES], pa.string()),
+        'precio_cierre': pa.array([precio for _, precio, _ in CASES], pa.float64()),
+    })
+    assert exit_prices(table).to_pylist() == [expected for _, _, expected in CASES]
@@ -0,0 +1,32 @@
+"""Generación de variantes de imágenes (requiere Pillow)"""
+
+import io
+
+import pytest
+
+from image_variants import EXIF_ORIENTATION, render
+
+Image = pytest.importorskip("PIL.Image")
+
+def jpeg(width: int, height: int, orientation: int = 1) -> bytes:
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = orientation
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 80, 40)).save(out, 'JPEG', exif=exif)
+    return out.getvalue()
+
+def test_rotated_jpeg_keeps_requested_widths_and_true_size():
+    # Apaisada sin orientar, vertical al aplicar la orientación 6 (giro de 90°)
+    size, variants = render(jpeg(3000, 1600, orientation=6), (160, 480, 1280), ('webp',))
+    assert size == (1600, 3000)
+    assert [(v['width'], v['height']) for v in variants] == [(1280, 2400), (480, 900), (160, 300)]
+
+def test_draft_reports_original_size():
+    size, variants = render(jpeg(4000, 3000), (160, 480), ('webp',))
+    assert size == (4000, 3000)
+    assert [v['width'] for v in variants] == [480, 160]
+
+def test_small_source_is_not_upscaled():
+    size, variants = render(jpeg(300, 200, orientation=8), (160, 480), ('webp',))
+    assert size == (200, 300)
+    assert [(v['width'], v['height']) for v in variants] == [(200, 300), (160, 240)]
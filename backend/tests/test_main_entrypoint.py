@@ -0,0 +1,24 @@
+import os
+import runpy
+
+import pytest
+
+from conftest import BACKEND_DIR
+
+class Exec(Exception):
+    pass
+
+def test_python_main_execs_uvicorn_before_building_services(monkeypatch):
+    import trade_storage
+
+    def execv(path, args):
+        raise Exec(args)
+
+    def create_storage(url):
+        raise AssertionError("main.py construyó los servicios como __main__")
+
+    monkeypatch.setattr(os, "execv", execv)
+    monkeypatch.setattr(trade_storage, "create_storage", create_storage)
+    with pytest.raises(Exec) as exc:
+        runpy.run_path(os.path.join(BACKEND_DIR, "main.py"), run_name="__main__")
+    assert exc.value.args[0][1:4] == ["-m", "uvicorn", "main:app"]
@@ -0,0 +1,41 @@
+"""Caché de lectura con varios workers (cada uno con su caché en memoria)"""
+
+from sqlite_storage import SQLiteTradeStorage
+from trade_cache import CachedTradeService, InMemoryCache
+
+TRADE = {
+    "par": "BTC/USDT",
+    "precio_apertura": 100.0,
+    "take_profit": 110.0,
+    "stop_loss": 95.0,
+    "fecha_apertura": "2025-01-07T14:30:00",
+}
+
+def workers(tmp_path):
+    path = str(tmp_path / "trades.db")
+    return (CachedTradeService(SQLiteTradeStorage(path), InMemoryCache()),
+            CachedTradeService(SQLiteTradeStorage(path), InMemoryCache()))
+
+def test_versioned_reads_follow_writes_from_other_workers(tmp_path):
+    reader, writer = workers(tmp_path)
+    trade = writer.create_trade(TRADE)
+    version = reader.get_collection_version()['version']
+    assert [t['id'] for t in reader.get_all_trade_records(version)] == [trade['id']]
+    assert reader.get_trade(trade['id'], version)['observaciones'] is None
+
+    # La escritura de otro worker no invalida la caché de este
+    writer.update_trade(trade['id'], {'observaciones': 'revisado'})
+    second = writer.create_trade(TRADE)
+    version = reader.get_collection_version()['version']
+    assert {t['id'] for t in reader.get_all_trade_records(version)} == {trade['id'], second['id']}
+    assert reader.get_trade(trade['id'], version)['observaciones'] == 'revisado'
+    assert len(reader.get_all_trades(version)) == 2
+
+def test_versioned_entries_are_reused_within_a_version(tmp_path):
+    reader, _ = workers(tmp_path)
+    reader.create_trade(TRADE)
+    version = reader.get_collection_version()['version']
+    first = reader.get_all_trades_json(version)
+    hits = reader.cache.stats()['hits']
+    assert reader.get_all_trades_json(version) is first
+    assert reader.cache.stats()['hits'] == hits + 1
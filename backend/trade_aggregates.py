@@ -0,0 +1,185 @@
+from boto3.dynamodb.conditions import Key
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from dynamo_types import to_dynamo
+from stats_engine import trade_profit
+from trade_timeseries import CLOSE_FIELDS, time_contributions
+
+# Contadores que se mantienen por cada ámbito (total, par, mes, y por hora y día en trade_timeseries)
+AGGREGATE_FIELDS = ['trades', 'open_trades', 'closed_trades', 'realized_trades', 'wins', 'losses', 'profit']
+
+# Tolerancia al comparar sumas de P&L en la reconciliación
+PROFIT_TOLERANCE = 1e-6
+
+AggregateKey = Tuple[str, str]
+
+def contributions(trade: Optional[Dict[str, Any]]) -> Dict[AggregateKey, Dict[str, float]]:
+    """Lo que un trade aporta a cada fila agregada (``(scope, bucket)``)"""
+    if not trade:
+        return {}
+
+    closed = bool(trade.get('fecha_cierre'))
+    values = {
+        'trades': 1,
+        'open_trades': 0 if closed else 1,
+        'closed_trades': 1 if closed else 0
+    }
+    profit = trade_profit(trade)
+    if profit is not None:
+        values['realized_trades'] = 1
+        values['wins'] = 1 if profit > 0 else 0
+        values['losses'] = 1 if profit < 0 else 0
+        values['profit'] = profit
+
+    keys = [('total', 'all'), ('par', trade['par']), ('month', (trade.get('fecha_apertura') or '')[:7])]
+    rows = {key: dict(values) for key in keys}
+    # Series por hora y por día: aperturas en su fecha, cierres (y su P&L) en la de cierre
+    closing = {field: value for field, value in values.items() if field in CLOSE_FIELDS and closed}
+    rows.update(time_contributions(trade, closing))
+    return rows
+
+def aggregate_delta(old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]) -> Dict[AggregateKey, Dict[str, float]]:
+    """Diferencia en los agregados al pasar de ``old`` a ``new`` (None = no existe)"""
+    delta: Dict[AggregateKey, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for sign, trade in ((-1, old), (1, new)):
+        for key, values in contributions(trade).items():
+            for field, value in values.items():
+                delta[key][field] += sign * value
+
+    return {
+        key: {field: value for field, value in values.items() if value}
+        for key, values in delta.items()
+        if any(values.values())
+    }
+
+def _field_value(field: str, value: float) -> Any:
+    """Los contadores se guardan como enteros; solo el P&L es decimal"""
+    return to_dynamo(value if field == 'profit' else int(round(value)))
+
+def merge_deltas(deltas: Iterable[Dict[AggregateKey, Dict[str, float]]]) -> Dict[AggregateKey, Dict[str, float]]:
+    merged: Dict[AggregateKey, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for delta in deltas:
+        for key, values in delta.items():
+            for field, value in values.items():
+                merged[key][field] += value
+    return {key: dict(values) for key, values in merged.items()}
+
+def summarize(total: Dict[str, Any], pars: List[Dict[str, Any]], months: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Resumen de ``/stats/summary`` a partir de las filas agregadas (total, pares y meses)"""
+    realized = int(total.get('realized_trades', 0))
+    profit = float(total.get('profit', 0))
+    return {
+        'total_trades': int(total.get('trades', 0)),
+        'closed_trades': int(total.get('closed_trades', 0)),
+        'open_trades': int(total.get('open_trades', 0)),
+        'closed_without_exit': int(total.get('closed_trades', 0)) - realized,
+        'win_rate': int(total.get('wins', 0)) / realized * 100 if realized else 0.0,
+        'total_profit': profit,
+        'average_profit': profit / realized if realized else 0.0,
+        'trades_by_par': {row['bucket']: int(row.get('trades', 0)) for row in pars if row.get('trades')},
+        'monthly_stats': [
+            {'month': row['bucket'], 'trades': int(row.get('trades', 0)), 'profit': float(row.get('profit', 0))}
+            for row in months if row.get('trades')
+        ]
+    }
+
+def find_drift(expected: Dict[AggregateKey, Dict[str, float]],
+               stored: Dict[AggregateKey, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Filas cuyos contadores guardados no coinciden con los recalculados"""
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        want = expected.get(key, {})
+        have = stored.get(key, {})
+        fields = {
+            field: {'expected': want.get(field, 0), 'stored': float(have.get(field, 0))}
+            for field in AGGREGATE_FIELDS
+            if abs(want.get(field, 0) - float(have.get(field, 0))) > PROFIT_TOLERANCE
+        }
+        if fields:
+            drift.append({'scope': key[0], 'bucket': key[1], 'fields': fields})
+    return drift
+
+class AggregateStore:
+    """Filas agregadas precalculadas (tabla con clave ``scope`` + ``bucket``)"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def update_ops(self, delta: Dict[AggregateKey, Dict[str, float]]) -> List[Dict[str, Any]]:
+        """Operaciones ``Update`` (formato TransactWriteItems) que aplican ``delta`` con ``ADD``"""
+        ops = []
+        for (scope, bucket), values in delta.items():
+            names = {}
+            expression_values = {}
+            clauses = []
+            for i, (field, value) in enumerate(sorted(values.items())):
+                names[f"#f{i}"] = field
+                expression_values[f":v{i}"] = _field_value(field, value)
+                clauses.append(f"#f{i} :v{i}")
+            ops.append({
+                'Update': {
+                    'TableName': self.table.name,
+                    'Key': {'scope': scope, 'bucket': bucket},
+                    'UpdateExpression': "ADD " + ", ".join(clauses),
+                    'ExpressionAttributeNames': names,
+                    'ExpressionAttributeValues': expression_values
+                }
+            })
+        return ops
+
+    def read_row(self, scope: str, bucket: str) -> Dict[str, Any]:
+        """Una fila agregada ({} si no existe)"""
+        return self.table.get_item(Key={'scope': scope, 'bucket': bucket}).get('Item', {})
+
+    def read_scope(self, scope: str, low: Optional[str] = None, high: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Las filas de un ámbito (con bucket entre ``low`` y ``high`` si se indican), ordenadas por bucket"""
+        condition = Key('scope').eq(scope)
+        if low and high:
+            condition &= Key('bucket').between(low, high)
+        elif low:
+            condition &= Key('bucket').gte(low)
+        elif high:
+            condition &= Key('bucket').lte(high)
+        query_kwargs = {'KeyConditionExpression': condition}
+        rows = []
+        while True:
+            response = self.table.query(**query_kwargs)
+            rows.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return rows
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def summary(self) -> Dict[str, Any]:
+        """Estadísticas precalculadas: una lectura por ámbito, sin recorrer los trades"""
+        return summarize(next(iter(self.read_scope('total')), {}), self.read_scope('par'), self.read_scope('month'))
+
+    def reconcile(self, trades: Iterable[Dict[str, Any]], apply: bool = False) -> List[Dict[str, Any]]:
+        """Recalcular los agregados desde cero y devolver las filas con drift.
+
+        Con ``apply=True`` reescribe las filas incorrectas y borra las sobrantes.
+        """
+        expected = merge_deltas(aggregate_delta(None, trade) for trade in trades)
+
+        stored = {}
+        scan_kwargs = {}
+        while True:
+            response = self.table.scan(**scan_kwargs)
+            for row in response.get('Items', []):
+                stored[(row['scope'], row['bucket'])] = row
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        drift = find_drift(expected, stored)
+
+        if apply:
+            with self.table.batch_writer() as batch:
+                for row in drift:
+                    key = (row['scope'], row['bucket'])
+                    if key in expected:
+                        item = {'scope': key[0], 'bucket': key[1]}
+                        item.update({f: _field_value(f, v) for f, v in expected[key].items()})
+                        batch.put_item(Item=item)
+                    else:
+                        batch.delete_item(Key={'scope': key[0], 'bucket': key[1]})
+        return drift
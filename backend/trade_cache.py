@@ -0,0 +1,348 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from fast_json import dumps
+import pickle
+import threading
+import time
+
+try:
+    import redis
+except ImportError:  # redis es opcional: solo para compartir la caché entre workers
+    redis = None
+
+MISS = object()
+
+class CacheBackend(ABC):
+    """Interfaz mínima de caché clave/valor con TTL"""
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        """Devolver el valor o ``MISS``"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, generation: Optional[int] = None) -> None:
+        """Guardar ``value``; con ``generation``, solo si no hubo invalidaciones desde
+        que se leyó esa generación (comparar y guardar de forma atómica)"""
+
+    @abstractmethod
+    def generation(self) -> int:
+        """Contador que aumenta con cada ``delete``/``delete_prefix``"""
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        pass
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None:
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        pass
+
+class InMemoryCache(CacheBackend):
+    """LRU en memoria del proceso, acotada por número de entradas y con TTL"""
+
+    def __init__(self, max_entries: int = 10000, default_ttl: float = 30):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.discarded = 0
+        self._generation = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISS
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISS
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, generation: Optional[int] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self.discarded += 1
+                return
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'memory',
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'discarded': self.discarded
+        }
+
+class RedisCache(CacheBackend):
+    """Caché compartida entre workers sobre Redis (o un servidor compatible)"""
+
+    GENERATION_KEY = "cache:generation"
+    # Guardar solo si la generación no cambió (comparar y guardar en el servidor)
+    SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+if ARGV[3] == '0' then
+    redis.call('SET', KEYS[2], ARGV[2])
+else
+    redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[3])
+end
+return 1
+"""
+
+    def __init__(self, url: str, default_ttl: float = 30, namespace: str = "trade-tracker:"):
+        if redis is None:
+            raise RuntimeError("RedisCache requiere el paquete redis")
+        self.client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self._set_if_generation = self.client.register_script(self.SET_IF_GENERATION)
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(self.namespace + key)
+        if raw is None:
+            self.misses += 1
+            return MISS
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, generation: Optional[int] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        px = int(ttl * 1000) if ttl else None
+        if generation is None:
+            self.client.set(self.namespace + key, pickle.dumps(value), px=px)
+            return
+        stored = self._set_if_generation(
+            keys=[self.namespace + self.GENERATION_KEY, self.namespace + key],
+            args=[generation, pickle.dumps(value), px or 0]
+        )
+        if not stored:
+            self.discarded += 1
+
+    def generation(self) -> int:
+        return int(self.client.get(self.namespace + self.GENERATION_KEY) or 0)
+
+    def _invalidate(self, keys: List[bytes]) -> None:
+        # Borrar y subir la generación en una transacción: un set condicional
+        # corre antes (y su valor se borra) o después (y se descarta)
+        pipeline = self.client.pipeline(transaction=True)
+        if keys:
+            pipeline.delete(*keys)
+        pipeline.incr(self.namespace + self.GENERATION_KEY)
+        pipeline.execute()
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._invalidate([self.namespace + key for key in keys])
+
+    def delete_prefix(self, prefix: str) -> None:
+        self._invalidate(list(self.client.scan_iter(match=f"{self.namespace}{prefix}*", count=500)))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'backend': 'redis',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'discarded': self.discarded
+        }
+
+def create_cache(url: str, default_ttl: float, max_entries: int) -> CacheBackend:
+    """Crear el backend según la URL: ``memory://`` o ``redis://host:port/db``"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url, default_ttl=default_ttl)
+    return InMemoryCache(max_entries=max_entries, default_ttl=default_ttl)
+
+class CachedTradeService:
+    """Lectura a través de caché sobre un ``TradeStorage`` con invalidación precisa en escrituras.
+
+    Los métodos que no se cachean se delegan directamente al servicio. La versión
+    de la colección (``get_collection_version``) no se cachea: es el validador de
+    los GET condicionales y tiene que reflejar la última escritura de cualquier worker.
+    """
+
+    ALL_KEY = "trades:all"
+    ALL_RECORDS_KEY = "trades:all:records"
+    ALL_JSON_KEY = "trades:all:json"
+    # Entradas guardadas junto con la versión de la colección en la que se leyeron
+    VERSIONED = "@versioned"
+    # Cualquier escritura invalida estas claves
+    ALL_KEYS = (ALL_KEY, ALL_RECORDS_KEY, ALL_JSON_KEY,
+                ALL_KEY + VERSIONED, ALL_RECORDS_KEY + VERSIONED, ALL_JSON_KEY + VERSIONED)
+
+    def __init__(self, service, cache: CacheBackend):
+        self._service = service
+        self.cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._service, name)
+
+    @staticmethod
+    def _trade_key(trade_id: int) -> str:
+        return f"trade:{int(trade_id)}"
+
+    @classmethod
+    def _trade_keys(cls, trade_id: int) -> List[str]:
+        key = cls._trade_key(trade_id)
+        return [key, key + cls.VERSIONED]
+
+    @staticmethod
+    def _par_key(par: str) -> str:
+        return f"trades:par:{par}"
+
+    @classmethod
+    def _par_keys(cls, par: str) -> List[str]:
+        """La lista de un par (también la guardada con su versión) y la ya codificada en JSON"""
+        return [cls._par_key(par), cls._par_key(par) + cls.VERSIONED, cls._par_json_key(par)]
+
+    @staticmethod
+    def _par_json_key(par: str) -> str:
+        return f"trades:par:{par}:json"
+
+    def _cached(self, key: str, loader, version: Optional[int] = None) -> Any:
+        """Leer ``key`` de la caché o cargarlo con ``loader``.
+
+        Con ``version`` (la versión de la colección que se acaba de leer, p. ej. para
+        un ``ETag``) la entrada guarda la versión en la que se cargó y solo sirve para
+        esa: con ``CACHE_URL=memory://`` las escrituras de otros workers no invalidan
+        esta caché, y así nunca se responde un cuerpo anterior con un validador nuevo.
+        Se guarda una sola entrada por clave (la de la última versión leída).
+        """
+        if version is not None:
+            key += self.VERSIONED
+        value = self.cache.get(key)
+        if value is not MISS and version is not None:
+            value = value[1] if value[0] == version else MISS
+        if value is MISS:
+            # Si una escritura invalida la caché mientras se carga, el valor (quizás
+            # anterior a la escritura) no se guarda: lo descarta el set condicional
+            generation = self.cache.generation()
+            value = loader()
+            if value is not None:
+                self.cache.set(key, value if version is None else (version, value), generation=generation)
+        return value
+
+    # Lecturas
+    def get_trade(self, trade_id: int, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        return self._cached(self._trade_key(trade_id), lambda: self._service.get_trade(trade_id), version)
+
+    def get_all_trades(self, version: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._cached(self.ALL_KEY, self._service.get_all_trades, version)
+
+    def get_all_trade_records(self, version: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._cached(self.ALL_RECORDS_KEY, self._service.get_all_trade_records, version)
+
+    def get_trades_by_par(self, par: str, version: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._cached(self._par_key(par), lambda: self._service.get_trades_by_par(par), version)
+
+    # Respuestas ya codificadas: mientras los datos no cambien no se vuelven a serializar
+    def get_all_trades_json(self, version: Optional[int] = None) -> bytes:
+        return self._cached(self.ALL_JSON_KEY, lambda: dumps(self._service.get_all_trade_records()), version)
+
+    def get_trades_by_par_json(self, par: str) -> bytes:
+        return self._cached(self._par_json_key(par), lambda: dumps(self._service.get_trade_records_by_par(par)))
+
+    # Escrituras
+    def create_trade(self, trade_data: Dict[str, Any]) -> Dict[str, Any]:
+        trade = self._service.create_trade(trade_data)
+        self.cache.delete(*self.ALL_KEYS, *self._par_keys(trade['par']))
+        return trade
+
+    def update_trade(self, trade_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        previous_par = self._cached_par(trade_id)
+        trade = self._service.update_trade(trade_id, updates)
+        self._invalidate_trade(trade_id, previous_par, trade)
+        return trade
+
+    def close_trade(self, trade_id: int, *args, **kwargs) -> Optional[Dict[str, Any]]:
+        previous_par = self._cached_par(trade_id)
+        trade = self._service.close_trade(trade_id, *args, **kwargs)
+        self._invalidate_trade(trade_id, previous_par, trade)
+        return trade
+
+    def delete_trade(self, trade_id: int) -> bool:
+        previous_par = self._cached_par(trade_id)
+        deleted = self._service.delete_trade(trade_id)
+        self._invalidate_trade(trade_id, previous_par, None)
+        return deleted
+
+    def batch_create_trades(self, trades_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results = self._service.batch_create_trades(trades_data)
+        pars = {r['trade']['par'] for r in results if r['status'] == 'created'}
+        self.cache.delete(*self.ALL_KEYS, *(key for par in pars for key in self._par_keys(par)))
+        return results
+
+    def batch_close_trades(self, closes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results = self._service.batch_close_trades(closes)
+        self._invalidate_batch(results)
+        return results
+
+    def batch_delete_trades(self, trade_ids: List[int]) -> List[Dict[str, Any]]:
+        results = self._service.batch_delete_trades(trade_ids)
+        self._invalidate_batch(results)
+        return results
+
+    def _cached_par(self, trade_id: int) -> Any:
+        trade = self.cache.get(self._trade_key(trade_id))
+        return trade['par'] if trade is not MISS and trade else MISS
+
+    def _invalidate_batch(self, results: List[Dict[str, Any]]) -> None:
+        self.cache.delete(*self.ALL_KEYS, *(key for r in results for key in self._trade_keys(r['id'])))
+        self.cache.delete_prefix("trades:par:")
+
+    def _invalidate_trade(self, trade_id: int, previous_par: Any, trade: Optional[Dict[str, Any]]) -> None:
+        keys = [*self._trade_keys(trade_id), *self.ALL_KEYS]
+        if trade:
+            keys.extend(self._par_keys(trade['par']))
+        if previous_par is MISS:
+            # No sabemos a qué par pertenecía: invalidar todas las listas por par
+            self.cache.delete_prefix("trades:par:")
+        else:
+            keys.extend(self._par_keys(previous_par))
+        self.cache.delete(*keys)
@@ -0,0 +1,115 @@
+from boto3.dynamodb.conditions import Key
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+from dynamo_types import to_dynamo
+
+CHANGES_FEED = 'trades'
+
+class ChangesExpired(Exception):
+    """La versión pedida es anterior a los cambios que se conservan"""
+
+class ChangeFeed:
+    """Versión de la colección de trades y registro de cambios por versión.
+
+    La versión vive en la tabla de contadores y se incrementa dentro de la misma
+    transacción que escribe los trades, condicionada a su valor anterior: así
+    nunca hay dos escrituras con la misma versión, la versión visible siempre
+    corresponde a datos ya escritos y cada versión deja en la tabla de cambios
+    qué trades tocó (``put`` o ``delete``). El costo es que las escrituras
+    concurrentes se serializan sobre el contador y reintentan si chocan.
+    """
+
+    def __init__(self, counters_table, changes_table, counter_name: str = "trades_version",
+                 retention_days: float = 0):
+        self.counters = counters_table
+        self.table = changes_table
+        self.counter_name = counter_name
+        self.retention = retention_days * 86400
+        self._lock = threading.Lock()
+        self._known: Optional[int] = None
+
+    def current(self) -> Dict[str, Any]:
+        """Versión actual y fecha de la última escritura (epoch, ``None`` si nunca se escribió)"""
+        item = self.counters.get_item(Key={'name': self.counter_name}, ConsistentRead=True).get('Item', {})
+        state = {
+            'version': int(item.get('value', 0)),
+            'modified_at': float(item['modified_at']) if 'modified_at' in item else None
+        }
+        with self._lock:
+            self._known = state['version']
+        return state
+
+    def known_version(self) -> int:
+        """Última versión vista por este proceso (se lee si aún no se conoce)"""
+        with self._lock:
+            known = self._known
+        return self.current()['version'] if known is None else known
+
+    def forget(self) -> None:
+        """Descartar la versión conocida (otro proceso escribió antes)"""
+        with self._lock:
+            self._known = None
+
+    def advance(self, version: int) -> None:
+        with self._lock:
+            if self._known is None or version > self._known:
+                self._known = version
+
+    def write_ops(self, current: int, changes: List[Tuple[int, str]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Operaciones de transacción para registrar ``changes`` (trade_id, 'put' | 'delete').
+
+        Devuelve las operaciones (la primera es el contador) y la nueva versión.
+        """
+        now = time.time()
+        new_version = current + len(changes)
+        counter = {
+            'Update': {
+                'TableName': self.counters.name,
+                'Key': {'name': self.counter_name},
+                'UpdateExpression': 'SET #value = :next, #modified_at = :now',
+                'ConditionExpression': '#value = :current' if current else 'attribute_not_exists(#value)',
+                'ExpressionAttributeNames': {'#value': 'value', '#modified_at': 'modified_at'},
+                'ExpressionAttributeValues': {':next': new_version, ':now': to_dynamo(round(now, 3))}
+            }
+        }
+        if current:
+            counter['Update']['ExpressionAttributeValues'][':current'] = current
+
+        ops = [counter]
+        for offset, (trade_id, op) in enumerate(changes, start=1):
+            entry = {
+                'feed': CHANGES_FEED,
+                'version': current + offset,
+                'trade_id': int(trade_id),
+                'op': op,
+                'modified_at': to_dynamo(round(now, 3))
+            }
+            if self.retention:
+                entry['expires_at'] = int(now + self.retention)
+            ops.append({'Put': {'TableName': self.table.name, 'Item': entry}})
+        return ops, new_version
+
+    def since(self, version: int, until: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Cambios con versión mayor a ``version`` (y hasta ``until``), en orden"""
+        condition = Key('feed').eq(CHANGES_FEED)
+        if until is None:
+            condition &= Key('version').gt(version)
+        else:
+            condition &= Key('version').between(version + 1, until)
+        query_kwargs = {'KeyConditionExpression': condition, 'ConsistentRead': True}
+        entries = []
+        while True:
+            response = self.table.query(**query_kwargs)
+            entries.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return entries
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def oldest_version(self) -> Optional[int]:
+        """La versión más antigua que se conserva (``None`` si no hay cambios)"""
+        response = self.table.query(
+            KeyConditionExpression=Key('feed').eq(CHANGES_FEED), Limit=1, ConsistentRead=True
+        )
+        items = response.get('Items', [])
+        return int(items[0]['version']) if items else None
@@ -0,0 +1,125 @@
+"""
+Conversión directa entre el formato de DynamoDB ({"N": "1.5"}, {"S": "..."})
+y registros planos de trades (float, str, list), sin pasar por ``TypeDeserializer``
+ni ``Decimal``. Es el camino del cliente de bajo nivel para listas grandes.
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+def _string(value: Dict[str, Any]) -> Optional[str]:
+    return value.get('S')
+
+def _float(value: Dict[str, Any]) -> Optional[float]:
+    number = value.get('N')
+    return None if number is None else float(number)
+
+def _int(value: Dict[str, Any]) -> Optional[int]:
+    number = value.get('N')
+    return None if number is None else int(number)
+
+def _string_list(value: Dict[str, Any]) -> List[str]:
+    if 'L' in value:
+        return [v['S'] for v in value['L'] if 'S' in v]
+    return list(value.get('SS', []))
+
+# Campos del modelo ``Trade``, en su orden, con su decodificador y valor por defecto (o fábrica)
+TRADE_FIELDS: Dict[str, tuple] = {
+    'id': (_int, None),
+    'par': (_string, None),
+    'precio_apertura': (_float, None),
+    'take_profit': (_float, None),
+    'stop_loss': (_float, None),
+    'fecha_apertura': (_string, None),
+    'fecha_cierre': (_string, None),
+    'motivo_cierre': (_string, None),
+    'precio_cierre': (_float, None),
+    'observaciones': (_string, None),
+    'imagenes': (_string_list, list),
+}
+
+def select_fields(spec: Optional[str]) -> Optional[List[str]]:
+    """``?fields=par,fecha_apertura`` → campos de ``Trade`` en su orden, siempre con ``id``
+    (``None`` = todos). ``ValueError`` si hay campos desconocidos."""
+    if not spec:
+        return None
+    requested = {field.strip() for field in spec.split(',') if field.strip()}
+    unknown = requested - TRADE_FIELDS.keys()
+    if unknown:
+        raise ValueError(f"Campos desconocidos: {', '.join(sorted(unknown))}")
+    return [field for field in TRADE_FIELDS if field in requested or field == 'id']
+
+def project_records(records: List[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Recortar registros ya decodificados a ``fields``"""
+    if fields is None:
+        return records
+    return [{field: record.get(field) for field in fields} for record in records]
+
+def decode_trade(item: Dict[str, Dict[str, Any]], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Item de DynamoDB (formato de red) → registro con los campos de ``Trade`` (o solo ``fields``)"""
+    record = {}
+    for field in fields or TRADE_FIELDS:
+        decode, default = TRADE_FIELDS[field]
+        value = item.get(field)
+        if value is not None:
+            record[field] = decode(value)
+        else:
+            record[field] = default() if callable(default) else default
+    return record
+
+def trade_record(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Item del recurso (tipos de Python) → registro con los campos de ``Trade``"""
+    record = {}
+    for field, (_, default) in TRADE_FIELDS.items():
+        value = item.get(field)
+        record[field] = value if value is not None else (default() if callable(default) else default)
+    return record
+
+def decode_value(value: Dict[str, Any]) -> Any:
+    """Valor genérico (claves, cursores): los números enteros quedan como ``int``"""
+    if 'S' in value:
+        return value['S']
+    if 'N' in value:
+        number = value['N']
+        return int(number) if number.lstrip('-').isdigit() else Decimal(number)
+    if 'BOOL' in value:
+        return value['BOOL']
+    if 'NULL' in value:
+        return None
+    if 'L' in value:
+        return [decode_value(v) for v in value['L']]
+    if 'M' in value:
+        return decode_item(value['M'])
+    if 'SS' in value:
+        return set(value['SS'])
+    raise ValueError(f"Tipo de DynamoDB no soportado: {list(value)}")
+
+def decode_item(item: Optional[Dict[str, Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    return None if item is None else {k: decode_value(v) for k, v in item.items()}
+
+def encode_value(value: Any) -> Dict[str, Any]:
+    """Valor de Python → formato de DynamoDB (para claves y ExpressionAttributeValues)"""
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float, Decimal)):
+        return {'N': str(value)}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, (list, tuple)):
+        return {'L': [encode_value(v) for v in value]}
+    if isinstance(value, dict):
+        return {'M': encode_item(value)}
+    raise TypeError(f"Tipo no soportado para DynamoDB: {type(value).__name__}")
+
+def encode_item(item: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return {k: encode_value(v) for k, v in item.items()}
+
+def encode_request(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Parámetros de Query/Scan pensados para el recurso → parámetros del cliente de bajo nivel"""
+    kwargs = dict(kwargs)
+    for key in ('ExpressionAttributeValues', 'ExclusiveStartKey'):
+        if key in kwargs:
+            kwargs[key] = encode_item(kwargs[key])
+    return kwargs
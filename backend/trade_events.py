@@ -0,0 +1,246 @@
+from abc import ABC, abstractmethod
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import threading
+from fastapi import Request, WebSocket, WebSocketDisconnect
+from fast_json import dumps
+from trade_codec import trade_record
+
+try:
+    import redis
+except ImportError:  # redis es opcional: solo para repartir eventos entre workers
+    redis = None
+
+def change_event(version: int, changes: List[Tuple[int, Optional[Dict[str, Any]]]]) -> Dict[str, Any]:
+    """Evento compacto de una escritura, con la misma forma que ``GET /trades/changes``"""
+    return {
+        'type': 'changes',
+        'version': version,
+        'trades': [trade_record(item) for _, item in changes if item is not None],
+        'deleted': [int(trade_id) for trade_id, item in changes if item is None]
+    }
+
+class Message:
+    """Evento ya codificado: se serializa una vez y se reparte a todos los suscriptores"""
+
+    def __init__(self, type: str, version: Optional[int], payload: bytes):
+        self.type = type
+        self.version = version
+        self.payload = payload
+
+    @classmethod
+    def of(cls, event: Dict[str, Any]) -> "Message":
+        return cls(event['type'], event.get('version'), dumps(event))
+
+    @cached_property
+    def text(self) -> str:
+        """Texto para los frames de WebSocket (se decodifica una vez para todos)"""
+        return self.payload.decode()
+
+    @cached_property
+    def sse(self) -> bytes:
+        """Trama de Server-Sent Events (``id`` = versión, para ``Last-Event-ID``)"""
+        frame = b"event: " + self.type.encode()
+        if self.version is not None:
+            frame += b"\nid: " + str(self.version).encode()
+        return frame + b"\ndata: " + self.payload + b"\n\n"
+
+RESYNC = Message.of({'type': 'resync'})
+
+class Subscription:
+    """Cola acotada de un suscriptor. Si se llena (cliente lento) se vacía y queda
+    solo ``RESYNC``: el cliente debe recargar con ``GET /trades/changes``"""
+
+    def __init__(self, hub: "EventHub", queue_size: int):
+        self.hub = hub
+        self.queue: "asyncio.Queue[Message]" = asyncio.Queue(queue_size)
+        self.lagging = False
+
+    def offer(self, message: Message) -> bool:
+        if self.lagging:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.lagging = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            return False
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Message]:
+        """Próximo mensaje, o ``None`` si pasa ``timeout`` sin eventos (latido)"""
+        if not self.queue.empty():
+            # Sin esperar no hace falta wait_for (que crea una tarea por llamada)
+            return self.queue.get_nowait()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+class EventHub:
+    """Fan-out en el event loop: cada mensaje se encola en la cola de cada suscriptor
+    sin esperar a ninguno, así que un cliente lento no frena a los demás"""
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.delivered = 0
+        self.resyncs = 0
+        self.peak_subscribers = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def subscribe(self) -> Subscription:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self, self.queue_size)
+        self._subscribers.add(subscription)
+        self.peak_subscribers = max(self.peak_subscribers, len(self._subscribers))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, message: Message) -> None:
+        """Repartir un mensaje (desde el event loop)"""
+        self.published += 1
+        for subscription in list(self._subscribers):
+            if subscription.offer(message):
+                self.delivered += 1
+            elif subscription.lagging:
+                self.resyncs += 1
+                self._subscribers.discard(subscription)
+
+    def publish_threadsafe(self, message: Message) -> None:
+        """Repartir un mensaje desde otro hilo (las escrituras corren en el pool de AWS)"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self.publish, message)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'subscribers': len(self._subscribers),
+            'peak_subscribers': self.peak_subscribers,
+            'queue_size': self.queue_size,
+            'published': self.published,
+            'delivered': self.delivered,
+            'resyncs': self.resyncs
+        }
+
+class EventBroker(ABC):
+    """Transporte de los eventos de escritura hasta el ``EventHub`` de cada worker"""
+
+    def __init__(self, hub: EventHub):
+        self.hub = hub
+
+    @abstractmethod
+    def publish(self, version: int, changes: List[Tuple[int, Optional[Dict[str, Any]]]]) -> None:
+        """Publicar una escritura ya confirmada (se llama desde el hilo que escribió)"""
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.hub.bind(loop)
+
+    def stop(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': 'memory', **self.hub.stats()}
+
+class InProcessBroker(EventBroker):
+    """Eventos dentro del proceso: cada worker solo ve sus propias escrituras"""
+
+    def publish(self, version: int, changes: List[Tuple[int, Optional[Dict[str, Any]]]]) -> None:
+        self.hub.publish_threadsafe(Message.of(change_event(version, changes)))
+
+class RedisBroker(EventBroker):
+    """Eventos por Redis pub/sub: todos los workers reciben las escrituras de todos"""
+
+    def __init__(self, hub: EventHub, url: str, channel: str = "trade-events"):
+        if redis is None:
+            raise RuntimeError("RedisBroker requiere el paquete redis")
+        super().__init__(hub)
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._pubsub = None
+
+    def publish(self, version: int, changes: List[Tuple[int, Optional[Dict[str, Any]]]]) -> None:
+        self.client.publish(self.channel, dumps(change_event(version, changes)))
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        super().start(loop)
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+        threading.Thread(target=self._listen, args=(self._pubsub,), name="trade-events", daemon=True).start()
+
+    def _listen(self, pubsub) -> None:
+        try:
+            for raw in pubsub.listen():
+                payload = raw['data']
+                version = json.loads(payload).get('version')
+                self.hub.publish_threadsafe(Message('changes', version, payload))
+        except (redis.ConnectionError, ValueError) as e:
+            print(f"Escucha de eventos detenida: {e}")
+
+    def stop(self) -> None:
+        if self._pubsub is not None:
+            self._pubsub.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), 'backend': 'redis', 'channel': self.channel}
+
+def create_broker(url: str, hub: EventHub) -> EventBroker:
+    """Crear el broker según la URL: ``memory://`` o ``redis://host:port/db``"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(hub, url)
+    return InProcessBroker(hub)
+
+# Transportes hacia el cliente
+
+async def stream_websocket(websocket: WebSocket, subscription: Subscription, hello: Dict[str, Any],
+                           heartbeat: float) -> None:
+    """Enviar ``hello`` y luego los eventos de la suscripción por un WebSocket ya aceptado.
+
+    Sin eventos se envía un ``ping`` cada ``heartbeat`` segundos (detecta clientes
+    desconectados); tras ``resync`` se cierra la conexión.
+    """
+    ping = Message.of({'type': 'ping'})
+    try:
+        await websocket.send_text(Message.of(hello).text)
+        while True:
+            message = await subscription.get(heartbeat) or ping
+            await websocket.send_text(message.text)
+            if message is RESYNC:
+                await websocket.close(code=1013)
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+
+async def sse_frames(request: Request, subscription: Subscription, hello: Dict[str, Any], heartbeat: float):
+    """Generador de Server-Sent Events: ``hello``, los eventos y un comentario como latido"""
+    try:
+        yield Message.of(hello).sse
+        while True:
+            message = await subscription.get(heartbeat)
+            if message is None:
+                if await request.is_disconnected():
+                    return
+                yield b": ping\n\n"
+                continue
+            yield message.sse
+            if message is RESYNC:
+                return
+    finally:
+        subscription.close()
@@ -0,0 +1,128 @@
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List
+import csv
+import io
+import json
+import zlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: solo se necesita para exportar a Parquet
+    pa = None
+    pq = None
+
+PARQUET_AVAILABLE = pa is not None
+
+EXPORT_COLUMNS = [
+    'id', 'par', 'precio_apertura', 'take_profit', 'stop_loss',
+    'fecha_apertura', 'fecha_cierre', 'motivo_cierre', 'precio_cierre', 'observaciones', 'imagenes'
+]
+
+MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+def _plain(value: Any) -> Any:
+    """Convertir los ``Decimal`` de DynamoDB a tipos nativos"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+def _row(trade: Dict[str, Any]) -> Dict[str, Any]:
+    return {column: _plain(trade.get(column)) for column in EXPORT_COLUMNS}
+
+class CsvEncoder:
+    def __init__(self):
+        self._header_sent = False
+
+    def encode(self, trades: List[Dict[str, Any]]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not self._header_sent:
+            writer.writerow(EXPORT_COLUMNS)
+            self._header_sent = True
+        for trade in trades:
+            row = _row(trade)
+            row['imagenes'] = ' '.join(row['imagenes'] or [])
+            writer.writerow(['' if row[c] is None else row[c] for c in EXPORT_COLUMNS])
+        return buffer.getvalue().encode('utf-8')
+
+    def finish(self) -> bytes:
+        return b'' if self._header_sent else self.encode([])
+
+class NdjsonEncoder:
+    def encode(self, trades: List[Dict[str, Any]]) -> bytes:
+        return ''.join(json.dumps(_row(t), ensure_ascii=False) + '\n' for t in trades).encode('utf-8')
+
+    def finish(self) -> bytes:
+        return b''
+
+class ParquetEncoder:
+    """Escribe un row group por página; el footer se emite al terminar"""
+
+    SCHEMA = None if pa is None else pa.schema([
+        ('id', pa.int64()),
+        ('par', pa.string()),
+        ('precio_apertura', pa.float64()),
+        ('take_profit', pa.float64()),
+        ('stop_loss', pa.float64()),
+        ('fecha_apertura', pa.string()),
+        ('fecha_cierre', pa.string()),
+        ('motivo_cierre', pa.string()),
+        ('precio_cierre', pa.float64()),
+        ('observaciones', pa.string()),
+        ('imagenes', pa.list_(pa.string())),
+    ])
+
+    def __init__(self):
+        if pa is None:
+            raise RuntimeError("La exportación a Parquet requiere pyarrow")
+        self._sink = io.BytesIO()
+        self._writer = pq.ParquetWriter(self._sink, self.SCHEMA)
+
+    def encode(self, trades: List[Dict[str, Any]]) -> bytes:
+        if trades:
+            rows = [_row(t) for t in trades]
+            self._writer.write_table(pa.Table.from_pylist(rows, schema=self.SCHEMA))
+        return self._drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._drain()
+
+    def _drain(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+ENCODERS = {
+    'csv': CsvEncoder,
+    'ndjson': NdjsonEncoder,
+    'parquet': ParquetEncoder,
+}
+
+async def encode_pages(pages: AsyncIterator[List[Dict[str, Any]]], fmt: str) -> AsyncIterator[bytes]:
+    """Convertir páginas de trades en chunks del formato pedido, una página a la vez"""
+    encoder = ENCODERS[fmt]()
+    async for trades in pages:
+        chunk = encoder.encode(trades)
+        if chunk:
+            yield chunk
+    chunk = encoder.finish()
+    if chunk:
+        yield chunk
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Comprimir un stream con gzip sin acumularlo en memoria"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
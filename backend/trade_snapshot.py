@@ -0,0 +1,416 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import os
+import threading
+import time
+import numpy as np
+from equity_engine import ClosedTrades
+from query_planner import DATE_UPPER_SUFFIX, RANGE_FILTERS, TradeFilters
+from stats_engine import STOP_LOSS_REASON, TAKE_PROFIT_REASON, TradeColumns, compute_stats
+from trade_changes import ChangesExpired
+from trade_codec import TRADE_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:  # pyarrow es opcional: sin él no hay snapshots (se lee del almacenamiento)
+    pa = None
+
+SNAPSHOT_AVAILABLE = pa is not None
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+SNAPSHOT_COLUMNS = list(TRADE_FIELDS) + ['created_at', 'updated_at']
+
+SCHEMA = None if pa is None else pa.schema([
+    ('id', pa.int64()),
+    ('par', pa.string()),
+    ('precio_apertura', pa.float64()),
+    ('take_profit', pa.float64()),
+    ('stop_loss', pa.float64()),
+    ('fecha_apertura', pa.string()),
+    ('fecha_cierre', pa.string()),
+    ('motivo_cierre', pa.string()),
+    ('precio_cierre', pa.float64()),
+    ('observaciones', pa.string()),
+    ('imagenes', pa.list_(pa.string())),
+    ('created_at', pa.string()),
+    ('updated_at', pa.string()),
+])
+# Los deltas llevan además las bajas: solo ``id`` y ``deleted=true``
+DELTA_SCHEMA = None if pa is None else SCHEMA.append(pa.field('deleted', pa.bool_()))
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (list, set)):
+        return [_plain(v) for v in value]
+    return value
+
+def to_batch(items: List[Dict[str, Any]], deleted: List[int] = (), delta: bool = False) -> 'pa.RecordBatch':
+    """Items del almacenamiento (y IDs eliminados, solo en deltas) → ``RecordBatch``"""
+    schema = DELTA_SCHEMA if delta else SCHEMA
+    rows = [{name: _plain(item.get(name)) for name in SNAPSHOT_COLUMNS} for item in items]
+    if delta:
+        for row in rows:
+            row['deleted'] = False
+        rows += [{'id': int(trade_id), 'deleted': True} for trade_id in deleted]
+    return pa.RecordBatch.from_pylist(rows, schema=schema)
+
+def exit_prices(table: 'pa.Table') -> 'pa.ChunkedArray':
+    """``stats_engine.exit_price`` vectorizado: ``precio_cierre`` o el deducido del motivo"""
+    closed = pc.fill_null(pc.greater(pc.utf8_length(table['fecha_cierre']), 0), False)
+    motivo = pc.utf8_lower(pc.fill_null(table['motivo_cierre'], ''))
+    take = pc.match_substring_regex(motivo, TAKE_PROFIT_REASON)
+    stop = pc.match_substring_regex(motivo, STOP_LOSS_REASON)
+    missing = pa.scalar(None, pa.float64())
+    deduced = pc.if_else(take, table['take_profit'], pc.if_else(stop, table['stop_loss'], missing))
+    return pc.if_else(closed, pc.coalesce(table['precio_cierre'], deduced), missing)
+
+def _strings(column) -> np.ndarray:
+    """Columna de texto → array de NumPy, convirtiendo a Python solo los valores distintos"""
+    encoded = pc.dictionary_encode(pc.fill_null(column, '').combine_chunks())
+    return np.array(encoded.dictionary.to_pylist(), dtype=str)[encoded.indices.to_numpy()]
+
+def trade_columns(table: 'pa.Table') -> TradeColumns:
+    """Vista de ``stats_engine`` sobre una tabla del snapshot (sin materializar dicts)"""
+    if not table.num_rows:
+        return TradeColumns([])
+    closed = pc.fill_null(pc.greater(pc.utf8_length(table['fecha_cierre']), 0), False)
+    return TradeColumns.from_arrays(
+        ids=table['id'].to_numpy(),
+        entry=table['precio_apertura'].to_numpy(),
+        take_profit=table['take_profit'].to_numpy(),
+        stop_loss=table['stop_loss'].to_numpy(),
+        exit=exit_prices(table).to_numpy(),
+        closed=closed.to_numpy(),
+        pars=_strings(table['par']),
+        months=_strings(pc.utf8_slice_codeunits(table['fecha_apertura'], 0, 7))
+    )
+
+def filter_mask(table: 'pa.Table', filters: TradeFilters):
+    """Los filtros de ``TradeFilters`` como máscara de Arrow (las mismas condiciones que ``QueryPlan``)"""
+    f = filters
+    if f.date_prefix and (f.date_from or f.date_to):
+        raise ValueError("date_prefix no se puede combinar con date_from/date_to")
+    conditions = []
+    fecha = table['fecha_apertura']
+    if f.par:
+        conditions.append(pc.equal(table['par'], f.par))
+    if f.status:
+        closed = pc.fill_null(pc.greater(pc.utf8_length(table['fecha_cierre']), 0), False)
+        conditions.append(closed if f.status == 'closed' else pc.invert(closed))
+    if f.date_prefix:
+        conditions.append(pc.starts_with(fecha, f.date_prefix))
+    if f.date_from:
+        conditions.append(pc.greater_equal(fecha, f.date_from))
+    if f.date_to:
+        conditions.append(pc.less_equal(fecha, f.date_to + DATE_UPPER_SUFFIX))
+    for attribute, low_field, high_field in RANGE_FILTERS:
+        low, high = getattr(f, low_field), getattr(f, high_field)
+        if low is not None:
+            conditions.append(pc.greater_equal(table[attribute], low))
+        if high is not None:
+            conditions.append(pc.less_equal(table[attribute], high))
+    mask = None
+    for condition in conditions:
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return None if mask is None else pc.fill_null(mask, False)
+
+def merge(base: 'pa.Table', deltas: List['pa.Table']) -> 'pa.Table':
+    """Aplicar los deltas (en orden) sobre la base: por cada ID gana su última fila; las bajas se quitan"""
+    if not deltas:
+        return base
+    changes = pa.concat_tables(deltas)
+    ids = changes['id'].to_numpy()
+    # Índice de la última aparición de cada ID
+    _, first_from_end = np.unique(ids[::-1], return_index=True)
+    latest = changes.take(pa.array(len(ids) - 1 - first_from_end))
+    kept = base.filter(pc.invert(pc.is_in(base['id'], value_set=latest['id'])))
+    upserts = latest.filter(pc.invert(latest['deleted'])).drop_columns(['deleted'])
+    return pa.concat_tables([kept, upserts.cast(SCHEMA)])
+
+class TradeSnapshot:
+    """Copia columnar (Arrow IPC) de la tabla de trades para las lecturas analíticas.
+
+    El snapshot es un archivo base más deltas, descritos por ``manifest.json``.
+    La base se escribe recorriendo el almacenamiento página a página (memoria
+    acotada a una página); cada actualización incremental pide al registro de
+    cambios lo tocado desde la versión del snapshot (altas, modificaciones y
+    bajas) y lo agrega como un delta. ``compact`` funde la base y los deltas en
+    una base nueva. Los archivos no se comprimen: se abren con ``memory_map`` y
+    las columnas se leen sin copiarlas a memoria del proceso.
+    """
+
+    def __init__(self, storage, directory: str, max_age: float = 60, max_deltas: int = 16):
+        self.storage = storage
+        self.directory = directory
+        self.max_age = max_age
+        self.max_deltas = max_deltas
+        self._refresh_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = None
+        self._background: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    # Archivos
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        """Reemplazo atómico: un lector ve el manifiesto anterior o el nuevo, nunca uno a medias"""
+        tmp = self._path(MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self._path(MANIFEST))
+
+    def _write_file(self, name: str, schema, batches: Iterator['pa.RecordBatch']) -> int:
+        rows = 0
+        tmp = self._path(name + ".tmp")
+        with ipc.new_file(tmp, schema) as writer:
+            for batch in batches:
+                if batch.num_rows:
+                    writer.write_batch(batch)
+                    rows += batch.num_rows
+        os.replace(tmp, self._path(name))
+        return rows
+
+    def _open(self, name: str) -> 'pa.Table':
+        """Tabla respaldada por el archivo mapeado en memoria (sin copias)"""
+        return ipc.open_file(pa.memory_map(self._path(name), "r")).read_all()
+
+    def _remove_unused(self, manifest: Dict[str, Any]) -> List[str]:
+        """Borrar los archivos que el manifiesto ya no usa (un lector con el archivo mapeado lo conserva)"""
+        used = {manifest['base']} | {d['file'] for d in manifest['deltas']}
+        removed = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".arrow") and name not in used:
+                os.remove(self._path(name))
+                removed.append(name)
+        return removed
+
+    @property
+    def ready(self) -> bool:
+        return self.manifest() is not None
+
+    # Construcción y actualización
+
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Actualizar el snapshot: incremental desde su versión, o completo si no hay base,
+        si se pide ``full`` o si los cambios desde esa versión ya no se conservan"""
+        with self._refresh_lock:
+            manifest = self.manifest()
+            if full or manifest is None:
+                return self._build()
+            try:
+                return self._refresh(manifest)
+            except ChangesExpired:
+                return self._build()
+
+    def _build(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        # La versión se lee antes de recorrer: lo que cambie durante el recorrido lo trae el próximo delta
+        version = self.storage.get_collection_version()['version']
+        name = f"base-{version:012d}.arrow"
+        pages = self.storage.scan_pages(SNAPSHOT_COLUMNS)
+        rows = self._write_file(name, SCHEMA, (to_batch(page) for page in pages))
+        now = datetime.now(timezone.utc).isoformat()
+        manifest = {
+            'format': FORMAT_VERSION, 'version': version, 'base': name, 'base_version': version,
+            'base_rows': rows, 'deltas': [], 'built_at': now, 'refreshed_at': now
+        }
+        self._write_manifest(manifest)
+        self._remove_unused(manifest)
+        return {'full': True, 'version': version, 'rows': rows, 'seconds': round(time.perf_counter() - start, 3)}
+
+    def _refresh(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        changes = self.storage.get_changes(manifest['version'])
+        result = {'full': False, 'version': changes['version'], 'trades': len(changes['trades']),
+                  'deleted': len(changes['deleted']), 'compacted': False}
+        if changes['version'] > manifest['version']:
+            name = f"delta-{manifest['version']:012d}-{changes['version']:012d}.arrow"
+            rows = self._write_file(name, DELTA_SCHEMA,
+                                    [to_batch(changes['trades'], changes['deleted'], delta=True)])
+            manifest['deltas'].append({'file': name, 'from': manifest['version'],
+                                       'to': changes['version'], 'rows': rows})
+            manifest['version'] = changes['version']
+        manifest['refreshed_at'] = datetime.now(timezone.utc).isoformat()
+        self._write_manifest(manifest)
+        if len(manifest['deltas']) >= self.max_deltas:
+            self._compact(manifest)
+            result['compacted'] = True
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        return result
+
+    def compact(self) -> Dict[str, Any]:
+        """Fundir la base y los deltas en una base nueva (misma versión)"""
+        with self._refresh_lock:
+            manifest = self.manifest()
+            if manifest is None:
+                raise ValueError("No hay snapshot para compactar")
+            return self._compact(manifest)
+
+    def _compact(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        merged_from = len(manifest['deltas'])
+        if merged_from:
+            table = self._load(manifest)
+            name = f"base-{manifest['version']:012d}.arrow"
+            rows = self._write_file(name, SCHEMA, table.combine_chunks().to_batches(max_chunksize=64 * 1024))
+            manifest.update({'base': name, 'base_version': manifest['version'], 'base_rows': rows, 'deltas': []})
+            self._write_manifest(manifest)
+        removed = self._remove_unused(manifest)
+        return {'version': manifest['version'], 'rows': manifest['base_rows'], 'merged_deltas': merged_from,
+                'removed_files': removed, 'seconds': round(time.perf_counter() - start, 3)}
+
+    def ensure_fresh(self) -> bool:
+        """Preparar el snapshot para una lectura. ``False`` si todavía no existe (se construye en
+        segundo plano). Si tiene más de ``max_age`` segundos se actualiza de forma incremental,
+        salvo que otro hilo ya lo esté haciendo (se lee el estado anterior)"""
+        manifest = self.manifest()
+        if manifest is None:
+            self.refresh_in_background(full=True)
+            return False
+        age = (datetime.now(timezone.utc) - datetime.fromisoformat(manifest['refreshed_at'])).total_seconds()
+        if age > self.max_age and self._refresh_lock.acquire(blocking=False):
+            try:
+                self._refresh(manifest)
+            except ChangesExpired:
+                self._build()
+            finally:
+                self._refresh_lock.release()
+        return True
+
+    def refresh_in_background(self, full: bool = False) -> None:
+        if self._background is not None and self._background.is_alive():
+            return
+        self._background = threading.Thread(target=self._refresh_logged, args=(full,),
+                                            name="trade-snapshot", daemon=True)
+        self._background.start()
+
+    def _refresh_logged(self, full: bool) -> None:
+        try:
+            self.refresh(full)
+        except Exception as e:
+            print(f"Error actualizando el snapshot de trades: {e}")
+
+    # Lectura
+
+    def _load(self, manifest: Dict[str, Any]) -> 'pa.Table':
+        return merge(self._open(manifest['base']), [self._open(d['file']) for d in manifest['deltas']])
+
+    def table(self) -> 'pa.Table':
+        """La tabla vigente (base + deltas). Se reutiliza mientras el manifiesto no cambie"""
+        manifest = self.manifest()
+        if manifest is None:
+            raise ValueError("No hay snapshot de trades")
+        key = (manifest['version'], manifest['base'], len(manifest['deltas']))
+        with self._load_lock:
+            if self._loaded is None or self._loaded[0] != key:
+                self._loaded = (key, self._load(manifest))
+            return self._loaded[1]
+
+    def select(self, filters: Optional[TradeFilters] = None, order: str = "none") -> 'pa.Table':
+        """Trades filtrados; ``order`` asc/desc por fecha de apertura (como ``query_trades``)"""
+        table = self.table()
+        mask = filter_mask(table, filters or TradeFilters())
+        if mask is not None:
+            table = table.filter(mask)
+        if order in ("asc", "desc"):
+            direction = "ascending" if order == "asc" else "descending"
+            table = table.sort_by([('fecha_apertura', direction), ('id', direction)])
+        return table
+
+    def trade_stats(self, par: Optional[str] = None) -> Dict[str, Any]:
+        """Las mismas estadísticas que ``stats_engine.trade_stats`` leyendo del snapshot. Se ordena
+        como ``get_trades_by_par``/``get_all_trades`` para que los empates (mejor y peor trade)
+        se resuelvan igual"""
+        table = self.select(TradeFilters(par=par))
+        if par:
+            table = table.sort_by([('fecha_apertura', 'ascending'), ('id', 'ascending')])
+        else:
+            table = table.sort_by([('created_at', 'descending'), ('id', 'ascending')])
+        return compute_stats(trade_columns(table))
+
+    def closed_trades(self, par: Optional[str] = None) -> ClosedTrades:
+        """Vista de ``equity_engine`` (cerrados, ordenados por fecha de cierre) desde el snapshot"""
+        table = self.select(TradeFilters(par=par, status='closed'))
+        return ClosedTrades(trade_columns(table), _strings(table['fecha_cierre']))
+
+    def pages(self, filters: Optional[TradeFilters] = None, order: str = "none",
+              page_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """Trades filtrados como páginas de dicts (para las exportaciones). El filtro se aplica
+        al llamar (``ValueError`` inmediato); cada página se convierte al consumirla"""
+        batches = self.select(filters, order).to_batches(max_chunksize=page_size)
+        return (batch.to_pylist() for batch in batches)
+
+    # Mantenimiento
+
+    def verify(self) -> Dict[str, Any]:
+        """Comprobar los archivos y comparar el snapshot con el almacenamiento (IDs y ``updated_at``)"""
+        manifest = self.manifest()
+        if manifest is None:
+            return {'ok': False, 'problems': ["No hay snapshot"]}
+        problems = []
+        for name, schema in [(manifest['base'], SCHEMA)] + [(d['file'], DELTA_SCHEMA) for d in manifest['deltas']]:
+            try:
+                table = self._open(name)
+            except (OSError, pa.ArrowInvalid) as e:
+                problems.append(f"{name}: ilegible ({e})")
+                continue
+            if not table.schema.equals(schema):
+                problems.append(f"{name}: esquema distinto del esperado")
+            if name == manifest['base'] and table.num_rows != manifest['base_rows']:
+                problems.append(f"{name}: {table.num_rows} filas, el manifiesto dice {manifest['base_rows']}")
+        if problems:
+            return {'ok': False, 'version': manifest['version'], 'problems': problems}
+
+        table = self.table()
+        snapshot = dict(zip(table['id'].to_pylist(), table['updated_at'].to_pylist()))
+        duplicates = table.num_rows - len(snapshot)
+        storage_version = self.storage.get_collection_version()['version']
+        stored = {int(item['id']): item.get('updated_at')
+                  for page in self.storage.scan_pages(['id', 'updated_at']) for item in page}
+        missing = sorted(stored.keys() - snapshot.keys())
+        extra = sorted(snapshot.keys() - stored.keys())
+        stale = sorted(i for i in stored.keys() & snapshot.keys() if stored[i] != snapshot[i])
+        if duplicates:
+            problems.append(f"{duplicates} IDs repetidos")
+        return {
+            'ok': not (problems or missing or extra or stale),
+            'version': manifest['version'],
+            'storage_version': storage_version,
+            'rows': table.num_rows,
+            'missing': missing[:20], 'missing_count': len(missing),
+            'extra': extra[:20], 'extra_count': len(extra),
+            'stale': stale[:20], 'stale_count': len(stale),
+            'problems': problems
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        manifest = self.manifest() or {}
+        files = [manifest['base']] + [d['file'] for d in manifest['deltas']] if manifest else []
+        return {
+            'directory': self.directory,
+            'ready': bool(manifest),
+            'version': manifest.get('version'),
+            'base_rows': manifest.get('base_rows'),
+            'deltas': len(manifest.get('deltas', [])),
+            'delta_rows': sum(d['rows'] for d in manifest.get('deltas', [])),
+            'bytes': sum(os.path.getsize(self._path(name)) for name in files if os.path.exists(self._path(name))),
+            'built_at': manifest.get('built_at'),
+            'refreshed_at': manifest.get('refreshed_at'),
+            'max_age': self.max_age,
+            'refreshing': self._refresh_lock.locked()
+        }
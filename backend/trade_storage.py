@@ -0,0 +1,207 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from query_planner import TradeFilters
+from trade_timeseries import timeseries
+
+ChangeListener = Callable[[int, List[tuple]], None]
+
+class ConcurrentModificationError(Exception):
+    """El trade cambió entre la lectura y la escritura demasiadas veces"""
+
+class BatchIncompleteError(Exception):
+    """El almacenamiento dejó elementos sin procesar después de todos los reintentos"""
+
+class TradeStorage(ABC):
+    """Almacenamiento de trades: lo que usan la API, ``CachedTradeService`` y ``manage.py``.
+
+    Las implementaciones (``DynamoDBService``, ``SQLiteTradeStorage``) devuelven
+    los mismos items (tipos de Python) y registros planos (``trade_codec``),
+    escriben la versión de la colección, su registro de cambios y los agregados
+    en la misma operación que el trade y avisan a los listeners después de
+    confirmar.
+    """
+
+    def __init__(self):
+        self._listeners: List[ChangeListener] = []
+
+    # Trades individuales
+
+    @abstractmethod
+    def create_trade(self, trade_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Crear un trade y devolver el item guardado (con su ``id``)"""
+
+    @abstractmethod
+    def get_trade(self, trade_id: int) -> Optional[Dict[str, Any]]:
+        """Un trade por ID (``None`` si no existe)"""
+
+    @abstractmethod
+    def update_trade(self, trade_id: int, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Actualizar un trade; devuelve el item nuevo o ``None`` si no existe"""
+
+    @abstractmethod
+    def delete_trade(self, trade_id: int) -> bool:
+        """Eliminar un trade; ``False`` si no existía"""
+
+    def close_trade(self, trade_id: int, fecha_cierre: str, motivo_cierre: str,
+                    precio_cierre: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Cerrar un trade"""
+        updates = {
+            'fecha_cierre': fecha_cierre,
+            'motivo_cierre': motivo_cierre
+        }
+        if precio_cierre is not None:
+            updates['precio_cierre'] = precio_cierre
+        return self.update_trade(trade_id, updates)
+
+    # Listas y consultas
+
+    @abstractmethod
+    def get_all_trades(self) -> List[Dict[str, Any]]:
+        """Todos los trades, más recientes (por ``created_at``) primero"""
+
+    @abstractmethod
+    def get_all_trade_records(self) -> List[Dict[str, Any]]:
+        """``get_all_trades`` como registros planos"""
+
+    @abstractmethod
+    def get_trades_by_par(self, par: str) -> List[Dict[str, Any]]:
+        """Todos los trades de un par, por fecha de apertura"""
+
+    @abstractmethod
+    def query_trades(self, filters: Optional[TradeFilters] = None, limit: int = 50,
+                     next_token: Optional[str] = None, ascending: bool = False,
+                     index_name: Optional[str] = None) -> Dict[str, Any]:
+        """Una página de trades filtrados y ordenados por fecha de apertura.
+
+        Devuelve ``items``, ``next_token``, ``plan``, ``scanned_count`` y
+        ``consumed_capacity``. ``index_name`` es una sugerencia: cada motor
+        elige su camino de acceso.
+        """
+
+    @abstractmethod
+    def query_trade_records(self, filters: Optional[TradeFilters] = None, limit: int = 50,
+                            next_token: Optional[str] = None, ascending: bool = False,
+                            index_name: Optional[str] = None,
+                            fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """``query_trades`` con registros planos (solo ``fields`` si se indican)"""
+
+    @abstractmethod
+    def scan_pages(self, fields: Optional[List[str]] = None, filters: Optional[TradeFilters] = None,
+                   segments: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Recorrer todos los trades (filtrados) página a página, sin orden garantizado"""
+
+    def scan_trades(self, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Recorrer todos los trades uno por uno (sin orden garantizado)"""
+        for page in self.scan_pages(fields):
+            yield from page
+
+    def iter_trades(self, filters: Optional[TradeFilters] = None, ascending: bool = False,
+                    page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Recorrer los trades (filtrados) página a página sin cargarlos todos en memoria"""
+        next_token = None
+        while True:
+            page = self.query_trades(filters, page_size, next_token, ascending=ascending)
+            yield from page['items']
+            next_token = page['next_token']
+            if not next_token:
+                return
+
+    def get_trade_records_by_par_page(self, par: str, limit: int = 50, next_token: Optional[str] = None,
+                                      ascending: bool = False, date_from: Optional[str] = None,
+                                      date_to: Optional[str] = None, date_prefix: Optional[str] = None,
+                                      fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Página de registros planos de un par ordenada por fecha, leyendo solo el rango
+        pedido (``par-index`` con el rango en la condición de clave)"""
+        filters = TradeFilters(par=par, date_from=date_from, date_to=date_to, date_prefix=date_prefix)
+        return self.query_trade_records(filters, limit, next_token, ascending, index_name='par-index',
+                                        fields=fields)
+
+    def get_trade_records_by_par(self, par: str) -> List[Dict[str, Any]]:
+        """Todos los trades de un par como registros planos, más recientes primero"""
+        records = []
+        next_token = None
+        while True:
+            page = self.query_trade_records(TradeFilters(par=par), 1000, next_token, index_name='par-index')
+            records.extend(page['items'])
+            next_token = page['next_token']
+            if not next_token:
+                return records
+
+    # Operaciones en lote (un resultado por entrada, en el orden de la entrada)
+
+    @abstractmethod
+    def batch_create_trades(self, trades_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Crear muchos trades"""
+
+    @abstractmethod
+    def batch_get_trades(self, trade_ids: List[int]) -> Dict[str, Any]:
+        """``{'trades': [...], 'missing': [ids]}``"""
+
+    @abstractmethod
+    def batch_close_trades(self, closes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cerrar muchos trades junto con sus agregados"""
+
+    @abstractmethod
+    def batch_delete_trades(self, trade_ids: List[int]) -> List[Dict[str, Any]]:
+        """Eliminar muchos trades descontándolos de los agregados"""
+
+    # Versión, cambios y agregados
+
+    @abstractmethod
+    def get_collection_version(self) -> Dict[str, Any]:
+        """``{'version', 'modified_at'}`` de la colección de trades"""
+
+    @abstractmethod
+    def get_changes(self, since: int) -> Dict[str, Any]:
+        """Trades tocados después de la versión ``since`` (``ChangesExpired`` si ya no se conservan)"""
+
+    @abstractmethod
+    def get_stats_summary(self) -> Dict[str, Any]:
+        """Estadísticas precalculadas a partir de las filas agregadas"""
+
+    @abstractmethod
+    def get_aggregate_rows(self, scope: str, low: Optional[str] = None,
+                           high: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Filas agregadas de un ámbito (con bucket entre ``low`` y ``high``), ordenadas por bucket"""
+
+    def get_timeseries(self, bucket: str = 'day', par: Optional[str] = None, date_from: Optional[str] = None,
+                       date_to: Optional[str] = None, windows: Sequence[int] = ()) -> Dict[str, Any]:
+        """Serie por hora/día/semana/mes desde las filas agregadas (``trade_timeseries``)"""
+        return timeseries(self.get_aggregate_rows, bucket, par, date_from, date_to, windows)
+
+    @abstractmethod
+    def reconcile_aggregates(self, apply: bool = False) -> List[Dict[str, Any]]:
+        """Recalcular los agregados desde los trades y devolver el drift encontrado"""
+
+    @abstractmethod
+    def get_max_trade_id(self) -> int:
+        """El ID más alto existente (0 si no hay trades)"""
+
+    # Listeners
+
+    def add_change_listener(self, listener: ChangeListener) -> None:
+        """Registrar ``listener(version, changes)``, llamado tras cada escritura confirmada"""
+        self._listeners.append(listener)
+
+    def _notify(self, version: int, changes: List[tuple]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(version, changes)
+            except Exception as e:
+                # La escritura ya está confirmada: un listener no puede hacerla fallar
+                print(f"Error notificando cambios: {e}")
+
+def sqlite_path(url: str) -> str:
+    """``sqlite:///./trades.db`` → ``./trades.db`` (``sqlite:////ruta/absoluta.db`` para rutas absolutas)"""
+    path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else ""
+    if not path:
+        raise ValueError(f"URL de SQLite inválida: {url}")
+    return path
+
+def create_storage(url: str) -> TradeStorage:
+    """Crear el almacenamiento según la URL: ``dynamodb://`` o ``sqlite:///ruta/trades.db``"""
+    if url.startswith("sqlite:"):
+        from sqlite_storage import SQLiteTradeStorage
+        return SQLiteTradeStorage(sqlite_path(url))
+    from dynamodb_service import DynamoDBService
+    return DynamoDBService()
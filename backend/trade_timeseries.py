@@ -0,0 +1,195 @@
+from collections import defaultdict, deque
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from query_planner import DATE_UPPER_SUFFIX
+
+# Granularidades que se guardan como filas agregadas; semana y mes se suman a partir de los días
+STORED_BUCKETS = ('hour', 'day')
+BUCKETS = ('hour', 'day', 'week', 'month')
+# Contadores de las filas por tiempo: ``trades`` cuenta aperturas (en el bucket de
+# ``fecha_apertura``) y el resto cierres (en el bucket de ``fecha_cierre``)
+SERIES_FIELDS = ['trades', 'closed_trades', 'realized_trades', 'wins', 'losses', 'profit']
+CLOSE_FIELDS = SERIES_FIELDS[1:]
+
+RowReader = Callable[[str, Optional[str], Optional[str]], List[Dict[str, Any]]]
+
+def time_bucket(timestamp: str, granularity: str) -> str:
+    """``2025-01-07T14:30:00`` → ``2025-01-07T14`` (hora) o ``2025-01-07`` (día).
+
+    Se usa la fecha tal como está guardada (sin convertir zonas horarias), igual
+    que el ámbito ``month`` de los agregados."""
+    day = timestamp[:10]
+    if granularity == 'day':
+        return day
+    hour = timestamp[11:13] if len(timestamp) >= 13 and timestamp[10] in 'T ' else '00'
+    return f"{day}T{hour}"
+
+def time_scope(granularity: str, par: Optional[str] = None) -> str:
+    """Ámbito de las filas por tiempo: ``day`` (todos los pares) o ``day:BTC/USDT``"""
+    return granularity if par is None else f"{granularity}:{par}"
+
+def time_contributions(trade: Dict[str, Any], closing: Dict[str, float]) -> Dict[Tuple[str, str], Dict[str, float]]:
+    """Filas por hora y por día (de todos los pares y del par del trade) que toca un trade:
+    la apertura suma ``trades`` y el cierre suma ``closing`` en el bucket de cada fecha"""
+    rows: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    opened = trade.get('fecha_apertura')
+    closed = trade.get('fecha_cierre')
+    for granularity in STORED_BUCKETS:
+        for scope in (time_scope(granularity), time_scope(granularity, trade['par'])):
+            if opened:
+                rows[(scope, time_bucket(opened, granularity))]['trades'] += 1
+            if closed:
+                row = rows[(scope, time_bucket(closed, granularity))]
+                for field, value in closing.items():
+                    row[field] += value
+    return {key: dict(values) for key, values in rows.items()}
+
+# Inicio y fin de cada bucket
+
+def bucket_key(day_or_hour: str, bucket: str) -> str:
+    """Bucket de salida de una fila guardada (``hour``/``day``) para la granularidad pedida"""
+    if bucket in STORED_BUCKETS:
+        return day_or_hour
+    if bucket == 'month':
+        return day_or_hour[:7]
+    year, week, _ = date.fromisoformat(day_or_hour[:10]).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def bucket_start(key: str, bucket: str) -> datetime:
+    if bucket == 'hour':
+        return datetime.fromisoformat(key + ':00')
+    if bucket == 'day':
+        return datetime.fromisoformat(key)
+    if bucket == 'month':
+        return datetime.fromisoformat(key + '-01')
+    year, week = key.split('-W')
+    return datetime.combine(date.fromisocalendar(int(year), int(week), 1), datetime.min.time())
+
+def bucket_end(key: str, bucket: str) -> datetime:
+    """Primer instante después del bucket"""
+    start = bucket_start(key, bucket)
+    if bucket == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}[bucket]
+
+def _valid(key: str, bucket: str) -> bool:
+    """Las fechas guardadas en otro formato no forman buckets válidos y se omiten"""
+    try:
+        bucket_start(key, bucket)
+        return True
+    except ValueError:
+        return False
+
+def _rate(wins: float, realized: float) -> float:
+    return wins / realized * 100 if realized else 0.0
+
+class RollingWindow:
+    """Sumas de las filas de los últimos ``span`` (ventana deslizante).
+
+    Cada fila entra y sale una sola vez: avanzar la ventana cuesta O(1)
+    amortizado por fila, sin volver a sumar el historial.
+    """
+
+    def __init__(self, span: timedelta):
+        self.span = span
+        self.rows: deque = deque()
+        self.sums = dict.fromkeys(CLOSE_FIELDS, 0.0)
+
+    def push(self, start: datetime, row: Dict[str, float]) -> None:
+        self.rows.append((start, row))
+        for field in CLOSE_FIELDS:
+            self.sums[field] += row[field]
+
+    def advance(self, end: datetime) -> None:
+        """Quitar las filas que empezaron antes de ``end - span``"""
+        limit = end - self.span
+        while self.rows and self.rows[0][0] < limit:
+            _, row = self.rows.popleft()
+            for field in CLOSE_FIELDS:
+                self.sums[field] -= row[field]
+
+    def value(self) -> Dict[str, Any]:
+        realized = round(self.sums['realized_trades'])
+        return {
+            'closed_trades': round(self.sums['closed_trades']),
+            'realized_trades': realized,
+            'win_rate': _rate(self.sums['wins'], realized),
+            'profit': self.sums['profit']
+        }
+
+def _plain(row: Dict[str, Any]) -> Dict[str, float]:
+    return {field: float(row.get(field, 0) or 0) for field in SERIES_FIELDS}
+
+def roll_up(rows: Iterable[Dict[str, Any]], bucket: str) -> List[Tuple[str, Dict[str, float]]]:
+    """Filas guardadas (ordenadas) → ``(bucket, contadores)`` de la granularidad pedida"""
+    series: List[Tuple[str, Dict[str, float]]] = []
+    for row in rows:
+        key = bucket_key(row['bucket'], bucket)
+        values = _plain(row)
+        if series and series[-1][0] == key:
+            for field, value in values.items():
+                series[-1][1][field] += value
+        else:
+            series.append((key, values))
+    return series
+
+def timeseries(read_rows: RowReader, bucket: str = 'day', par: Optional[str] = None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None,
+               windows: Sequence[int] = ()) -> Dict[str, Any]:
+    """Serie por ``bucket`` desde las filas agregadas, con ventanas móviles de ``windows`` días.
+
+    ``read_rows(scope, desde, hasta)`` devuelve las filas de un ámbito en ese
+    rango de buckets, ordenadas. Semana y mes se suman a partir de los días; las
+    ventanas se calculan sobre las filas guardadas y se evalúan al final de cada
+    bucket de salida. Para llenar la primera ventana se leen también los
+    ``max(windows)`` días anteriores a ``date_from``.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket debe ser uno de {', '.join(BUCKETS)}")
+    stored = 'hour' if bucket == 'hour' else 'day'
+    first = None
+    if date_from:
+        # Semana y mes empiezan en su primer día para no devolver el primer bucket a medias
+        first = bucket_start(bucket_key(date_from[:10], bucket), bucket) if bucket in ('week', 'month') \
+            else datetime.fromisoformat(date_from[:10])
+    low = first - timedelta(days=max(windows)) if first and windows else first
+    rows = [
+        row for row in read_rows(time_scope(stored, par), low.strftime('%Y-%m-%d') if low else None,
+                                 date_to + DATE_UPPER_SUFFIX if date_to else None)
+        if _valid(row['bucket'], stored)
+    ]
+
+    series = []
+    rolling = {str(days): RollingWindow(timedelta(days=days)) for days in windows}
+    base = iter(rows)
+    pending = next(base, None)
+    for key, values in roll_up(rows, bucket):
+        end = bucket_end(key, bucket)
+        # Las filas guardadas entran en las ventanas a medida que el bucket de salida las alcanza
+        while pending is not None and bucket_start(pending['bucket'], stored) < end:
+            start, row = bucket_start(pending['bucket'], stored), _plain(pending)
+            for window in rolling.values():
+                window.push(start, row)
+            pending = next(base, None)
+        for window in rolling.values():
+            window.advance(end)
+        # Antes de date_from (solo llenan las ventanas) o vacío (todo lo del bucket se eliminó)
+        if (first and end <= first) or not any(values.values()):
+            continue
+        realized = round(values['realized_trades'])
+        point = {
+            'bucket': key,
+            'start': bucket_start(key, bucket).isoformat(),
+            'opened': round(values['trades']),
+            'closed_trades': round(values['closed_trades']),
+            'realized_trades': realized,
+            'wins': round(values['wins']),
+            'losses': round(values['losses']),
+            'win_rate': _rate(values['wins'], realized),
+            'profit': values['profit']
+        }
+        if rolling:
+            point['rolling'] = {days: window.value() for days, window in rolling.items()}
+        series.append(point)
+    return {'bucket': bucket, 'par': par, 'date_from': date_from, 'date_to': date_to,
+            'windows': list(windows), 'series': series}
@@ -32,7 +32,7 @@ export interface UpdateTradeRequest {
 export const tradeService = {
   // Obtener todos los trades
   async getTrades(): Promise<Trade[]> {
-    const response = await api.get('/trades');
+    const response = await api.get('/trades?all=true');
     return response as Trade[];
   },
 
@@ -29,7 +29,7 @@ export interface UpdateTradeRequest {
 export const tradeServiceAlova = {
   // Obtener todos los trades
   async getTrades(): Promise<Trade[]> {
-    const response = await alova.Get(createApiUrl('/trades')).send();
+    const response = await alova.Get(createApiUrl('/trades?all=true')).send();
     return response as Trade[];
   },
 
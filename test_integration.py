@@ -50,13 +50,15 @@ def test_dynamodb_integration():
         print(f"❌ Error creando trade: {e}")
         return
     
-    # 3. Obtener todos los trades
-    print("\n3. Obteniendo todos los trades...")
+    # 3. Obtener la primera página de trades
+    print("\n3. Obteniendo trades paginados...")
     try:
-        response = requests.get(f"{API_BASE_URL}/trades")
+        response = requests.get(f"{API_BASE_URL}/trades", params={"limit": 20})
         print(f"✅ Trades obtenidos: {response.status_code}")
-        trades = response.json()
-        print(f"   Total trades: {len(trades)}")
+        page = response.json()
+        trades = page.get('items', [])
+        print(f"   Trades en la página: {len(trades)}")
+        print(f"   Hay más páginas: {page.get('next_token') is not None}")
         for trade in trades:
             print(f"   - ID: {trade.get('id')}, Par: {trade.get('par')}, Observaciones: {trade.get('observaciones', 'N/A')}")
     except Exception as e:
@@ -68,10 +70,10 @@ def test_dynamodb_integration():
     try:
         import urllib.parse
         par_encoded = urllib.parse.quote("BTC/USDT")
-        response = requests.get(f"{API_BASE_URL}/trades/par/{par_encoded}")
+        response = requests.get(f"{API_BASE_URL}/trades/par/{par_encoded}", params={"limit": 50})
         print(f"✅ Trades por par: {response.status_code}")
-        trades_by_par = response.json()
-        print(f"   Trades BTC/USDT: {len(trades_by_par)}")
+        trades_by_par = response.json()['items']
+        print(f"   Últimos trades BTC/USDT: {len(trades_by_par)}")
     except Exception as e:
         print(f"❌ Error obteniendo trades por par: {e}")
         return